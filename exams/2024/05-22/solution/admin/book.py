@@ -1,13 +1,17 @@
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
-from model import Book, BookCreate, BookPublic, BookUpdate, Result, User
+from db import AsyncDB, Page, Paginate, get_session, run_in_session
+from fastapi import Body, Depends, Query
+from model import (Book, BookCreate, BookPublic, BookUpdate, Filter, Result,
+                   User, book_search, bulk_limit_max, page_limit,
+                   page_limit_max)
+from search import SearchHit
+from sqlmodel import Session
 
 from . import router
 
-db_book = DB[Book](Book, "Book")
+db_book = AsyncDB[Book](Book, "Book")
 
 tags = ["Admin - Book"]
 
@@ -17,18 +21,75 @@ async def admin_create_book(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     book: BookCreate,
 ) -> Result:
-    return db_book.create(book, current_user)
+    return await db_book.create(book, current_user, session)
+
+
+@router.post("/book/bulk", tags=tags, summary="Insert new books")
+async def admin_create_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    books: Annotated[List[BookCreate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await db_book.create_all(books, current_user, session)
+
+
+@router.put("/book/bulk", tags=tags, summary="Update books")
+async def admin_update_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    books: Annotated[Dict[int, BookUpdate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await db_book.update_all(books, current_user, session)
+
+
+@router.delete("/book/bulk", tags=tags, summary="Delete books")
+async def admin_delete_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await db_book.delete_all(ids, session)
 
 
 @router.get("/book", tags=tags, summary="Get all the books")
 async def admin_read_books(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(BookPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[BookPublic]:
-    return db_book.read_all()
+    return page.response(
+        await db_book.read_all(session, page=page, filter=filter)
+    )
+
+
+@router.get(
+    "/book/search",
+    tags=tags,
+    summary="Search all the books by title, author and publisher",
+)
+async def admin_search_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=page_limit_max)] = page_limit,
+) -> List[SearchHit]:
+    """Books with all the words of q (as prefixes), the best matches
+    first."""
+    return await run_in_session(session, book_search.search, q, limit=limit)
 
 
 @router.get("/book/{book_id}", tags=tags, summary="Get the details of a book")
@@ -36,9 +97,10 @@ async def admin_read_book(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     book_id: int,
 ) -> BookPublic:
-    return db_book.read(book_id)
+    return await db_book.read(book_id, session)
 
 
 @router.put("/book/{book_id}", tags=tags, summary="Update a book")
@@ -46,10 +108,11 @@ async def admin_update_book(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     book_id: int,
     book: BookUpdate,
 ) -> Result:
-    return db_book.update(book, current_user)
+    return await db_book.update(book_id, book, current_user, session)
 
 
 @router.delete("/book/{book_id}", tags=tags, summary="Delete a book")
@@ -57,6 +120,7 @@ async def admin_delete_book(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     book_id: int,
 ) -> Result:
-    return db_book.delete(book_id)
+    return await db_book.delete(book_id, session)
@@ -1,20 +1,22 @@
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
 from model import (
     Customer,
     CustomerCreate,
     CustomerPublic,
     CustomerUpdate,
+    Filter,
     Result,
     User,
 )
+from sqlmodel import Session
 
 from . import router
 
-db_customer = DB[Customer](Customer, "Customer")
+db_customer = AsyncDB[Customer](Customer, "Customer")
 
 tags = ["Admin - CuUstomer"]
 
@@ -24,18 +26,24 @@ async def admin_create_customer(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     customer: CustomerCreate,
 ) -> Result:
-    return db_customer.create(customer, current_user)
+    return await db_customer.create(customer, current_user, session)
 
 
 @router.get("/customer", tags=tags, summary="Get all the customers")
 async def admin_read_customers(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CustomerPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CustomerPublic]:
-    return db_customer.read_all()
+    return page.response(
+        await db_customer.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get(
@@ -47,9 +55,10 @@ async def admin_read_customer(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     customer_id: int,
 ) -> CustomerPublic:
-    return db_customer.read(customer_id)
+    return await db_customer.read(customer_id, session)
 
 
 @router.put("/customer/{customer_id}", tags=tags, summary="Update a customer")
@@ -57,10 +66,13 @@ async def admin_update_customer(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     customer_id: int,
     customer: CustomerUpdate,
 ) -> Result:
-    return db_customer.update(customer, current_user)
+    return await db_customer.update(
+        customer_id, customer, current_user, session
+    )
 
 
 @router.delete(
@@ -70,6 +82,7 @@ async def admin_delete_customer(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     customer_id: int,
 ) -> Result:
-    return db_customer.delete(customer_id)
+    return await db_customer.delete(customer_id, session)
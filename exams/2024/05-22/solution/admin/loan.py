@@ -1,13 +1,15 @@
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
-from model import Loan, LoanCreate, LoanPublic, LoanUpdate, Result, User
+from model import (Loan, LoanCreate, LoanFilter, LoanPublic, LoanUpdate,
+                   Result, User)
+from sqlmodel import Session
 
 from . import router
 
-db_loan = DB[Loan](Loan, "Loan")
+db_loan = AsyncDB[Loan](Loan, "Loan")
 
 tags = ["Admin - Loan"]
 
@@ -17,18 +19,24 @@ async def admin_create_loan(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     loan: LoanCreate,
 ) -> Result:
-    return db_loan.create(loan, current_user)
+    return await db_loan.create(loan, current_user, session)
 
 
 @router.get("/loan", tags=tags, summary="Read all loans")
 async def admin_read_loans(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(LoanPublic))],
+    filter: Annotated[LoanFilter, Depends()],
 ) -> List[LoanPublic]:
-    return db_loan.read_all()
+    return page.response(
+        await db_loan.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get("/loan/{loan_id}", tags=tags, summary="Get the details of a loan")
@@ -36,9 +44,10 @@ async def admin_read_loan(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     loan_id: int,
 ) -> LoanPublic:
-    return db_loan.read(loan_id)
+    return await db_loan.read(loan_id, session)
 
 
 @router.put("/loan/{loan_id}", tags=tags, summary="Update a loan")
@@ -46,10 +55,11 @@ async def admin_update_loan(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     loan_id: int,
     loan: LoanUpdate,
 ) -> Result:
-    return db_loan.update(loan, current_user)
+    return await db_loan.update(loan_id, loan, current_user, session)
 
 
 @router.delete("/loan/{loan_id}", tags=tags, summary="Delete a loan")
@@ -57,6 +67,7 @@ async def admin_delete_loan(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     loan_id: int,
 ) -> Result:
-    return db_loan.delete(loan_id)
+    return await db_loan.delete(loan_id, session)
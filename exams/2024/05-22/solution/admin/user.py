@@ -1,13 +1,14 @@
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
-from model import Result, User, UserCreate, UserPublic, UserUpdate
+from model import Filter, Result, User, UserCreate, UserPublic, UserUpdate
+from sqlmodel import Session
 
 from . import router
 
-db_user = DB[User](User, "User")
+db_user = AsyncDB[User](User, "User")
 
 tags = ["Admin - User"]
 
@@ -17,18 +18,24 @@ async def admin_create_user(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     user: UserCreate,
 ) -> Result:
-    return db_user.create(user, current_user)
+    return await db_user.create(user, current_user, session)
 
 
 @router.get("/user", tags=tags, summary="Get all the users")
 async def admin_read_users(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(UserPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[UserPublic]:
-    return db_user.read_all()
+    return page.response(
+        await db_user.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get("/user/{user_id}", tags=tags, summary="Get the details of a user")
@@ -36,9 +43,10 @@ async def admin_read_user(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     user_id: str,
 ) -> UserPublic:
-    return db_user.read(user_id)
+    return await db_user.read(user_id, session)
 
 
 @router.put("/user/{user_id}", tags=tags, summary="Update a user")
@@ -46,10 +54,11 @@ async def admin_update_user(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     user_id: str,
     user: UserUpdate,
 ) -> Result:
-    return db_user.update(user, current_user)
+    return await db_user.update(user_id, user, current_user, session)
 
 
 @router.delete("/user/{user_id}", tags=tags, summary="Delete a user")
@@ -57,6 +66,7 @@ async def admin_delete_user(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     user_id: str,
 ) -> Result:
-    return db_user.delete(user_id)
+    return await db_user.delete(user_id, session)
@@ -1,4 +1,6 @@
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 import admin.book  # noqa: F401
 import admin.customer  # noqa: F401
@@ -14,11 +16,21 @@ from admin import router as router_admin
 from auth import router as router_auth
 from fastapi import FastAPI
 from me import router as router_me
+from model import async_engine
 
 app_name = "yalm"
 
 logger = logging.getLogger(app_name.lower())
-app = FastAPI(title=app_name.upper(), debug=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(title=app_name.upper(), debug=True, lifespan=lifespan)
 
 app.include_router(router_me)
 app.include_router(router_admin)
@@ -1,13 +1,18 @@
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
-from model import Book, BookCreate, BookPublic, BookUpdate, Result, User
+from db import AsyncDB, Owner, Page, Paginate, get_session, run_in_session
+from fastapi import Body, Depends, Query
+from model import (Book, BookCreate, BookPublic, BookUpdate, Filter, Result,
+                   User, book_search, bulk_limit_max, page_limit,
+                   page_limit_max)
+from search import SearchHit
+from sqlalchemy import or_
+from sqlmodel import Session
 
 from . import router
 
-db_book = DB[Book](Book, "Book")
+db_book = AsyncDB[Book](Book, "Book")
 
 tags = ["Me - Book"]
 
@@ -17,9 +22,33 @@ async def me_create_book(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     book: BookCreate,
 ) -> Result:
-    return db_book.create(book, current_user)
+    return await db_book.create(book, current_user, session)
+
+
+@router.post("/book/bulk", tags=tags, summary="Insert new books")
+async def me_create_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    books: Annotated[List[BookCreate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await db_book.create_all(books, current_user, session)
+
+
+@router.put("/book/bulk", tags=tags, summary="Update books")
+async def me_update_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    books: Annotated[Dict[int, BookUpdate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    await db_book.check(list(books), session, current_user)
+    return await db_book.update_all(books, current_user, session)
 
 
 @router.get(
@@ -31,8 +60,15 @@ async def me_read_books_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(BookPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[BookPublic]:
-    return current_user.books_created
+    return page.response(
+        await db_book.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -44,8 +80,48 @@ async def me_read_books_updated(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(BookPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[BookPublic]:
-    return current_user.books_updated
+    return page.response(
+        await db_book.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
+
+
+@router.get(
+    "/book/search",
+    tags=tags,
+    summary="Search the books by title, author and publisher",
+)
+async def me_search_books(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=page_limit_max)] = page_limit,
+) -> List[SearchHit]:
+    """Books created or updated by the user with all the words of q (as
+    prefixes), the best matches first."""
+    return await run_in_session(
+        session,
+        book_search.search,
+        q,
+        limit=limit,
+        where=[
+            or_(
+                Book.created_by_id == current_user.id,
+                Book.updated_by_id == current_user.id,
+            )
+        ],
+    )
 
 
 @router.get(
@@ -67,8 +143,9 @@ async def me_update_book(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     book_id: int,
     book: BookUpdate,
 ) -> Result:
     db_book.read_personal(book.id, current_user.books_created)
-    return db_book.create(book, current_user)
+    return await db_book.create(book, current_user, session)
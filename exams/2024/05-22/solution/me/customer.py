@@ -1,20 +1,22 @@
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Owner, Page, Paginate, get_session
 from fastapi import Depends
 from model import (
     Customer,
     CustomerCreate,
     CustomerPublic,
     CustomerUpdate,
+    Filter,
     Result,
     User,
 )
+from sqlmodel import Session
 
 from . import router
 
-db_customer = DB[Customer](Customer, "Customer")
+db_customer = AsyncDB[Customer](Customer, "Customer")
 
 tags = ["Me - Customer"]
 
@@ -24,9 +26,10 @@ async def admin_create_customer(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     customer: CustomerCreate,
 ) -> Result:
-    return db_customer.create(customer, current_user)
+    return await db_customer.create(customer, current_user, session)
 
 
 @router.get(
@@ -38,8 +41,15 @@ async def me_read_customers_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CustomerPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CustomerPublic]:
-    return current_user.customers_created
+    return page.response(
+        await db_customer.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -51,8 +61,19 @@ async def me_read_customers_updated(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CustomerPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CustomerPublic]:
-    return current_user.customers_updated
+    return page.response(
+        await db_customer.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -80,8 +101,9 @@ async def me_update_customer(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     customer_id: int,
     customer: CustomerUpdate,
 ) -> Result:
     db_customer.read_personal(customer.id, current_user.customers_created)
-    return db_customer.create(customer, current_user)
+    return await db_customer.create(customer, current_user, session)
@@ -1,13 +1,15 @@
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Owner, Page, Paginate, get_session
 from fastapi import Depends
-from model import Loan, LoanCreate, LoanPublic, LoanUpdate, Result, User
+from model import (Loan, LoanCreate, LoanFilter, LoanPublic, LoanUpdate,
+                   Result, User)
+from sqlmodel import Session
 
 from . import router
 
-db_loan = DB[Loan](Loan, "Loan")
+db_loan = AsyncDB[Loan](Loan, "Loan")
 
 tags = ["Me - Loan"]
 
@@ -17,9 +19,10 @@ async def admin_create_loan(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     loan: LoanCreate,
 ) -> Result:
-    return db_loan.create(loan, current_user)
+    return await db_loan.create(loan, current_user, session)
 
 
 @router.get(
@@ -31,8 +34,15 @@ async def me_read_loans_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(LoanPublic))],
+    filter: Annotated[LoanFilter, Depends()],
 ) -> List[LoanPublic]:
-    return current_user.loans_created
+    return page.response(
+        await db_loan.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -44,8 +54,19 @@ async def me_read_loans_updated(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(LoanPublic))],
+    filter: Annotated[LoanFilter, Depends()],
 ) -> List[LoanPublic]:
-    return current_user.loans_updated
+    return page.response(
+        await db_loan.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -67,8 +88,9 @@ async def me_update_loan(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     loan_id: int,
     loan: LoanUpdate,
 ) -> Result:
     db_loan.read_personal(loan.id, current_user.loans_created)
-    return db_loan.create(loan, current_user)
+    return await db_loan.create(loan, current_user, session)
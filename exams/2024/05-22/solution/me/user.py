@@ -1,13 +1,14 @@
 from typing import Annotated
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, get_session
 from fastapi import Depends
 from model import Result, User, UserPublic
+from sqlmodel import Session
 
 from . import router
 
-db_user = DB[User](User, "User")
+db_user = AsyncDB[User](User, "User")
 
 
 tags = ["Me - User"]
@@ -27,5 +28,6 @@ async def me_delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
 ) -> Result:
-    return db_user.delete(current_user.id)
+    return await db_user.delete(current_user.id, session)
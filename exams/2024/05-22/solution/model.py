@@ -1,9 +1,12 @@
+import os
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Self
 
+from engine import PRAGMAS, create_db_async_engine, create_db_engine
 from pydantic import BaseModel
+from search import SearchIndex
 from sqlalchemy import Column, Integer, String
-from sqlmodel import Field, Relationship, SQLModel, create_engine
+from sqlmodel import Field, Relationship, SQLModel
 
 # Base
 
@@ -18,12 +21,27 @@ class BasePublic(SQLModel):
     updated_by_id: Optional[str] | None = Field(foreign_key="user.id")
 
 
+class Filter(BaseModel):
+    """Query parameters filtering the list endpoints."""
+
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def where(self: Self, model_type: type[SQLModel]) -> list:
+        conditions = []
+        if self.created_after is not None:
+            conditions.append(model_type.created_at >= self.created_after)
+        if self.created_before is not None:
+            conditions.append(model_type.created_at < self.created_before)
+        return conditions
+
+
 # Loan
 
 
 class LoanCreate(SQLModel):
-    customer_id: str = Field(foreign_key="customer.id")
-    book_id: str = Field(foreign_key="book.id")
+    customer_id: int = Field(foreign_key="customer.id")
+    book_id: int = Field(foreign_key="book.id")
 
 
 class LoanUpdate(SQLModel):
@@ -36,6 +54,19 @@ class LoanPublic(LoanCreate, BasePublic):
     )
 
 
+class LoanFilter(Filter):
+    customer_id: Optional[int] = None
+    book_id: Optional[int] = None
+
+    def where(self: Self, model_type: type[SQLModel]) -> list:
+        conditions = super().where(model_type)
+        if self.customer_id is not None:
+            conditions.append(model_type.customer_id == self.customer_id)
+        if self.book_id is not None:
+            conditions.append(model_type.book_id == self.book_id)
+        return conditions
+
+
 class Loan(LoanPublic, table=True):
     book: "Book" = Relationship(
         back_populates="loans",
@@ -298,6 +329,9 @@ class Book(BookPublic, table=True):
     )
 
 
+book_search = SearchIndex(Book, "Book", ["title", "author", "publisher"])
+
+
 # Result
 
 
@@ -325,8 +359,35 @@ class Token[Type: SQLModel](BaseModel):
 
 
 sqlite_file_name = "yalb.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-
-engine = create_engine(sqlite_url, echo=True)
+# SQLite or PostgreSQL with psycopg, see engine.py.
+db_url = os.environ.get(
+    "YALB_DB_URL", f"sqlite:///{sqlite_file_name}"
+)
+
+db_async = True
+pool_size = 5
+pool_max_overflow = 10
+pool_timeout = 30
+pool_recycle = 3600
+
+page_limit = 100
+page_limit_max = 1000
+bulk_limit_max = 10000
+
+_pool = dict(
+    echo=True,
+    pool_size=pool_size,
+    max_overflow=pool_max_overflow,
+    pool_timeout=pool_timeout,
+    pool_recycle=pool_recycle,
+)
+
+engine = create_db_engine(db_url, PRAGMAS, **_pool)
+
+# Used by the endpoints when db_async is set, see db.get_session.
+async_engine = (
+    create_db_async_engine(db_url, PRAGMAS, **_pool) if db_async else None
+)
 
 SQLModel.metadata.create_all(engine)
+book_search.create(engine)
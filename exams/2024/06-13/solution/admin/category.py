@@ -2,23 +2,25 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
 from model import (
     Category,
     CategoryCreate,
     CategoryPublic,
     CategoryUpdate,
+    Filter,
     Result,
     User,
 )
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Category"]
-    category = DB[Category](Category, "Category")
+    category = AsyncDB[Category](Category, "Category")
     allowed_roles_ids = ["admin"]
 
     def prefix(id: bool = False):
@@ -38,18 +40,24 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     category: CategoryCreate,
 ) -> Result:
-    return __db.category.create(category, current_user)
+    return await __db.category.create(category, current_user, session)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CategoryPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CategoryPublic]:
-    return __db.category.read_all()
+    return page.response(
+        await __db.category.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get(
@@ -61,9 +69,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> CategoryPublic:
-    return __db.category.read(id)
+    return await __db.category.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
@@ -71,10 +80,11 @@ async def update(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     category: CategoryUpdate,
 ) -> Result:
-    return __db.category.update(id, category, current_user)
+    return await __db.category.update(id, category, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
@@ -82,6 +92,7 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return __db.category.delete(id)
+    return await __db.category.delete(id, session)
@@ -0,0 +1,41 @@
+from enum import Enum
+from typing import Annotated, List
+
+from auth import RoleChecker
+from db import get_session, run_in_session
+from fastapi import Depends, Query
+from model import User, page_limit, page_limit_max, task_search
+from search import SearchHit
+from sqlmodel import Session
+
+from . import router
+
+
+class __db:
+    tags = ["Admin - Search"]
+    allowed_roles_ids = ["admin"]
+
+    def prefix(task: bool = False):
+        return "/search" + ("/task" if task else "")
+
+
+class __summary(str, Enum):
+    SEARCH_TASK = "Search all the tasks by name"
+
+
+@router.get(
+    __db.prefix(task=True),
+    tags=__db.tags,
+    summary=__summary.SEARCH_TASK,
+)
+async def search_task(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=page_limit_max)] = page_limit,
+) -> List[SearchHit]:
+    """Tasks with all the words of q (as prefixes), the best matches
+    first."""
+    return await run_in_session(session, task_search.search, q, limit=limit)
@@ -2,16 +2,17 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
-from model import Result, Tag, TagCreate, TagPublic, TagUpdate, User
+from model import Filter, Result, Tag, TagCreate, TagPublic, TagUpdate, User
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Tag"]
-    tag = DB[Tag](Tag, "Tag")
+    tag = AsyncDB[Tag](Tag, "Tag")
     allowed_roles_ids = ["admin"]
 
     def prefix(id: bool = False):
@@ -31,18 +32,24 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     tag: TagCreate,
 ) -> Result:
-    return __db.tag.create(tag, current_user)
+    return await __db.tag.create(tag, current_user, session)
 
 
 @router.get("/tag", tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TagPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TagPublic]:
-    return __db.tag.read_all()
+    return page.response(
+        await __db.tag.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
@@ -50,9 +57,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TagPublic:
-    return __db.tag.read(id)
+    return await __db.tag.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
@@ -60,10 +68,11 @@ async def update(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     tag: TagUpdate,
 ) -> Result:
-    return __db.tag.update(id, tag, current_user)
+    return await __db.tag.update(id, tag, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
@@ -71,6 +80,7 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return __db.tag.delete(id)
+    return await __db.tag.delete(id, session)
@@ -1,36 +1,63 @@
 from enum import Enum
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
+from db import AsyncDB, Page, Paginate, get_session, run_in_session
+from fastapi import Body, Depends
 from model import (
     Category,
+    CategoryStatsPublic,
     Result,
+    Status,
     Task,
     TaskCreate,
+    TaskFilter,
     TaskPublic,
+    TaskTransition,
     TaskUpdate,
     User,
+    bulk_limit_max,
 )
+from sqlmodel import Session
+from transition import (create_tasks, delete_tasks, read_history,
+                        read_stats, transition_tasks, update_tasks)
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Task"]
-    task = DB[Task](Task, "Task")
-    category = DB[Category](Category, "Category")
+    task = AsyncDB[Task](Task, "Task")
+    category = AsyncDB[Category](Category, "Category")
     allowed_roles_ids = ["admin"]
 
-    def prefix(id: bool = False):
-        return "/task" + ("/{id}" if id else "")
+    def prefix(
+        id: bool = False,
+        bulk: bool = False,
+        status: bool = False,
+        stats: bool = False,
+        history: bool = False,
+    ):
+        return (
+            "/task"
+            + ("/{id}" if id else "")
+            + ("/bulk" if bulk else "")
+            + ("/status" if status else "")
+            + ("/stats" if stats else "")
+            + ("/history" if history else "")
+        )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new task"
+    CREATE_BULK = "Insert new tasks"
+    UPDATE_BULK = "Update tasks"
+    DELETE_BULK = "Delete tasks"
     READ_ALL = "Get all the tasks"
+    STATUS = "Change the status of tasks"
+    STATS = "Get the task stats of the categories"
     READ = "Get the details of a task"
+    HISTORY = "Get the status history of a task"
     UPDATE = "Update a task"
     DELETE = "Delete a task"
 
@@ -40,19 +67,94 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     task: TaskCreate,
 ) -> Result:
-    __db.category.read(task.category_id)
-    return __db.task.create(task, current_user)
+    await __db.category.read(task.category_id, session)
+    return (
+        await run_in_session(session, create_tasks, [task], current_user)
+    )[0]
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    tasks: Annotated[List[TaskCreate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    await __db.category.check([task.category_id for task in tasks], session)
+    return await run_in_session(session, create_tasks, tasks, current_user)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    tasks: Annotated[Dict[int, TaskUpdate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    await __db.category.check(
+        [task.category_id for task in tasks.values()], session
+    )
+    return await run_in_session(session, update_tasks, tasks, current_user)
+
+
+@router.delete(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.DELETE_BULK
+)
+async def delete_bulk(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await run_in_session(session, delete_tasks, ids)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TaskPublic))],
+    filter: Annotated[TaskFilter, Depends()],
 ) -> List[TaskPublic]:
-    return __db.task.read_all()
+    return page.response(
+        await __db.task.read_all(session, page=page, filter=filter)
+    )
+
+
+@router.put(__db.prefix(status=True), tags=__db.tags, summary=__summary.STATUS)
+async def transition(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+    status: Annotated[Status, Body()],
+) -> List[Result]:
+    return await run_in_session(
+        session, transition_tasks, ids, status, current_user
+    )
+
+
+@router.get(__db.prefix(stats=True), tags=__db.tags, summary=__summary.STATS)
+async def stats(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+) -> List[CategoryStatsPublic]:
+    return await run_in_session(session, read_stats)
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
@@ -60,9 +162,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TaskPublic:
-    return __db.task.read(id)
+    return await __db.task.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
@@ -70,10 +173,28 @@ async def update(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     task: TaskUpdate,
 ) -> Result:
-    return __db.task.update(id, task, current_user)
+    return (
+        await run_in_session(session, update_tasks, {id: task}, current_user)
+    )[0]
+
+
+@router.get(
+    __db.prefix(id=True, history=True),
+    tags=__db.tags,
+    summary=__summary.HISTORY,
+)
+async def history(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> List[TaskTransition]:
+    return await run_in_session(session, read_history, id)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
@@ -81,6 +202,7 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return __db.task.delete(id)
+    return (await run_in_session(session, delete_tasks, [id]))[0]
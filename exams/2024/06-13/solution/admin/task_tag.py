@@ -2,18 +2,19 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
-from model import Result, Tag, Task, TaskTag, User
+from model import Filter, Result, Tag, Task, TaskTag, User
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Task / Tag"]
-    task_tag = DB[TaskTag](TaskTag, "TaskTag")
-    task = DB[Task](Task, "Task")
-    tag = DB[Tag](Tag, "Tag")
+    task_tag = AsyncDB[TaskTag](TaskTag, "TaskTag")
+    task = AsyncDB[Task](Task, "Task")
+    tag = AsyncDB[Tag](Tag, "Tag")
     allowed_roles_ids = ["admin"]
 
     def prefix(id: bool = False):
@@ -32,20 +33,26 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     task_tag: TaskTag,
 ) -> Result:
-    __db.task.read(task_tag.task_id)
-    __db.tag.read(task_tag.tag_id)
-    return __db.task_tag.create(task_tag, current_user)
+    await __db.task.read(task_tag.task_id, session)
+    await __db.tag.read(task_tag.tag_id, session)
+    return await __db.task_tag.create(task_tag, current_user, session)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TaskTag))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TaskTag]:
-    return __db.task_tag.read_all()
+    return page.response(
+        await __db.task_tag.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
@@ -53,9 +60,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TaskTag:
-    return __db.task_tag.read(id)
+    return await __db.task_tag.read(id, session)
 
 
 @router.delete(
@@ -67,7 +75,8 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    __db.task_tag.read(id)
-    return __db.task_tag.delete(id)
+    await __db.task_tag.read(id, session)
+    return await __db.task_tag.delete(id, session)
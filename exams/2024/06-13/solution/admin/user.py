@@ -2,16 +2,17 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Page, Paginate, get_session
 from fastapi import Depends
-from model import Result, User, UserCreate, UserPublic, UserUpdate
+from model import Filter, Result, User, UserCreate, UserPublic, UserUpdate
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - User"]
-    user = DB[User](User, "User")
+    user = AsyncDB[User](User, "User")
     allowed_roles_ids = ["admin"]
 
     def prefix(id: bool = False):
@@ -31,18 +32,24 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     user: UserCreate,
 ) -> Result:
-    return __db.user.create(user, current_user)
+    return await __db.user.create(user, current_user, session)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(UserPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[UserPublic]:
-    return __db.user.read_all()
+    return page.response(
+        await __db.user.read_all(session, page=page, filter=filter)
+    )
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
@@ -50,9 +57,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: str,
 ) -> UserPublic:
-    return __db.user.read(id)
+    return await __db.user.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
@@ -60,10 +68,11 @@ async def update(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: str,
     user: UserUpdate,
 ) -> Result:
-    return __db.user.update(id, user, current_user)
+    return await __db.user.update(id, user, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
@@ -71,6 +80,7 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: str,
 ) -> Result:
-    return __db.user.delete(id)
+    return await __db.user.delete(id, session)
@@ -1,12 +1,16 @@
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 import admin.category  # noqa: F401
+import admin.search  # noqa: F401
 import admin.tag  # noqa: F401
 import admin.task  # noqa: F401
 import admin.task_tag  # noqa: F401
 import admin.user  # noqa: F401
 import auth  # noqa: F401
 import me.category  # noqa: F401
+import me.search  # noqa: F401
 import me.tag  # noqa: F401
 import me.task  # noqa: F401
 import me.task_tag  # noqa: F401
@@ -14,14 +18,26 @@ from admin import router as router_admin
 from auth import router as router_auth
 from error import ConflictException, NotFoundException, exception_handler
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from me import router as router_me
+from model import async_engine
+from transition import rebuild_stats
 
 app_name = "yatms"
 
 logging.getLogger("passlib").setLevel(logging.ERROR)
 logger = logging.getLogger(app_name.lower())
 
-app = FastAPI(title=app_name.upper(), debug=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await run_in_threadpool(rebuild_stats)
+    yield
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+app = FastAPI(title=app_name.upper(), debug=True, lifespan=lifespan)
 
 app.include_router(router_me)
 app.include_router(router_admin)
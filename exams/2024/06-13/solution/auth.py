@@ -3,8 +3,10 @@ from typing import Annotated, List
 
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from model import Token, User, engine
+from db import get_session, run_in_session
+from model import Token, User
 from passlib.context import CryptContext
 from pydantic import ValidationError
 from sqlmodel import Session
@@ -23,16 +25,17 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 20
 REFRESH_TOKEN_EXPIRE_MINUTES = 120
 
 
-def get_user(username: str):
-    with Session(engine) as session:
-        return session.get(User, username)
+def get_user(username: str, session: Session):
+    return session.get(User, username)
 
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+async def authenticate_user(username: str, password: str, session: Session):
+    user = await run_in_session(session, get_user, username)
     if not user:
         return False
-    if not pwd_context.verify(password, user.password):
+    if not await run_in_threadpool(
+        pwd_context.verify, password, user.password
+    ):
         return False
     return user
 
@@ -48,7 +51,10 @@ def create_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    session: Annotated[Session, Depends(get_session)],
+):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -63,7 +69,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         raise credentials_exception
     except jwt.ExpiredSignatureError:
         raise credentials_exception
-    user = get_user(username)
+    user = await run_in_session(session, get_user, username)
     if user is None:
         raise credentials_exception
     return user
@@ -78,7 +84,8 @@ async def get_current_active_user(
 
 
 async def validate_refresh_token(
-    token: Annotated[str, Depends(oauth2_scheme)]
+    token: Annotated[str, Depends(oauth2_scheme)],
+    session: Annotated[Session, Depends(get_session)],
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -95,7 +102,7 @@ async def validate_refresh_token(
             raise credentials_exception
     except (jwt.DecodeError, ValidationError):
         raise credentials_exception
-    user = get_user(username)
+    user = await run_in_session(session, get_user, username)
     if user is None:
         raise credentials_exception
     return user, token
@@ -121,9 +128,12 @@ class RoleChecker:
 
 @router.post("/token")
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    session: Annotated[Session, Depends(get_session)],
 ) -> Token:
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(
+        form_data.username, form_data.password, session
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
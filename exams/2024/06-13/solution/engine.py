@@ -0,0 +1,141 @@
+from typing import Dict, Optional
+
+from sqlalchemy import URL, Engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import create_engine
+
+type Pragmas = Dict[str, str | int]
+
+# Profile of the connections of a server: with WAL the readers do not block
+# the writer (and vice versa), the writers wait each other up to
+# busy_timeout ms, and a commit does not wait for the disk (synchronous
+# NORMAL is durable with WAL but for a power loss).
+PRAGMAS: Pragmas = dict(
+    journal_mode="WAL",
+    busy_timeout=5000,
+    synchronous="NORMAL",
+    mmap_size=256 * 1024 * 1024,
+    cache_size=-64 * 1024,
+    temp_store="MEMORY",
+)
+
+
+def _read_only(url: URL) -> URL:
+    """URI of the SQLite database opened read-only (mode=ro)."""
+    database = url.database
+    if not database.startswith("file:"):
+        database = f"file:{database}"
+    return url.set(database=database).update_query_dict(
+        dict(mode="ro", uri="true")
+    )
+
+
+def _apply_pragmas(engine: Engine, pragmas: Pragmas, read_only: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                # Persistent in the file, set by the writers.
+                if read_only and name == "journal_mode":
+                    continue
+                cursor.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+
+def _connect_args(
+    url: URL, read_only: bool, prepare_threshold: Optional[int]
+) -> dict:
+    if url.get_driver_name() == "pysqlite":
+        return {"check_same_thread": False}
+    if url.get_backend_name() != "postgresql":
+        return {}
+    args = {}
+    if url.get_driver_name() == "psycopg":
+        args["prepare_threshold"] = prepare_threshold
+    if read_only:
+        args["options"] = "-c default_transaction_read_only=on"
+    return args
+
+
+def _create(
+    create: callable,
+    url: URL,
+    pragmas: Pragmas,
+    read_only: bool,
+    prepare_threshold: Optional[int],
+    poolclass: type,
+    kwargs: dict,
+) -> Engine | AsyncEngine:
+    sqlite = url.get_backend_name() == "sqlite"
+    engine = create(
+        _read_only(url) if sqlite and read_only else url,
+        poolclass=poolclass,
+        pool_pre_ping=True,
+        connect_args=_connect_args(url, read_only, prepare_threshold),
+        **kwargs,
+    )
+    if sqlite:
+        _apply_pragmas(
+            engine if isinstance(engine, Engine) else engine.sync_engine,
+            pragmas,
+            read_only,
+        )
+    return engine
+
+
+def create_db_engine(
+    url: str,
+    pragmas: Pragmas = PRAGMAS,
+    read_only: bool = False,
+    prepare_threshold: Optional[int] = 5,
+    **kwargs,
+) -> Engine:
+    """Engine of the SQLite or PostgreSQL database at url.
+
+    On SQLite the pragmas are set on each connection. On PostgreSQL with
+    psycopg a statement executed prepare_threshold times by a connection
+    is prepared on the server (None never).
+
+    A read_only engine (read replica) has connections of its own opened
+    read-only: on SQLite with WAL they read while the other engines write.
+    The other arguments are passed to create_engine, e.g. the pool size.
+    """
+    return _create(
+        create_engine,
+        make_url(url),
+        pragmas,
+        read_only,
+        prepare_threshold,
+        QueuePool,
+        kwargs,
+    )
+
+
+def create_db_async_engine(
+    url: str,
+    pragmas: Pragmas = PRAGMAS,
+    read_only: bool = False,
+    prepare_threshold: Optional[int] = 5,
+    **kwargs,
+) -> AsyncEngine:
+    """Same as create_db_engine with an async driver.
+
+    SQLite uses aiosqlite, psycopg has an async mode of its own.
+    """
+    _url = make_url(url)
+    if _url.get_backend_name() == "sqlite":
+        _url = _url.set(drivername="sqlite+aiosqlite")
+    return _create(
+        create_async_engine,
+        _url,
+        pragmas,
+        read_only,
+        prepare_threshold,
+        AsyncAdaptedQueuePool,
+        kwargs,
+    )
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Self
 
 from fastapi import Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 
 
@@ -18,15 +19,17 @@ class BaseException(Exception):
 
     def response(self: Self) -> JSONResponse:
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content=dict(
-                action=self.action,
-                target=self.target,
-                id=self.id,
-                error=True,
-                success=False,
-                timestamp=datetime.now()
-            )
+            status_code=self.status,
+            content=jsonable_encoder(
+                dict(
+                    action=self.action,
+                    target=self.target,
+                    id=self.id,
+                    error=True,
+                    success=False,
+                    timestamp=datetime.now()
+                )
+            ),
         )
 
 
@@ -38,7 +41,9 @@ async def exception_handler(
 
 class NotFoundException(BaseException):
     action = Action.NOT_FOUND
+    status = status.HTTP_404_NOT_FOUND
 
 
 class ConflictException(BaseException):
     action = Action.CONFLICT
+    status = status.HTTP_409_CONFLICT
@@ -2,31 +2,33 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Owner, Page, Paginate, get_session
 from fastapi import Depends
 from model import (
     Category,
     CategoryCreate,
     CategoryPublic,
     CategoryUpdate,
+    Filter,
     Result,
     User,
 )
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - Category"]
-    category = DB[Category](Category, "Category")
+    category = AsyncDB[Category](Category, "Category")
     allowed_roles_ids = ["admin", "user"]
 
     def prefix(id: bool = False, created: bool = False, updated: bool = False):
         return (
             "/category"
             + ("/{id}" if id else "")
-            + ("/{created}" if created else "")
-            + ("/{updated}" if updated else "")
+            + ("/created" if created else "")
+            + ("/updated" if updated else "")
         )
 
 
@@ -43,9 +45,10 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     category: CategoryCreate,
 ) -> Result:
-    return __db.category.create(category, current_user)
+    return await __db.category.create(category, current_user, session)
 
 
 @router.get(
@@ -57,8 +60,15 @@ async def read_all_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CategoryPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CategoryPublic]:
-    return current_user.categories_created
+    return page.response(
+        await __db.category.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -70,8 +80,19 @@ async def read_all_updated(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CategoryPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CategoryPublic]:
-    return current_user.categories_updated
+    return page.response(
+        await __db.category.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -83,9 +104,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> CategoryPublic:
-    return __db.category.read_personal(id, current_user.categories_created)
+    return await __db.category.read_personal(id, current_user, session)
 
 
 @router.put(
@@ -97,8 +119,9 @@ async def update(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     category: CategoryUpdate,
 ) -> Result:
-    __db.category.read_personal(id, current_user.categories_created)
-    return __db.category.update(id, category, current_user)
+    await __db.category.read_personal(id, current_user, session)
+    return await __db.category.update(id, category, current_user, session)
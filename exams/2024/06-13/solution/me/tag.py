@@ -2,24 +2,25 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Owner, Page, Paginate, get_session
 from fastapi import Depends
-from model import Result, Tag, TagCreate, TagPublic, TagUpdate, User
+from model import Filter, Result, Tag, TagCreate, TagPublic, TagUpdate, User
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - Tag"]
-    tag = DB[Tag](Tag, "Tag")
+    tag = AsyncDB[Tag](Tag, "Tag")
     allowed_roles_ids = ["admin", "user"]
 
     def prefix(id: bool = False, created: bool = False, updated: bool = False):
         return (
             "/tag"
             + ("/{id}" if id else "")
-            + ("/{created}" if created else "")
-            + ("/{updated}" if updated else "")
+            + ("/created" if created else "")
+            + ("/updated" if updated else "")
         )
 
 
@@ -36,9 +37,10 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     tag: TagCreate,
 ) -> Result:
-    return __db.tag.create(tag, current_user)
+    return await __db.tag.create(tag, current_user, session)
 
 
 @router.get(
@@ -50,8 +52,15 @@ async def read_all_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TagPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TagPublic]:
-    return current_user.tags_created
+    return page.response(
+        await __db.tag.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -63,8 +72,19 @@ async def read_all_updated(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TagPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TagPublic]:
-    return current_user.tags_updated
+    return page.response(
+        await __db.tag.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -76,9 +96,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TagPublic:
-    return __db.tag.read_personal(id, current_user.tags_created)
+    return await __db.tag.read_personal(id, current_user, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
@@ -86,8 +107,9 @@ async def me_update_tag(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     tag: TagUpdate,
 ) -> Result:
-    __db.tag.read_personal(id, current_user.tags_created)
-    return __db.tag.update(id, tag, current_user)
+    await __db.tag.read_personal(id, current_user, session)
+    return await __db.tag.update(id, tag, current_user, session)
@@ -2,33 +2,51 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
+from db import AsyncDB, Owner, Page, Paginate, get_session, run_in_session
+from fastapi import Body, Depends
 from model import (
     Category,
+    CategoryStatsPublic,
     Result,
+    Status,
     Task,
     TaskCreate,
+    TaskFilter,
     TaskPublic,
+    TaskTransition,
     TaskUpdate,
     User,
+    bulk_limit_max,
 )
+from sqlmodel import Session
+from transition import (create_tasks, read_history, read_stats,
+                        transition_tasks, update_tasks)
 
 from . import router
 
 
 class __db:
     tags = ["Me - Task"]
-    task = DB[Task](Task, "Task")
-    category = DB[Category](Category, "Category")
+    task = AsyncDB[Task](Task, "Task")
+    category = AsyncDB[Category](Category, "Category")
     allowed_roles_ids = ["admin", "user"]
 
-    def prefix(id: bool = False, created: bool = False, updated: bool = False):
+    def prefix(
+        id: bool = False,
+        created: bool = False,
+        updated: bool = False,
+        status: bool = False,
+        stats: bool = False,
+        history: bool = False,
+    ):
         return (
-            "/tag"
+            "/task"
             + ("/{id}" if id else "")
-            + ("/{created}" if created else "")
-            + ("/{updated}" if updated else "")
+            + ("/created" if created else "")
+            + ("/updated" if updated else "")
+            + ("/status" if status else "")
+            + ("/stats" if stats else "")
+            + ("/history" if history else "")
         )
 
 
@@ -36,7 +54,10 @@ class __summary(str, Enum):
     CREATE = "Insert a new task"
     READ_ALL_CREATED = "Get all the created task"
     READ_ALL_UPDATED = "Get all the updated task"
+    STATUS = "Change the status of tasks"
+    STATS = "Get the task stats of the created categories"
     READ = "Get the details of a task"
+    HISTORY = "Get the status history of a task"
     UPDATE = "Update a task"
 
 
@@ -45,13 +66,18 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     task: TaskCreate,
 ) -> Result:
-    __db.category.read_personal(
+    await __db.category.read_personal(
         task.category_id,
-        current_user.categories_created + current_user.categories_updated,
+        current_user,
+        session,
+        owners=[Owner.CREATED, Owner.UPDATED],
     )
-    return __db.task.create(task, current_user)
+    return (
+        await run_in_session(session, create_tasks, [task], current_user)
+    )[0]
 
 
 @router.get(
@@ -63,8 +89,15 @@ async def read_all_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TaskPublic))],
+    filter: Annotated[TaskFilter, Depends()],
 ) -> List[TaskPublic]:
-    return current_user.tasks_created
+    return page.response(
+        await __db.task.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -76,8 +109,48 @@ async def read_all_updated(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TaskPublic))],
+    filter: Annotated[TaskFilter, Depends()],
 ) -> List[TaskPublic]:
-    return current_user.tasks_updated
+    return page.response(
+        await __db.task.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
+
+
+@router.put(__db.prefix(status=True), tags=__db.tags, summary=__summary.STATUS)
+async def transition(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+    status: Annotated[Status, Body()],
+) -> List[Result]:
+    return await run_in_session(
+        session,
+        transition_tasks,
+        ids,
+        status,
+        current_user,
+        owner=current_user,
+    )
+
+
+@router.get(__db.prefix(stats=True), tags=__db.tags, summary=__summary.STATS)
+async def stats(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+) -> List[CategoryStatsPublic]:
+    return await run_in_session(session, read_stats, owner=current_user)
 
 
 @router.get(
@@ -89,9 +162,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TaskPublic:
-    return __db.task.read_personal(id, current_user.tasks_created)
+    return await __db.task.read_personal(id, current_user, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
@@ -99,8 +173,29 @@ async def update(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     task: TaskUpdate,
 ) -> Result:
-    __db.task.read_personal(id, current_user.tasks_created)
-    return __db.task.update(id, task, current_user)
+    return (
+        await run_in_session(
+            session, update_tasks, {id: task}, current_user, owner=current_user
+        )
+    )[0]
+
+
+@router.get(
+    __db.prefix(id=True, history=True),
+    tags=__db.tags,
+    summary=__summary.HISTORY,
+)
+async def history(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> List[TaskTransition]:
+    return await run_in_session(
+        session, read_history, id, owner=current_user
+    )
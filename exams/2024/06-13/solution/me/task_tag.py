@@ -2,26 +2,27 @@ from enum import Enum
 from typing import Annotated, List
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, Owner, Page, Paginate, get_session
 from fastapi import Depends
-from model import Result, Tag, Task, TaskTag, User
+from model import Filter, Result, Tag, Task, TaskTag, User
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - Task / Tag"]
-    task_tag = DB[TaskTag](TaskTag, "TaskTag")
-    task = DB[Task](Task, "Task")
-    tag = DB[Tag](Tag, "Task")
+    task_tag = AsyncDB[TaskTag](TaskTag, "TaskTag")
+    task = AsyncDB[Task](Task, "Task")
+    tag = AsyncDB[Tag](Tag, "Task")
     allowed_roles_ids = ["admin", "user"]
 
     def prefix(id: bool = False, created: bool = False, updated: bool = False):
         return (
             "/task-tag"
             + ("/{id}" if id else "")
-            + ("/{created}" if created else "")
-            + ("/{updated}" if updated else "")
+            + ("/created" if created else "")
+            + ("/updated" if updated else "")
         )
 
 
@@ -37,17 +38,22 @@ async def create(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     task_tag: TaskTag,
 ) -> Result:
-    __db.task.read_personal(
+    await __db.task.read_personal(
         task_tag.task_id,
-        current_user.tasks_created + current_user.tasks_updated,
+        current_user,
+        session,
+        owners=[Owner.CREATED, Owner.UPDATED],
     )
-    __db.tag.read_personal(
+    await __db.tag.read_personal(
         task_tag.tag_id,
-        current_user.tags_created + current_user.tags_updated,
+        current_user,
+        session,
+        owners=[Owner.CREATED, Owner.UPDATED],
     )
-    return __db.task_tag.create(task_tag, current_user)
+    return await __db.task_tag.create(task_tag, current_user, session)
 
 
 @router.get(
@@ -59,8 +65,15 @@ async def read_all_created(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TaskTag))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TaskTag]:
-    return current_user.task_tags_created
+    return page.response(
+        await __db.task_tag.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -72,9 +85,10 @@ async def read(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TaskTag:
-    return __db.task_tag.read_personal(id, current_user.task_tags_created)
+    return await __db.task_tag.read_personal(id, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
@@ -82,10 +96,8 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    __db.task_tag.read_personal(
-        id,
-        current_user.task_tags_created,
-    )
-    return __db.task_tag.delete(id)
+    await __db.task_tag.read_personal(id, current_user, session)
+    return await __db.task_tag.delete(id, session)
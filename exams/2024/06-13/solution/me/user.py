@@ -2,16 +2,17 @@ from enum import Enum
 from typing import Annotated
 
 from auth import RoleChecker
-from db import DB
+from db import AsyncDB, get_session
 from fastapi import Depends
 from model import Result, User, UserPublic
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - User"]
-    user = DB[User](User, "User")
+    user = AsyncDB[User](User, "User")
     allowed_roles_ids = ["admin", "user"]
 
     def prefix(id: bool = False, created: bool = False, updated: bool = False):
@@ -42,5 +43,6 @@ async def delete(
     current_user: Annotated[
         User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
     ],
+    session: Annotated[Session, Depends(get_session)],
 ) -> Result:
-    return __db.user.delete(current_user.id)
+    return await __db.user.delete(current_user.id, session)
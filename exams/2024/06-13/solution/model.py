@@ -1,11 +1,13 @@
+import os
 from datetime import datetime
 from enum import Enum
 from typing import List, Optional, Self
 
-from error import ConflictException
+from engine import PRAGMAS, create_db_async_engine, create_db_engine
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String
-from sqlmodel import Field, Relationship, SQLModel, create_engine
+from search import SearchIndex
+from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlmodel import Field, Relationship, SQLModel, select
 
 # Base
 
@@ -20,6 +22,21 @@ class BasePublic(SQLModel):
     updated_by_id: Optional[str] | None = Field(foreign_key="user.id")
 
 
+class Filter(BaseModel):
+    """Query parameters filtering the list endpoints."""
+
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def where(self: Self, model_type: type[SQLModel]) -> list:
+        conditions = []
+        if self.created_after is not None:
+            conditions.append(model_type.created_at >= self.created_after)
+        if self.created_before is not None:
+            conditions.append(model_type.created_at < self.created_before)
+        return conditions
+
+
 # TaskTag
 
 
@@ -52,16 +69,12 @@ class Status(Enum):
 class TaskCreate(SQLModel):
     name: str
     category_id: int = Field(foreign_key="category.id")
-    started_at: Optional[datetime] = Field(default=None)
-    completed_at: Optional[datetime] = Field(default=None)
 
 
 class TaskUpdate(SQLModel):
     name: Optional[str] = None
     category_id: Optional[int] = Field(foreign_key="category.id", default=None)
     status: Optional[Status] = Field(default=None)
-    started_at: Optional[datetime] = Field(default=None)
-    completed_at: Optional[datetime] = Field(default=None)
 
 
 class TaskPublic(TaskCreate, BasePublic):
@@ -69,6 +82,31 @@ class TaskPublic(TaskCreate, BasePublic):
         sa_column=Column("id", Integer, primary_key=True, autoincrement=True)
     )
     status: Status = Field(default=Status.TODO)
+    # Set by the status transitions only, see transition.py.
+    started_at: Optional[datetime] = Field(default=None)
+    completed_at: Optional[datetime] = Field(default=None)
+
+
+class TaskFilter(Filter):
+    status: Optional[Status] = None
+    category_id: Optional[int] = None
+    tag_id: Optional[int] = None
+
+    def where(self: Self, model_type: type[SQLModel]) -> list:
+        conditions = super().where(model_type)
+        if self.status is not None:
+            conditions.append(model_type.status == self.status)
+        if self.category_id is not None:
+            conditions.append(model_type.category_id == self.category_id)
+        if self.tag_id is not None:
+            conditions.append(
+                model_type.id.in_(
+                    select(TaskTag.task_id).where(
+                        TaskTag.tag_id == self.tag_id
+                    )
+                )
+            )
+        return conditions
 
 
 class Task(TaskPublic, table=True):
@@ -95,18 +133,28 @@ class Task(TaskPublic, table=True):
         },
     )
 
-    def additional_updates(self: Self) -> Self:
-        match self.status:
-            case Status.TODO:
-                self.started_at = None
-                self.completed_at = None
-            case Status.STARTED:
-                self.started_at = datetime.now()
-                self.completed_at = None
-            case Status.COMPLETED:
-                if self.started_at is None:
-                    raise ConflictException(target="Task", id=self.id)
-                self.completed_at = datetime.now()
+
+task_search = SearchIndex(Task, "Task", ["name"])
+
+
+# TaskTransition
+
+
+class TaskTransition(SQLModel, table=True):
+    """Change of the status of a task, from None when it is created.
+
+    The log is append-only (see transition.py): it is kept after the task
+    is deleted.
+    """
+
+    id: int = Field(
+        sa_column=Column("id", Integer, primary_key=True, autoincrement=True)
+    )
+    task_id: int = Field(index=True)
+    from_status: Optional[Status] = None
+    to_status: Status
+    created_at: datetime = Field(default_factory=datetime.now)
+    created_by_id: Optional[str] = Field(foreign_key="user.id")
 
 
 # Role
@@ -293,6 +341,58 @@ class Category(CategoryPublic, table=True):
     )
 
 
+# CategoryStats
+
+
+class CategoryStats(SQLModel, table=True):
+    """Tasks of a category by status (the column of Status.value).
+
+    cycle_time is the sum of the seconds from started_at to completed_at of
+    the completed tasks. Updated by each change of the tasks, see
+    transition.py.
+    """
+
+    category_id: int = Field(
+        sa_column=Column(
+            "category_id",
+            Integer,
+            ForeignKey("category.id", ondelete="CASCADE"),
+            primary_key=True,
+        )
+    )
+    todo: int = 0
+    started: int = 0
+    completed: int = 0
+    cycle_time: float = 0.0
+
+
+class CategoryStatsPublic(BaseModel):
+    category_id: int
+    todo: int = 0
+    started: int = 0
+    completed: int = 0
+    mean_cycle_time: Optional[float] = None
+
+    @classmethod
+    def of(
+        cls: type[Self], category_id: int, stats: Optional[CategoryStats]
+    ) -> Self:
+        """Mean cycle time in seconds, None without completed tasks."""
+        if stats is None:
+            return cls(category_id=category_id)
+        return cls(
+            category_id=category_id,
+            todo=stats.todo,
+            started=stats.started,
+            completed=stats.completed,
+            mean_cycle_time=(
+                stats.cycle_time / stats.completed
+                if stats.completed > 0
+                else None
+            ),
+        )
+
+
 # Tag
 
 
@@ -365,8 +465,35 @@ class Token[Type: SQLModel](BaseModel):
 
 
 sqlite_file_name = "yatms.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
-
-engine = create_engine(sqlite_url, echo=False)
+# SQLite or PostgreSQL with psycopg, see engine.py.
+db_url = os.environ.get(
+    "YATMS_DB_URL", f"sqlite:///{sqlite_file_name}"
+)
+
+db_async = True
+pool_size = 5
+pool_max_overflow = 10
+pool_timeout = 30
+pool_recycle = 3600
+
+page_limit = 100
+page_limit_max = 1000
+bulk_limit_max = 10000
+
+_pool = dict(
+    echo=False,
+    pool_size=pool_size,
+    max_overflow=pool_max_overflow,
+    pool_timeout=pool_timeout,
+    pool_recycle=pool_recycle,
+)
+
+engine = create_db_engine(db_url, PRAGMAS, **_pool)
+
+# Used by the endpoints when db_async is set, see db.get_session.
+async_engine = (
+    create_db_async_engine(db_url, PRAGMAS, **_pool) if db_async else None
+)
 
 SQLModel.metadata.create_all(engine)
+task_search.create(engine)
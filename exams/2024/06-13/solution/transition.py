@@ -0,0 +1,338 @@
+from collections import defaultdict
+from datetime import datetime
+from math import isclose
+from typing import Dict, List, Optional, Self, Sequence, Set
+
+from db import DB, Action, unit_of_work
+from error import ConflictException, NotFoundException
+from model import (Category, CategoryStats, CategoryStatsPublic, Result,
+                   Status, Task, TaskCreate, TaskTransition, TaskUpdate, User)
+from sqlalchemy import delete, false, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import lazyload, load_only
+from sqlmodel import Session, select
+
+# Status a task can move to from each status.
+TRANSITIONS: Dict[Status, Set[Status]] = {
+    Status.TODO: {Status.STARTED},
+    Status.STARTED: {Status.TODO, Status.COMPLETED},
+    Status.COMPLETED: {Status.TODO, Status.STARTED},
+}
+
+_db = DB[Task](Task, "Task")
+
+_ZERO: Dict[str, int | float] = dict(
+    todo=0, started=0, completed=0, cycle_time=0.0
+)
+
+
+class _Stats:
+    """Changes of the CategoryStats of a batch.
+
+    A task changed is removed before the change and added after it: the
+    changes are written with one UPDATE per category.
+    """
+
+    def __init__(self: Self) -> None:
+        self.deltas: Dict[int, Dict[str, int | float]] = defaultdict(
+            lambda: dict(_ZERO)
+        )
+
+    def add(self: Self, task: Task, sign: int = 1) -> None:
+        delta = self.deltas[task.category_id]
+        delta[task.status.value] += sign
+        if (
+            task.status == Status.COMPLETED
+            and task.started_at is not None
+            and task.completed_at is not None
+        ):
+            delta["cycle_time"] += (
+                sign * (task.completed_at - task.started_at).total_seconds()
+            )
+
+    def remove(self: Self, task: Task) -> None:
+        self.add(task, -1)
+
+    def apply(self: Self, session: Session) -> None:
+        deltas = {
+            id: delta
+            for id, delta in self.deltas.items()
+            if any(value != 0 for value in delta.values())
+        }
+        if len(deltas) == 0:
+            return
+        _insert = dict(sqlite=sqlite.insert, postgresql=postgresql.insert)[
+            session.get_bind().dialect.name
+        ]
+        session.execute(
+            _insert(CategoryStats)
+            .values([dict(category_id=id) for id in deltas])
+            .on_conflict_do_nothing(index_elements=["category_id"])
+        )
+        for id, delta in deltas.items():
+            session.execute(
+                update(CategoryStats)
+                .where(CategoryStats.category_id == id)
+                .values(
+                    {
+                        column: getattr(CategoryStats, column) + value
+                        for column, value in delta.items()
+                    }
+                )
+            )
+
+
+def _read(
+    ids: Sequence[int], session: Session, user: Optional[User] = None
+) -> Dict[int, Task]:
+    """Tasks with the ids (created by the user), read with one query."""
+    query = (
+        select(Task)
+        .where(Task.id.in_(set(ids)))
+        .options(lazyload("*"))
+    )
+    if user is not None:
+        query = query.where(Task.created_by_id == user.id)
+    tasks = {task.id: task for task in session.exec(query)}
+    missing = set(ids) - set(tasks)
+    if len(missing) > 0:
+        raise NotFoundException(target="Task", id=min(missing))
+    return tasks
+
+
+def _move(
+    task: Task, status: Status, user: User, now: datetime
+) -> TaskTransition:
+    """Change the status of the task, with its timestamps."""
+    if status not in TRANSITIONS[task.status] or (
+        status == Status.COMPLETED and task.started_at is None
+    ):
+        raise ConflictException(target="Task", id=task.id)
+    transition = TaskTransition(
+        task_id=task.id,
+        from_status=task.status,
+        to_status=status,
+        created_at=now,
+        created_by_id=user.id,
+    )
+    match status:
+        case Status.TODO:
+            task.started_at = None
+            task.completed_at = None
+        case Status.STARTED:
+            task.started_at = now
+            task.completed_at = None
+        case Status.COMPLETED:
+            task.completed_at = now
+    task.status = status
+    task.updated_by_id = user.id
+    return transition
+
+
+def create_tasks(
+    tasks: List[TaskCreate], user: User, session: Session
+) -> List[Result]:
+    """Insert the tasks (to do), logged as created."""
+    results = _db.create_all(tasks, user, session)
+    now = datetime.now()
+    stats = _Stats()
+    for task in tasks:
+        stats.deltas[task.category_id]["todo"] += 1
+    session.add_all(
+        TaskTransition(
+            task_id=result.id,
+            to_status=Status.TODO,
+            created_at=now,
+            created_by_id=user.id,
+        )
+        for result in results
+    )
+    session.flush()
+    stats.apply(session)
+    return results
+
+
+def update_tasks(
+    tasks: Dict[int, TaskUpdate],
+    user: User,
+    session: Session,
+    owner: Optional[User] = None,
+) -> List[Result]:
+    """Update the tasks (created by owner): a new status is a transition.
+
+    A task already in the status is not changed; a transition not allowed
+    raises ConflictException and nothing is updated.
+    """
+    tasks_db = _read(list(tasks), session, owner)
+    stats = _Stats()
+    for task_db in tasks_db.values():
+        stats.remove(task_db)
+    results = _db.update_all(
+        {
+            id: TaskUpdate(
+                **task.model_dump(exclude_unset=True, exclude={"status"})
+            )
+            for id, task in tasks.items()
+        },
+        user,
+        session,
+    )
+    now = datetime.now()
+    transitions = [
+        _move(tasks_db[id], task.status, user, now)
+        for id, task in tasks.items()
+        if task.status is not None and task.status != tasks_db[id].status
+    ]
+    for task_db in tasks_db.values():
+        stats.add(task_db)
+    session.add_all(transitions)
+    session.flush()
+    stats.apply(session)
+    return results
+
+
+def transition_tasks(
+    ids: List[int],
+    status: Status,
+    user: User,
+    session: Session,
+    owner: Optional[User] = None,
+) -> List[Result]:
+    """Move the tasks (created by owner) to the status, all or none.
+
+    The tasks already in the status are skipped: the results are of the
+    tasks moved.
+    """
+    tasks_db = _read(ids, session, owner)
+    now = datetime.now()
+    stats = _Stats()
+    transitions = []
+    for id in dict.fromkeys(ids):
+        task_db = tasks_db[id]
+        if task_db.status == status:
+            continue
+        stats.remove(task_db)
+        transitions.append(_move(task_db, status, user, now))
+        stats.add(task_db)
+    session.add_all(transitions)
+    session.flush()
+    stats.apply(session)
+    return [
+        Result(action=Action.UPDATED, target="Task", id=transition.task_id)
+        for transition in transitions
+    ]
+
+
+def delete_tasks(ids: List[int], session: Session) -> List[Result]:
+    """Delete the tasks, their transitions are kept."""
+    stats = _Stats()
+    for task_db in _read(ids, session).values():
+        stats.remove(task_db)
+    results = _db.delete_all(ids, session)
+    stats.apply(session)
+    return results
+
+
+def read_history(
+    id: int, session: Session, owner: Optional[User] = None
+) -> List[TaskTransition]:
+    """Transitions of the task (created by owner), oldest first.
+
+    The history of a deleted task is read without owner.
+    """
+    if owner is not None:
+        _read([id], session, owner)
+    transitions = session.exec(
+        select(TaskTransition)
+        .where(TaskTransition.task_id == id)
+        .order_by(TaskTransition.id)
+    ).all()
+    if len(transitions) == 0:
+        raise NotFoundException(target="Task", id=id)
+    return transitions
+
+
+def read_stats(
+    session: Session, owner: Optional[User] = None
+) -> List[CategoryStatsPublic]:
+    """Stats of the categories (created by owner), without the tasks."""
+    query = (
+        select(Category.id, CategoryStats)
+        .outerjoin(CategoryStats, CategoryStats.category_id == Category.id)
+        .order_by(Category.id)
+    )
+    if owner is not None:
+        query = query.where(Category.created_by_id == owner.id)
+    return [
+        CategoryStatsPublic.of(id, stats) for id, stats in session.exec(query)
+    ]
+
+
+def _lock_stats(session: Session) -> None:
+    """Hold the write lock of CategoryStats until the end of the
+    transaction: the changes of the tasks wait for it."""
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            text("LOCK TABLE categorystats IN SHARE ROW EXCLUSIVE MODE")
+        )
+    else:
+        # A write without rows starts the write transaction of SQLite.
+        session.execute(delete(CategoryStats).where(false()))
+
+
+def _scan(session: Session) -> _Stats:
+    """Stats of the categories computed from all the tasks."""
+    stats = _Stats()
+    for task in session.exec(
+        select(Task).options(
+            load_only(
+                Task.category_id,
+                Task.status,
+                Task.started_at,
+                Task.completed_at,
+            ),
+            lazyload("*"),
+        )
+    ):
+        stats.add(task)
+    return stats
+
+
+def _stale(session: Session, stats: _Stats) -> bool:
+    """True if the CategoryStats of a category are not the ones computed
+    from its tasks, e.g. of the tasks stored before them."""
+    stored = {
+        row.category_id: dict(
+            todo=row.todo,
+            started=row.started,
+            completed=row.completed,
+            cycle_time=row.cycle_time,
+        )
+        for row in session.exec(select(CategoryStats))
+    }
+    # The cycle times are sums of the same floats in another order.
+    return not all(
+        isclose(
+            stored.get(id, _ZERO)[column],
+            stats.deltas.get(id, _ZERO)[column],
+            abs_tol=1e-6,
+        )
+        for id in set(stored) | set(stats.deltas)
+        for column in _ZERO
+    )
+
+
+def rebuild_stats() -> None:
+    """Compute the CategoryStats from the tasks if they are stale.
+
+    One transaction with the write lock of the table: of the processes
+    starting together, the first rebuilds the stats, the other ones find
+    them up to date.
+    """
+    with unit_of_work() as session:
+        _lock_stats(session)
+        stats = _scan(session)
+        if not _stale(session, stats):
+            return
+        session.execute(delete(CategoryStats))
+        stats.apply(session)
@@ -1,33 +1,47 @@
 from enum import Enum
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
+from config import bulk_limit_max
+from db import AsyncDB, Page, Paginate, get_session
+from export import Format, stream
+from fastapi import Body, Depends, Header
+from fastapi.responses import StreamingResponse
 from model import (
     Category,
     CategoryCreate,
     CategoryPublic,
     CategoryUpdate,
+    Filter,
+    Principal,
     Result,
-    User,
 )
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Category"]
-    category = DB[Category](Category, "Category")
+    category = AsyncDB[Category](Category, "Category")
     allowed_roles_ids = ["admin"]
 
-    def prefix(id: bool = False):
-        return "/category" + ("/{id}" if id else "")
+    def prefix(id: bool = False, export: bool = False, bulk: bool = False):
+        return (
+            "/category"
+            + ("/{id}" if id else "")
+            + ("/export" if export else "")
+            + ("/bulk" if bulk else "")
+        )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new category"
+    CREATE_BULK = "Insert new categories"
+    UPDATE_BULK = "Update categories"
+    DELETE_BULK = "Delete categories"
     READ_ALL = "Get all the categories"
+    EXPORT = "Export all the categories"
     READ = "Get the details of a category"
     UPDATE = "Update a category"
     DELETE = "Delete a category"
@@ -36,20 +50,92 @@ class __summary(str, Enum):
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     category: CategoryCreate,
 ) -> Result:
-    return __db.category.create(category, current_user)
+    return await __db.category.create(category, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    categories: Annotated[
+        List[CategoryCreate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.category.create_all(categories, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    categories: Annotated[
+        Dict[int, CategoryUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.category.update_all(categories, current_user, session)
+
+
+@router.delete(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.DELETE_BULK
+)
+async def delete_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await __db.category.delete_all(ids, session)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CategoryPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CategoryPublic]:
-    return __db.category.read_all()
+    return page.response(
+        await __db.category.read_all(session, page=page, filter=filter)
+    )
+
+
+@router.get(__db.prefix(export=True), tags=__db.tags, summary=__summary.EXPORT)
+async def export(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    filter: Annotated[Filter, Depends()],
+    format: Format = Format.NDJSON,
+    accept_encoding: Annotated[str, Header()] = "",
+) -> StreamingResponse:
+    return stream(
+        __db.category.read_partitions(filter),
+        CategoryPublic,
+        format,
+        accept_encoding,
+    )
 
 
 @router.get(
@@ -59,29 +145,35 @@ async def read_all(
 )
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> CategoryPublic:
-    return __db.category.read(id)
+    return await __db.category.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     category: CategoryUpdate,
 ) -> Result:
-    return __db.category.update(id, category, current_user)
+    return await __db.category.update(id, category, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
 async def delete(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return __db.category.delete(id)
+    return await __db.category.delete(id, session)
@@ -0,0 +1,30 @@
+from enum import Enum
+from typing import Annotated
+
+from auth import LoginStats, RoleChecker, login_stats
+from fastapi import Depends
+from model import Principal
+
+from . import router
+
+
+class __db:
+    tags = ["Admin - Login"]
+    allowed_roles_ids = ["admin"]
+
+    def prefix():
+        return "/login"
+
+
+class __summary(str, Enum):
+    READ = "Get the status of the password pool and of the login limiter"
+
+
+@router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ)
+async def read(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ]
+) -> LoginStats:
+    return login_stats()
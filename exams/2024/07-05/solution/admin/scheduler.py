@@ -0,0 +1,31 @@
+from enum import Enum
+from typing import Annotated
+
+from auth import RoleChecker
+from fastapi import Depends
+from model import Principal
+from scheduler import SchedulerStats, scheduler
+
+from . import router
+
+
+class __db:
+    tags = ["Admin - Scheduler"]
+    allowed_roles_ids = ["admin"]
+
+    def prefix():
+        return "/scheduler"
+
+
+class __summary(str, Enum):
+    READ = "Get the status of the command scheduler"
+
+
+@router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ)
+async def read(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ]
+) -> SchedulerStats:
+    return scheduler.stats()
@@ -1,26 +1,40 @@
 from enum import Enum
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
-from model import Result, Tag, TagCreate, TagPublic, TagUpdate, User
+from config import bulk_limit_max
+from db import AsyncDB, Page, Paginate, get_session
+from export import Format, stream
+from fastapi import Body, Depends, Header
+from fastapi.responses import StreamingResponse
+from model import (Filter, Principal, Result, Tag, TagCreate, TagPublic,
+                   TagUpdate)
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Tag"]
-    tag = DB[Tag](Tag, "Tag")
+    tag = AsyncDB[Tag](Tag, "Tag")
     allowed_roles_ids = ["admin"]
 
-    def prefix(id: bool = False):
-        return "/tag" + ("/{id}" if id else "")
+    def prefix(id: bool = False, export: bool = False, bulk: bool = False):
+        return (
+            "/tag"
+            + ("/{id}" if id else "")
+            + ("/export" if export else "")
+            + ("/bulk" if bulk else "")
+        )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new tag"
+    CREATE_BULK = "Insert new tags"
+    UPDATE_BULK = "Update tags"
+    DELETE_BULK = "Delete tags"
     READ_ALL = "Get all the tags"
+    EXPORT = "Export all the tags"
     READ = "Get the details of a tag"
     UPDATE = "Update a tag"
     DELETE = "Delete a tag"
@@ -29,48 +43,123 @@ class __summary(str, Enum):
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     tag: TagCreate,
 ) -> Result:
-    return __db.tag.create(tag, current_user)
+    return await __db.tag.create(tag, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    tags: Annotated[List[TagCreate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await __db.tag.create_all(tags, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    tags: Annotated[
+        Dict[int, TagUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.tag.update_all(tags, current_user, session)
+
+
+@router.delete(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.DELETE_BULK
+)
+async def delete_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await __db.tag.delete_all(ids, session)
 
 
 @router.get("/tag", tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TagPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TagPublic]:
-    return __db.tag.read_all()
+    return page.response(
+        await __db.tag.read_all(session, page=page, filter=filter)
+    )
+
+
+@router.get(__db.prefix(export=True), tags=__db.tags, summary=__summary.EXPORT)
+async def export(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    filter: Annotated[Filter, Depends()],
+    format: Format = Format.NDJSON,
+    accept_encoding: Annotated[str, Header()] = "",
+) -> StreamingResponse:
+    return stream(
+        __db.tag.read_partitions(filter),
+        TagPublic,
+        format,
+        accept_encoding,
+    )
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TagPublic:
-    return __db.tag.read(id)
+    return await __db.tag.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     tag: TagUpdate,
 ) -> Result:
-    return __db.tag.update(id, tag, current_user)
+    return await __db.tag.update(id, tag, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
 async def delete(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=["admin"]))
+        Principal, Depends(RoleChecker(allowed_role_ids=["admin"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return __db.tag.delete(id)
+    return await __db.tag.delete(id, session)
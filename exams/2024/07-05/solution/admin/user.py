@@ -1,26 +1,37 @@
 from enum import Enum
 from typing import Annotated, List
 
-from auth import RoleChecker
-from db import DB
-from fastapi import Depends
-from model import Result, User, UserCreate, UserPublic, UserUpdate
+from auth import RoleChecker, principal_cache
+from db import AsyncDB, Page, Paginate, after_commit, get_session
+from export import Format, stream
+from fastapi import Depends, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from model import (Filter, Principal, Result, User, UserCreate, UserPublic,
+                   UserUpdate)
+from refresh import refresh_tokens
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - User"]
-    user = DB[User](User, "User")
+    user = AsyncDB[User](User, "User")
     allowed_roles_ids = ["admin"]
 
-    def prefix(id: bool = False):
-        return "/user" + ("/{id}" if id else "")
+    def prefix(id: bool = False, export: bool = False):
+        return (
+            "/user"
+            + ("/{id}" if id else "")
+            + ("/export" if export else "")
+        )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new user"
     READ_ALL = "Get all the users"
+    EXPORT = "Export all the users"
     READ = "Get the details of a user"
     UPDATE = "Update a user"
     DELETE = "Delete a user"
@@ -29,48 +40,89 @@ class __summary(str, Enum):
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     user: UserCreate,
 ) -> Result:
-    return __db.user.create(user, current_user)
+    return await __db.user.create(user, current_user, session)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(UserPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[UserPublic]:
-    return __db.user.read_all()
+    return page.response(
+        await __db.user.read_all(session, page=page, filter=filter)
+    )
+
+
+@router.get(__db.prefix(export=True), tags=__db.tags, summary=__summary.EXPORT)
+async def export(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    filter: Annotated[Filter, Depends()],
+    format: Format = Format.NDJSON,
+    accept_encoding: Annotated[str, Header()] = "",
+) -> StreamingResponse:
+    return stream(
+        __db.user.read_partitions(filter),
+        UserPublic,
+        format,
+        accept_encoding,
+    )
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: str,
 ) -> UserPublic:
-    return __db.user.read(id)
+    return await __db.user.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
+        Principal, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: str,
     user: UserUpdate,
 ) -> Result:
-    return __db.user.update(id, user, current_user)
+    if user.disabled:
+        # Before the update: the store commits on its own connection.
+        await run_in_threadpool(refresh_tokens.revoke_user, id)
+    result = await __db.user.update(id, user, current_user, session)
+    # After the commit of the request: a request reading the user meanwhile
+    # would cache it again.
+    after_commit(session, lambda: principal_cache.invalidate(id))
+    return result
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
 async def delete(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: str,
 ) -> Result:
-    return __db.user.delete(id)
+    await run_in_threadpool(refresh_tokens.revoke_user, id)
+    result = await __db.user.delete(id, session)
+    after_commit(session, lambda: principal_cache.invalidate(id))
+    return result
@@ -1,90 +1,187 @@
 from enum import Enum
-from threading import Thread
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB, Action
-from fastapi import Depends
-from model import (Command, Result, User, Workflow, WorkflowCreate,
-                   WorkflowPublic, WorkflowUpdate)
-from utils import threaded
+from config import bulk_limit_max
+from dag import Dag, WorkflowExecution, stop_workflow
+from db import (AsyncDB, Action, Page, Paginate, get_session, profile,
+                run_in_session)
+from export import Format, stream
+from fastapi import Body, Depends, Header
+from fastapi.responses import StreamingResponse
+from model import (Command, CriticalPath, Filter, Principal, Result,
+                   Workflow, WorkflowCreate, WorkflowPublic, WorkflowUpdate)
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Admin - Workflow"]
-    workflow = DB[Workflow](Workflow, "Workflow")
-    command = DB[Command](Command, "Command")
+    workflow = AsyncDB[Workflow](Workflow, "Workflow")
+    command = AsyncDB[Command](Command, "Command")
     allowed_roles_ids = ["admin"]
 
-    def prefix(id: bool = False, start: bool = False, stop: bool = False):
+    def prefix(
+        id: bool = False,
+        start: bool = False,
+        stop: bool = False,
+        critical_path: bool = False,
+        export: bool = False,
+        bulk: bool = False,
+    ):
         return (
             "/workflow"
             + ("/{id}" if id else "")
             + ("/start" if start else "")
             + ("/stop" if stop else "")
+            + ("/critical-path" if critical_path else "")
+            + ("/export" if export else "")
+            + ("/bulk" if bulk else "")
         )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new workflow"
+    CREATE_BULK = "Insert new workflows"
+    UPDATE_BULK = "Update workflows"
+    DELETE_BULK = "Delete workflows"
     READ_ALL = "Get all the workflow"
+    EXPORT = "Export all the workflows"
     READ = "Get the details of a workflow"
     UPDATE = "Update a workflow"
     DELETE = "Delete a workflow"
     START = "Start a workflow"
     STOP = "Stop a workflow"
+    CRITICAL_PATH = "Get the critical path of a workflow"
 
 
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     workflow: WorkflowCreate,
 ) -> Result:
-    return __db.workflow.create(workflow, current_user)
+    return await __db.workflow.create(workflow, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    workflows: Annotated[
+        List[WorkflowCreate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.workflow.create_all(workflows, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    workflows: Annotated[
+        Dict[int, WorkflowUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.workflow.update_all(workflows, current_user, session)
+
+
+@router.delete(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.DELETE_BULK
+)
+async def delete_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await __db.workflow.delete_all(ids, session)
 
 
 @router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
 async def read_all(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
-    ]
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(WorkflowPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[WorkflowPublic]:
-    return __db.workflow.read_all()
+    return page.response(
+        await __db.workflow.read_all(session, page=page, filter=filter)
+    )
+
+
+@router.get(__db.prefix(export=True), tags=__db.tags, summary=__summary.EXPORT)
+async def export(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    filter: Annotated[Filter, Depends()],
+    format: Format = Format.NDJSON,
+    accept_encoding: Annotated[str, Header()] = "",
+) -> StreamingResponse:
+    return stream(
+        __db.workflow.read_partitions(filter),
+        WorkflowPublic,
+        format,
+        accept_encoding,
+    )
 
 
 @router.get(__db.prefix(id=True), tags=__db.tags, summary=__summary.READ)
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> WorkflowPublic:
-    return __db.workflow.read(id)
+    return await __db.workflow.read(id, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     workflow: WorkflowUpdate,
 ) -> Result:
-    return __db.workflow.update(id, workflow, current_user)
+    return await __db.workflow.update(id, workflow, current_user, session)
 
 
 @router.delete(__db.prefix(id=True), tags=__db.tags, summary=__summary.DELETE)
 async def delete(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return __db.workflow.delete(id)
+    return await __db.workflow.delete(id, session)
 
 
 @router.put(
@@ -92,11 +189,14 @@ async def delete(
 )
 async def start(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
+    priority: int = 0,
 ) -> Result:
-    return _execute(id, Action.STARTED, current_user)
+    return await _execute(id, Action.STARTED, current_user, session, priority)
 
 
 @router.put(
@@ -104,38 +204,59 @@ async def start(
 )
 async def stop(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return _execute(id, Action.STOPPED, current_user)
-
-
-def _execute(id: str, action: Action, current_user: User):
-    workflow = __db.workflow.read(id).check_not_empty()
-    for command in workflow.commands:
-        match action:
-            case Action.STARTED:
-                _t = command.start()
-                command.started_by_id = current_user
-                _waiting_execution(_t, command, current_user)
-            case Action.STOPPED:
-                command.stop()
-                command.stopped_by_id = current_user
-        __db.command.update(command.id, command, current_user)
+    return await _execute(id, Action.STOPPED, current_user, session)
+
+
+@router.get(
+    __db.prefix(id=True, critical_path=True),
+    tags=__db.tags,
+    summary=__summary.CRITICAL_PATH,
+)
+async def read_critical_path(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> CriticalPath:
+    workflow = await __db.workflow.read(
+        id, session, profile(Workflow.commands)
+    )
+    dag = await run_in_session(session, Dag.of, workflow)
+    return dag.critical_path()
+
+
+async def _execute(
+    id: int,
+    action: Action,
+    current_user: Principal,
+    session: Session,
+    priority: int = 0,
+) -> Result:
+    workflow = await __db.workflow.read(
+        id, session, profile(Workflow.commands)
+    )
+    workflow.check_not_empty()
+    match action:
+        case Action.STARTED:
+            dag = await run_in_session(session, Dag.of, workflow)
+            execution = WorkflowExecution(dag, current_user, priority)
+            await run_in_session(session, execution.start)
+        case Action.STOPPED:
+            await run_in_session(
+                session, stop_workflow, workflow, current_user
+            )
     return Result(
         action=action,
-        target=workflow.model_text,
+        target=__db.workflow.model_text,
         id=workflow.id,
     )
 
-
-@threaded
-def _waiting_execution(
-    thread: Thread, command: Command, current_user: User
-) -> None:
-    if thread.is_alive():
-        thread.join()
-        __db.command.update(command.id, command, current_user)
-
 # FIXME avoid repeating code in me and admin
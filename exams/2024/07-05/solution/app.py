@@ -1,24 +1,68 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 import admin.category  # noqa: F401
 import admin.command  # noqa: F401
+import admin.login  # noqa: F401
+import admin.scheduler  # noqa: F401
+import admin.search  # noqa: F401
 import admin.tag  # noqa: F401
 import admin.user  # noqa: F401
 import admin.workflow  # noqa: F401
 import auth  # noqa: F401
 import me.category  # noqa: F401
 import me.command  # noqa: F401
+import me.search  # noqa: F401
 import me.tag  # noqa: F401
 import me.workflow  # noqa: F401
 from admin import router as router_admin
 from auth import router as router_auth
-from config import app_name, debug, logger  # noqa: F401
-from error import ConflictException, NotFoundException, exception_handler
+from config import (app_name, debug, job_stop_grace, logger,  # noqa: F401
+                    metrics_debug_timing)
+from db import unit_of_work
+from error import (ConflictException, NotFoundException,
+                   TooManyRequestsException, exception_handler)
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from jobs import jobs
 from me import router as router_me
+from metrics import MetricsMiddleware, instrument, metrics
+from metrics import router as router_metrics
+from model import async_engine, async_read_engine, engine, read_engine
+from password import passwords
+from worker import worker
+
+
+def recover() -> None:
+    with unit_of_work() as session:
+        jobs.recover(session)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await run_in_threadpool(recover)
+    worker.wake()
+    yield
+    await run_in_threadpool(worker.shutdown, job_stop_grace)
+    passwords.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+for _engine in {engine, read_engine}:
+    instrument(_engine)
+for _engine in {async_engine, async_read_engine} - {None}:
+    instrument(_engine.sync_engine)
 
-app = FastAPI(title=app_name, debug=debug)
+app = FastAPI(title=app_name, debug=debug, lifespan=lifespan)
 
 app.include_router(router_me)
 app.include_router(router_admin)
 app.include_router(router_auth)
+app.include_router(router_metrics)
+app.add_middleware(
+    MetricsMiddleware, metrics=metrics, debug_timing=metrics_debug_timing
+)
 app.add_exception_handler(NotFoundException, exception_handler)
 app.add_exception_handler(ConflictException, exception_handler)
+app.add_exception_handler(TooManyRequestsException, exception_handler)
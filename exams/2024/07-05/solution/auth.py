@@ -1,38 +1,116 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, List
+from threading import Lock
+from time import time
+from typing import Annotated, List, Self, Tuple
+from uuid import uuid4
 
 import jwt
-from fastapi import APIRouter, Depends, HTTPException, status
+from config import (login_burst, login_limiter_size, login_rate,
+                    principal_cache_size, principal_cache_ttl)
+from db import get_session, run_in_session
+from error import TooManyRequestsException
+from fastapi import (APIRouter, Depends, HTTPException, Request, WebSocket,
+                     WebSocketException, status)
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from model import Token, User, engine
-from passlib.context import CryptContext
-from pydantic import ValidationError
-from sqlmodel import Session
+from fastapi.security.utils import get_authorization_scheme_param
+from limiter import LimiterStats, RateLimiter
+from model import Principal, Token, User
+from password import PasswordStats, passwords
+from pydantic import BaseModel, ValidationError
+from refresh import refresh_tokens
+from sqlmodel import Session, select
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 SECRET_KEY = "hdhfh5jdnb7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 
-refresh_tokens = []
-
 ACCESS_TOKEN_EXPIRE_MINUTES = 20
 REFRESH_TOKEN_EXPIRE_MINUTES = 120
 
 
-def get_user(username: str):
-    with Session(engine) as session:
-        return session.get(User, username)
+class PrincipalCache:
+    """Principals of the access tokens already verified, by token id.
+
+    An entry lives principal_cache_ttl seconds at most and never beyond the
+    expiration of its token; updating or deleting the user evicts it.
+    """
+
+    def __init__(self: Self, ttl: float, size: int) -> None:
+        self.ttl = ttl
+        self.size = size
+        self._lock = Lock()
+        self._entries: OrderedDict[str, Tuple[Principal, float]] = (
+            OrderedDict()
+        )
+
+    def get(self: Self, key: str) -> Principal | None:
+        with self._lock:
+            principal, expires_at = self._entries.get(key, (None, 0))
+            if principal is not None and expires_at <= time():
+                del self._entries[key]
+                return None
+            return principal
+
+    def put(self: Self, key: str, principal: Principal, exp: float) -> None:
+        with self._lock:
+            self._entries[key] = (principal, min(time() + self.ttl, exp))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self: Self, user_id: str) -> None:
+        with self._lock:
+            for key in [
+                key
+                for key, (principal, _) in self._entries.items()
+                if principal.id == user_id
+            ]:
+                del self._entries[key]
+
+
+principal_cache = PrincipalCache(
+    ttl=principal_cache_ttl, size=principal_cache_size
+)
+
+# Login attempts of each client address and of each username.
+login_limiter = RateLimiter(
+    rate=login_rate, burst=login_burst, size=login_limiter_size
+)
+
 
+class LoginStats(BaseModel):
+    passwords: PasswordStats
+    limiter: LimiterStats
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+
+def login_stats() -> LoginStats:
+    return LoginStats(
+        passwords=passwords.stats(), limiter=login_limiter.stats()
+    )
+
+
+def get_user(username: str, session: Session):
+    return session.get(User, username)
+
+
+def get_principal(username: str, session: Session) -> Principal | None:
+    """Only the columns needed to authorize the request, no relationships."""
+    row = session.exec(
+        select(User.id, User.role_id, User.disabled).where(User.id == username)
+    ).first()
+    return Principal.model_validate(row._asdict()) if row else None
+
+
+async def authenticate_user(username: str, password: str, session: Session):
+    user = await run_in_session(session, get_user, username)
     if not user:
         return False
-    if not pwd_context.verify(password, user.password):
+    if not await passwords.verify(password, user.password):
         return False
     return user
 
@@ -43,12 +121,15 @@ def create_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    session: Annotated[Session, Depends(get_session)],
+):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -63,14 +144,18 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         raise credentials_exception
     except jwt.ExpiredSignatureError:
         raise credentials_exception
-    user = get_user(username)
+    key = payload.get("jti", token)
+    user = principal_cache.get(key)
     if user is None:
-        raise credentials_exception
+        user = await run_in_session(session, get_principal, username)
+        if user is None:
+            raise credentials_exception
+        principal_cache.put(key, user, payload.get("exp", 0))
     return user
 
 
 async def get_current_active_user(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[Principal, Depends(get_current_user)]
 ):
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -78,27 +163,28 @@ async def get_current_active_user(
 
 
 async def validate_refresh_token(
-    token: Annotated[str, Depends(oauth2_scheme)]
+    token: Annotated[str, Depends(oauth2_scheme)],
+    session: Annotated[Session, Depends(get_session)],
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
     try:
-        if token in refresh_tokens:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            username: str = payload.get("sub")
-            role: str = payload.get("role")
-            if username is None or role is None:
-                raise credentials_exception
-        else:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username: str = payload.get("sub")
+        role: str = payload.get("role")
+        if username is None or role is None:
             raise credentials_exception
-    except (jwt.DecodeError, ValidationError):
+    except (jwt.DecodeError, jwt.ExpiredSignatureError, ValidationError):
         raise credentials_exception
-    user = get_user(username)
-    if user is None:
+    found = await run_in_threadpool(refresh_tokens.use, token)
+    if found is None or found.user_id != username:
         raise credentials_exception
-    return user, token
+    user = await run_in_session(session, get_principal, username)
+    if user is None or user.disabled:
+        raise credentials_exception
+    return user, found.family
 
 
 class RoleChecker:
@@ -109,8 +195,8 @@ class RoleChecker:
 
     def __call__(
         self: "RoleChecker",
-        user: Annotated[User, Depends(get_current_active_user)],
-    ) -> User:
+        user: Annotated[Principal, Depends(get_current_active_user)],
+    ) -> Principal:
         if user.role_id in self.allowed_role_ids:
             return user
         raise HTTPException(
@@ -119,17 +205,62 @@ class RoleChecker:
         )
 
 
+class WebSocketRoleChecker(RoleChecker):
+    """RoleChecker of the WebSocket handshakes.
+
+    Browsers can not set the headers of a WebSocket: the access token can
+    also be passed in the token query parameter. The connection is closed
+    (policy violation) if it is not authorized.
+    """
+
+    async def __call__(
+        self: "WebSocketRoleChecker",
+        websocket: WebSocket,
+        session: Annotated[Session, Depends(get_session)],
+        token: str | None = None,
+    ) -> Principal:
+        scheme, param = get_authorization_scheme_param(
+            websocket.headers.get("Authorization")
+        )
+        if scheme.lower() == "bearer":
+            token = param
+        try:
+            if token is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+            user = await get_current_user(token, session)
+            return super().__call__(await get_current_active_user(user))
+        except HTTPException as e:
+            raise WebSocketException(
+                code=status.WS_1008_POLICY_VIOLATION, reason=e.detail
+            )
+
+
 @router.post("/token")
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    session: Annotated[Session, Depends(get_session)],
 ) -> Token:
-    user = authenticate_user(form_data.username, form_data.password)
+    address = request.client.host if request.client else ""
+    if not (
+        login_limiter.acquire(f"address:{address}")
+        and login_limiter.acquire(f"user:{form_data.username}")
+    ):
+        raise TooManyRequestsException(target="Login", id=form_data.username)
+    user = await authenticate_user(
+        form_data.username, form_data.password, session
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
 
+    return await create_tokens(user, family=uuid4().hex)
+
+
+async def create_tokens(user: Principal, family: str) -> Token:
+    """Access token and refresh token of the family, stored."""
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
 
@@ -141,24 +272,21 @@ async def login_for_access_token(
         data={"sub": user.id, "role": user.role_id},
         expires_delta=refresh_token_expires,
     )
-    refresh_tokens.append(refresh_token)
+    await run_in_threadpool(
+        refresh_tokens.add,
+        refresh_token,
+        user.id,
+        family,
+        datetime.now() + refresh_token_expires,
+    )
     return Token(access_token=access_token, refresh_token=refresh_token)
 
 
 @router.post("/refresh")
 async def refresh_access_token(
-    token_data: Annotated[tuple[User, str], Depends(validate_refresh_token)]
-):
-    user, token = token_data
-    access_token = create_token(
-        data={"sub": user.id, "role": user.role_id},
-        expires_delta=ACCESS_TOKEN_EXPIRE_MINUTES,
-    )
-    refresh_token = create_token(
-        data={"sub": user.id, "role": user.role_di},
-        expires_delta=ACCESS_TOKEN_EXPIRE_MINUTES,
-    )
-
-    refresh_tokens.remove(token)
-    refresh_tokens.append(refresh_token)
-    return Token(access_token=access_token, refresh_token=refresh_token)
+    token_data: Annotated[
+        tuple[Principal, str], Depends(validate_refresh_token)
+    ]
+) -> Token:
+    user, family = token_data
+    return await create_tokens(user, family)
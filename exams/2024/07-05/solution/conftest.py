@@ -1,7 +1,49 @@
-import pytest  # noqa: F401
-from app import app
-from fastapi.testclient import TestClient
-from funcy import project
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import Callable, Iterator
+
+from sqlalchemy import create_engine, make_url, text
+
+
+def worker_database() -> None:
+    """On PostgreSQL (YAWMS_DB_URL) each xdist worker has a new database."""
+    url = os.environ.get("YAWMS_DB_URL")
+    if url is None or make_url(url).get_backend_name() == "sqlite":
+        return
+    url = make_url(url)
+    url = url.set(
+        database=f"{url.database}_"
+        f"{os.environ.get('PYTEST_XDIST_WORKER', 'main')}"
+    )
+    server = create_engine(
+        url.set(database="postgres"), isolation_level="AUTOCOMMIT"
+    )
+    with server.connect() as conn:
+        conn.execute(
+            text(f'DROP DATABASE IF EXISTS "{url.database}" WITH (FORCE)')
+        )
+        conn.execute(text(f'CREATE DATABASE "{url.database}"'))
+    server.dispose()
+    os.environ["YAWMS_DB_URL"] = url.render_as_string(hide_password=False)
+
+
+# Before the app, see config.testing: YAWMS_TESTING=0 runs the tests on
+# yawms.db, seeded by yawms_init_data.py.
+os.environ.setdefault("YAWMS_TESTING", "1")
+worker_database()
+
+import pytest  # noqa: E402
+from app import app  # noqa: E402
+from auth import login_limiter  # noqa: E402
+from config import testing  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from funcy import project  # noqa: E402
+from logstore import logs  # noqa: E402
+from model import engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+from yawms_init_data import init_data  # noqa: E402
 
 client = TestClient(app)
 
@@ -15,8 +57,76 @@ def pytest_configure():
     pytest.data = {"admin": {}, "alexcarrega": {}}
 
 
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(items: list) -> None:
+    """Tests sharing data run in the same worker (pytest-xdist loadgroup).
+
+    They are the tests of a module, split by user (e.g. in TestAPP).
+    """
+    for item in items:
+        group = item.module.__name__
+        callspec = getattr(item, "callspec", None)
+        if callspec is not None and "username" in callspec.params:
+            group = f"{group}-{callspec.params['username']}"
+        item.add_marker(pytest.mark.xdist_group(group))
+
+
+@pytest.fixture(scope="session")
+def restore() -> Iterator[Callable[[], None] | None]:
+    """Restore of the database seeded once per process.
+
+    The in-memory SQLite database is copied with the SQLite backup API, on
+    PostgreSQL the tables are truncated and seeded again.
+    """
+    if not testing:
+        yield None
+        return
+    path, logs.path = logs.path, tempfile.mkdtemp(prefix="yawms-logs-")
+    init_data()
+    if engine.dialect.name == "sqlite":
+        # Checked out for the session: the database lives while it is open.
+        connection = engine.raw_connection()
+        template = sqlite3.connect(":memory:")
+        connection.driver_connection.backup(template)
+
+        def _restore() -> None:
+            _connection = engine.raw_connection()
+            try:
+                template.backup(_connection.driver_connection)
+            finally:
+                _connection.close()
+
+        yield _restore
+        template.close()
+        connection.close()
+    else:
+        tables = ", ".join(
+            f'"{table}"' for table in SQLModel.metadata.tables
+        )
+
+        def _restore() -> None:
+            with engine.begin() as conn:
+                conn.execute(
+                    text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+                )
+            init_data()
+
+        yield _restore
+    shutil.rmtree(logs.path, ignore_errors=True)
+    logs.path = path
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database(restore: Callable[[], None] | None) -> None:
+    """Each module starts from the seeded database."""
+    if restore is not None:
+        restore()
+
+
 @pytest.fixture()
 def auth_request(username: str, password: str):
+    # The test hashes are cheap: the logins would exceed the rate limit.
+    login_limiter.reset()
     response = client.post("/auth/token",
                            data=dict(username=username, password=password))
     _tokens = ["access_token", "refresh_token"]
@@ -29,3 +139,39 @@ def auth_request(username: str, password: str):
 @pytest.fixture()
 def auth_header(auth_request):
     return {"Authorization": f"Bearer {auth_request.access_token}"}
+
+
+@pytest.fixture()
+def commands(auth_header: dict):
+    _ids = dict(
+        workflow=client.post(
+            "/me/workflow", json=dict(name="page"), headers=auth_header
+        ).json()["id"],
+        category=client.post(
+            "/me/category", json=dict(name="page"), headers=auth_header
+        ).json()["id"],
+        tag=client.post(
+            "/me/tag", json=dict(name="page"), headers=auth_header
+        ).json()["id"],
+    )
+    _commands = [
+        client.post(
+            "/me/command",
+            json=dict(
+                path=f"echo {i}",
+                workflow_id=_ids["workflow"],
+                category_id=_ids["category"],
+            ),
+            headers=auth_header,
+        ).json()["id"]
+        for i in range(5)
+    ]
+    client.put(f"/me/command/{_commands[1]}/add/{_ids['tag']}",
+               headers=auth_header)
+    yield Struct(ids=_ids, commands=_commands)
+    client.delete(f"/me/command/{_commands[1]}/rm/{_ids['tag']}",
+                  headers=auth_header)
+    for id in _commands:
+        client.delete(f"/admin/command/{id}", headers=auth_header)
+    for target, id in _ids.items():
+        client.delete(f"/admin/{target}/{id}", headers=auth_header)
@@ -0,0 +1,216 @@
+from typing import Dict, List, Self, Set
+
+from db import DB, profile
+from error import ConflictException, NotFoundException
+from jobs import jobs
+from model import (Command, CommandDependency, CriticalPath, Principal,
+                   Result, Workflow)
+from sqlmodel import Session, select
+from worker import worker
+
+
+class _db:
+    workflow = DB[Workflow](Workflow, "Workflow")
+    command = DB[Command](Command, "Command")
+    command_dependency = DB[CommandDependency](
+        CommandDependency, "CommandDependency"
+    )
+
+
+def read_dependencies(
+    command_ids: List[int], session: Session
+) -> List[CommandDependency]:
+    return session.exec(
+        select(CommandDependency).where(
+            CommandDependency.command_id.in_(command_ids)
+        )
+    ).all()
+
+
+class Dag:
+    """Dependencies between the commands of a workflow.
+
+    Edges pointing to commands outside the workflow are ignored.
+    """
+
+    def __init__(
+        self: Self, workflow: Workflow, edges: List[CommandDependency]
+    ) -> None:
+        self.workflow = workflow
+        self.commands = {command.id: command for command in workflow.commands}
+        self.dependencies: Dict[int, Set[int]] = {
+            id: set() for id in self.commands
+        }
+        self.dependents: Dict[int, Set[int]] = {
+            id: set() for id in self.commands
+        }
+        for edge in edges:
+            if (
+                edge.command_id in self.commands
+                and edge.depends_on_id in self.commands
+            ):
+                self.dependencies[edge.command_id].add(edge.depends_on_id)
+                self.dependents[edge.depends_on_id].add(edge.command_id)
+
+    @classmethod
+    def of(cls: type[Self], workflow: Workflow, session: Session) -> Self:
+        return cls(
+            workflow,
+            read_dependencies(
+                [command.id for command in workflow.commands], session
+            ),
+        )
+
+    def order(self: Self) -> List[int]:
+        """Topological order of the commands (Kahn's algorithm).
+
+        Raises ConflictException if the dependencies contain a cycle.
+        """
+        waiting = {id: len(deps) for id, deps in self.dependencies.items()}
+        ready = sorted(id for id, n in waiting.items() if n == 0)
+        order = []
+        while len(ready) > 0:
+            id = ready.pop(0)
+            order.append(id)
+            for dependent in sorted(self.dependents[id]):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.commands):
+            raise ConflictException(target="Workflow", id=self.workflow.id)
+        return order
+
+    def roots(self: Self) -> List[int]:
+        return sorted(id for id, deps in self.dependencies.items()
+                      if len(deps) == 0)
+
+    def reaches(self: Self, source: int, target: int) -> bool:
+        visited, stack = set(), [source]
+        while len(stack) > 0:
+            id = stack.pop()
+            if id == target:
+                return True
+            if id not in visited:
+                visited.add(id)
+                stack.extend(self.dependencies.get(id, []))
+        return False
+
+    def critical_path(self: Self) -> CriticalPath:
+        """Longest chain of dependent commands.
+
+        Each command weighs its last measured duration; chains with the same
+        duration are compared by number of commands.
+        """
+        best: Dict[int, tuple] = {}
+        previous: Dict[int, int | None] = {}
+        for id in self.order():
+            weight = (self.commands[id].duration or 0.0, 1)
+            best[id], previous[id] = weight, None
+            for dep in self.dependencies[id]:
+                candidate = (best[dep][0] + weight[0], best[dep][1] + 1)
+                if candidate > best[id]:
+                    best[id], previous[id] = candidate, dep
+        last = max(best, key=best.get, default=None)
+        path = []
+        while last is not None:
+            path.insert(0, last)
+            last = previous[last]
+        return CriticalPath(
+            workflow_id=self.workflow.id,
+            command_ids=path,
+            duration=best[path[-1]][0] if len(path) > 0 else 0.0,
+        )
+
+
+class WorkflowExecution:
+    """Run the commands of a workflow following their dependencies.
+
+    The commands are started and their jobs queued (see jobs.py) in the
+    session of the request: the workers run the commands without
+    dependencies first, then each command as soon as all its dependencies
+    are completed. Commands depending on a failed or stopped one are
+    stopped.
+    """
+
+    def __init__(
+        self: Self, dag: Dag, user: Principal, priority: int = 0
+    ) -> None:
+        self.dag = dag
+        self.user = user
+        self.priority = priority
+
+    def start(self: Self, session: Session) -> None:
+        self.dag.order()
+        # Before any command is started: a rejected workflow is unchanged.
+        jobs.check_capacity(
+            self.dag.workflow.id, len(self.dag.commands), session
+        )
+        for command in self.dag.commands.values():
+            command.start()
+            command.started_by_id = self.user.id
+            _db.command.update(command.id, command, self.user, session)
+        jobs.enqueue(
+            self.dag.workflow.id,
+            self.dag.dependencies,
+            self.user,
+            self.priority,
+            session,
+        )
+        session.commit()
+        worker.wake()
+
+
+def stop_workflow(
+    workflow: Workflow, user: Principal, session: Session
+) -> None:
+    """Stop the commands of the workflow and remove their pending jobs."""
+    for command in workflow.commands:
+        command.stop()
+        command.stopped_by_id = user.id
+        _db.command.update(command.id, command, user, session)
+    jobs.cancel(workflow.id, session)
+
+
+def add_dependency(
+    command: Command,
+    depends_on: Command,
+    user: Principal,
+    session: Session,
+) -> Result:
+    if (
+        command.id == depends_on.id
+        or command.workflow_id != depends_on.workflow_id
+    ):
+        raise ConflictException(
+            target="CommandDependency",
+            id=dict(command_id=command.id, depends_on_id=depends_on.id),
+        )
+    workflow = _db.workflow.read(
+        command.workflow_id, session, profile(Workflow.commands)
+    )
+    dag = Dag.of(workflow, session)
+    if (
+        depends_on.id in dag.dependencies[command.id]
+        or dag.reaches(depends_on.id, command.id)
+    ):
+        raise ConflictException(
+            target="CommandDependency",
+            id=dict(command_id=command.id, depends_on_id=depends_on.id),
+        )
+    return _db.command_dependency.create(
+        CommandDependency(command_id=command.id, depends_on_id=depends_on.id),
+        user,
+        session,
+    )
+
+
+def rm_dependency(
+    command: Command, depends_on_id: int, session: Session
+) -> Result:
+    for edge in read_dependencies([command.id], session):
+        if edge.depends_on_id == depends_on_id:
+            return _db.command_dependency.delete(edge.id, session)
+    raise NotFoundException(
+        target="CommandDependency",
+        id=dict(command_id=command.id, depends_on_id=depends_on_id),
+    )
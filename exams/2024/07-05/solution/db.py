@@ -1,11 +1,25 @@
+from contextlib import asynccontextmanager, contextmanager
 from enum import Enum
-from typing import List, Self, Type
+from typing import (Annotated, AsyncIterator, Callable, Dict, Iterator,
+                    List, Optional, Self, Sequence, Type)
 
+from config import db_async, export_yield_per, page_limit, page_limit_max
 from error import NotFoundException
-from fastapi import HTTPException, status
-from model import Result, User, engine
+from fastapi import HTTPException, Query, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from model import (Filter, Principal, Result, async_engine, async_read_engine,
+                   engine, read_engine)
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, event, insert, or_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import (InstrumentedAttribute, load_only, raiseload,
+                            selectinload)
+from sqlalchemy.orm.interfaces import LoaderOption
 from sqlmodel import Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 class Action(str, Enum):
@@ -16,100 +30,683 @@ class Action(str, Enum):
     STOPPED = "Stopped"
 
 
+class Owner(str, Enum):
+    CREATED = "created_by_id"
+    UPDATED = "updated_by_id"
+
+
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    """Session committed at the end of the block, rolled back on errors."""
+    with Session(engine, expire_on_commit=False) as session:
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
+@asynccontextmanager
+async def async_unit_of_work() -> AsyncIterator[AsyncSession]:
+    """Same as unit_of_work with the async engine."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+@contextmanager
+def read_unit_of_work() -> Iterator[Session]:
+    """Session of the read replica (model.read_engine), for reading only."""
+    with Session(read_engine, expire_on_commit=False) as session:
+        yield session
+
+
+@asynccontextmanager
+async def async_read_unit_of_work() -> AsyncIterator[AsyncSession]:
+    """Same as read_unit_of_work with the async engine."""
+    async with AsyncSession(
+        async_read_engine, expire_on_commit=False
+    ) as session:
+        yield session
+
+
+async def get_session() -> AsyncIterator[AsyncSession | Session]:
+    """Session shared by the dependencies and the endpoint of a request.
+
+    With db_async it is an AsyncSession on the aiosqlite engine, otherwise a
+    Session used from the thread pool (see run_in_session).
+    """
+    if db_async:
+        async with async_unit_of_work() as session:
+            yield session
+    else:
+        with unit_of_work() as session:
+            yield session
+
+
+def after_commit(
+    session: AsyncSession | Session, fn: Callable[[], None]
+) -> None:
+    """Call fn once the transaction of the session is committed, e.g. to
+    invalidate a cache: not if it is rolled back."""
+    if isinstance(session, AsyncSession):
+        session = session.sync_session
+    event.listen(session, "after_commit", lambda _: fn(), once=True)
+
+
+async def run_in_session[T](
+    session: AsyncSession | Session, fn: Callable[..., T], *args, **kwargs
+) -> T:
+    """Call fn(*args, session, **kwargs) without blocking the event loop."""
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(
+            lambda _session: fn(*args, _session, **kwargs)
+        )
+    return await run_in_threadpool(fn, *args, session, **kwargs)
+
+
+def profile(
+    *relationships: InstrumentedAttribute | LoaderOption,
+) -> List[LoaderOption]:
+    """Loader options of an endpoint.
+
+    The given relationships (or loader options, for nested paths) are loaded
+    with a separate SELECT ... IN query, any other one raises if accessed.
+    """
+    return [
+        selectinload(relationship)
+        if isinstance(relationship, InstrumentedAttribute)
+        else relationship
+        for relationship in relationships
+    ] + [raiseload("*")]
+
+
+class Page:
+    """Keyset pagination and sparse fieldset of a list endpoint.
+
+    The records are sorted by id: the next page starts after the id sent in
+    the X-Next-After header (missing on the last page).
+    """
+
+    def __init__(
+        self: Self,
+        limit: int,
+        after: Optional[str | int] = None,
+        fields: Optional[List[str]] = None,
+    ) -> None:
+        self.limit = limit
+        self.after = after
+        self.fields = fields
+
+    def response(self: Self, items: List[SQLModel]) -> JSONResponse:
+        headers = {}
+        if len(items) == self.limit:
+            headers["X-Next-After"] = str(items[-1].id)
+        return JSONResponse(
+            content=jsonable_encoder(
+                [
+                    {field: getattr(item, field) for field in self.fields}
+                    for item in items
+                ]
+            ),
+            headers=headers,
+        )
+
+
+class Paginate:
+    """Query parameters of the list endpoints returning public_type."""
+
+    def __init__(self: Self, public_type: Type[SQLModel]) -> None:
+        self.public_type = public_type
+
+    def __call__(
+        self: Self,
+        limit: Annotated[int, Query(ge=1, le=page_limit_max)] = page_limit,
+        after: Optional[str] = None,
+        fields: Annotated[
+            Optional[str], Query(description="Comma-separated field names")
+        ] = None,
+    ) -> Page:
+        _fields = list(self.public_type.model_fields)
+        if fields is not None:
+            _fields = [field.strip() for field in fields.split(",")]
+            unknown = set(_fields) - set(self.public_type.model_fields)
+            if len(unknown) > 0:
+                raise HTTPException(
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    f"Unknown fields: {', '.join(sorted(unknown))}",
+                )
+        if after is not None:
+            try:
+                after = TypeAdapter(
+                    self.public_type.model_fields["id"].annotation
+                ).validate_python(after)
+            except ValidationError:
+                raise HTTPException(
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    f"Invalid cursor: {after}",
+                )
+        return Page(limit=limit, after=after, fields=_fields)
+
+
 class DB[ModelType: SQLModel]:
     def __init__(self: Self, model_type: Type[ModelType], model_text: str):
         self.model_type = model_type
         self.model_text = model_text
 
-    def create(self: Self, model: ModelType, user: User) -> Result:
-        try:
-            with Session(engine) as session:
-                try:
-                    obj = self.model_type(
-                        **model.model_dump(exclude_unset=True)
-                    )
-                    obj.created_by_id = user.id
-                    session.add(obj)
-                    session.commit()
-                    session.refresh(obj)
-                    return Result(
-                        action=Action.CREATED,
-                        target=self.model_text,
-                        id=obj.id,
-                    )
-                except IntegrityError as ie:
-                    raise HTTPException(
-                        status.HTTP_406_NOT_ACCEPTABLE, str(ie)
-                    )
+    def create(
+        self: Self, model: ModelType, user: Principal, session: Session
+    ) -> Result:
+        try:
+            obj = self.model_type(**model.model_dump(exclude_unset=True))
+            obj.created_by_id = user.id
+            session.add(obj)
+            session.flush()
+            return Result(
+                action=Action.CREATED,
+                target=self.model_text,
+                id=obj.id,
+            )
+        except IntegrityError as ie:
+            raise HTTPException(status.HTTP_406_NOT_ACCEPTABLE, str(ie))
         except Exception as e:
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
 
-    def read_all(self: Self) -> List[ModelType]:
+    def _page(self: Self, query, page: Page | None, filter: Filter | None):
+        if filter is not None:
+            query = query.where(*filter.where(self.model_type))
+        if page is None:
+            return query
+        if page.after is not None:
+            query = query.where(self.model_type.id > page.after)
+        columns = set(page.fields) | {"id"}
+        return (
+            query.options(
+                load_only(
+                    *(getattr(self.model_type, column) for column in columns)
+                )
+            )
+            .order_by(self.model_type.id)
+            .limit(page.limit)
+        )
+
+    def read_all(
+        self: Self,
+        session: Session,
+        options: Sequence[LoaderOption] = (),
+        page: Page | None = None,
+        filter: Filter | None = None,
+    ) -> List[ModelType]:
         try:
-            with Session(engine) as session:
-                return session.exec(select(self.model_type)).unique().all()
+            return session.exec(
+                self._page(select(self.model_type).options(*options), page,
+                           filter)
+            ).unique().all()
         except Exception as e:
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
 
-    def read(self: Self, id: str | int) -> ModelType:
-        with Session(engine) as session:
-            try:
-                db = session.get(self.model_type, id)
-            except Exception as e:
-                raise HTTPException(
-                    status.HTTP_500_INTERNAL_SERVER_ERROR, str(e)
-                )
-            if not db:
-                raise NotFoundException(
-                    target=self.model_text,
-                    id=id,
-                )
-            return db
+    def read(
+        self: Self,
+        id: str | int,
+        session: Session,
+        options: Sequence[LoaderOption] = (),
+    ) -> ModelType:
+        try:
+            db = session.get(self.model_type, id, options=options)
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+        if not db:
+            raise NotFoundException(
+                target=self.model_text,
+                id=id,
+            )
+        return db
 
     def update(
-        self: Self, id: str | int, model: ModelType, user: User
+        self: Self,
+        id: str | int,
+        model: ModelType,
+        user: Principal,
+        session: Session,
     ) -> ModelType:
-        model_db = self.read(id)
-        with Session(engine) as session:
-            try:
-                model_data = model.model_dump(exclude_unset=True)
-                for key, value in model_data.items():
-                    setattr(model_db, key, value)
-                model_db.updated_by_id = user.id
-            except Exception as e:
-                raise HTTPException(
-                    status.HTTP_500_INTERNAL_SERVER_ERROR, str(e)
+        model_db = self.read(id, session)
+        try:
+            model_data = model.model_dump(exclude_unset=True)
+            for key, value in model_data.items():
+                setattr(model_db, key, value)
+            model_db.updated_by_id = user.id
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+        if hasattr(model_db, "additional_updates") and callable(
+            model_db.additional_updates
+        ):
+            model_db.additional_updates()
+        try:
+            session.add(model_db)
+            session.flush()
+            return Result(action=Action.UPDATED, target=self.model_text, id=id)
+        except IntegrityError as ie:
+            raise HTTPException(status.HTTP_406_NOT_ACCEPTABLE, str(ie))
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def delete(self: Self, id: str | int, session: Session) -> Result:
+        model = self.read(id, session)
+        try:
+            session.delete(model)
+            session.flush()
+            return Result(action=Action.DELETED, target=self.model_text, id=id)
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def _read_ids(
+        self: Self, ids: Sequence[str | int], session: Session
+    ) -> Dict[str | int, ModelType]:
+        try:
+            return {
+                model_db.id: model_db
+                for model_db in session.exec(
+                    select(self.model_type)
+                    .where(self.model_type.id.in_(set(ids)))
+                    .options(raiseload("*"))
                 )
+            }
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def check(
+        self: Self,
+        ids: Sequence[str | int],
+        session: Session,
+        user: Principal | None = None,
+        owners: Sequence[Owner] = (Owner.CREATED,),
+    ) -> None:
+        """Raise NotFoundException unless all the records exist.
+
+        With the user they must also be owned by them. A single query checks
+        the whole batch.
+        """
+        ids = set(ids) - {None}
+        query = select(self.model_type.id).where(self.model_type.id.in_(ids))
+        if user is not None:
+            query = query.where(self._owned_by(user, owners))
+        try:
+            missing = ids - set(session.exec(query).all())
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+        if len(missing) > 0:
+            raise NotFoundException(target=self.model_text, id=min(missing))
+
+    def create_all(
+        self: Self,
+        models: List[ModelType],
+        user: Principal,
+        session: Session,
+    ) -> List[Result]:
+        """Insert the models with multi-row INSERT ... RETURNING statements.
+
+        The ids are assigned in ascending order of insertion: sorted, they
+        follow the order of the models.
+        """
+        try:
+            rows = [
+                self.model_type(
+                    **model.model_dump(exclude_unset=True),
+                    created_by_id=user.id,
+                ).model_dump(exclude={"id"})
+                for model in models
+            ]
+            if len(rows) == 0:
+                return []
+            ids = session.scalars(
+                insert(self.model_type).returning(self.model_type.id), rows
+            ).all()
+            return [
+                Result(action=Action.CREATED, target=self.model_text, id=id)
+                for id in sorted(ids)
+            ]
+        except IntegrityError as ie:
+            raise HTTPException(status.HTTP_406_NOT_ACCEPTABLE, str(ie))
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def create_missing(
+        self: Self,
+        models: List[ModelType],
+        keys: Sequence[str],
+        user: Principal,
+        session: Session,
+    ) -> List[Result]:
+        """Insert the models not stored yet, with the same keys.
+
+        A single INSERT ... ON CONFLICT (keys) DO NOTHING RETURNING statement,
+        the keys must have a unique index: the results are the inserted ones.
+        """
+        dialect = session.get_bind().dialect.name
+        _insert = dict(sqlite=sqlite.insert, postgresql=postgresql.insert)[
+            dialect
+        ]
+        try:
+            rows = [
+                self.model_type(
+                    **model.model_dump(exclude_unset=True),
+                    created_by_id=user.id,
+                ).model_dump(exclude={"id"})
+                for model in models
+            ]
+            if len(rows) == 0:
+                return []
+            ids = session.scalars(
+                _insert(self.model_type)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=keys)
+                .returning(self.model_type.id)
+            ).all()
+            return [
+                Result(action=Action.CREATED, target=self.model_text, id=id)
+                for id in sorted(ids)
+            ]
+        except IntegrityError as ie:
+            raise HTTPException(status.HTTP_406_NOT_ACCEPTABLE, str(ie))
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def update_all(
+        self: Self,
+        models: Dict[str | int, ModelType],
+        user: Principal,
+        session: Session,
+    ) -> List[Result]:
+        """Update the records with the given ids, read with one query."""
+        models_db = self._read_ids(list(models), session)
+        for id, model in models.items():
+            if id not in models_db:
+                raise NotFoundException(target=self.model_text, id=id)
+            model_db = models_db[id]
+            for key, value in model.model_dump(exclude_unset=True).items():
+                setattr(model_db, key, value)
+            model_db.updated_by_id = user.id
             if hasattr(model_db, "additional_updates") and callable(
                 model_db.additional_updates
             ):
                 model_db.additional_updates()
-            try:
-                session.add(model_db)
-                session.commit()
-                session.refresh(model_db)
-                return Result(
-                    action=Action.UPDATED, target=self.model_text, id=id
-                )
-            except Exception as e:
-                raise HTTPException(
-                    status.HTTP_500_INTERNAL_SERVER_ERROR, str(e)
+        try:
+            session.flush()
+            return [
+                Result(action=Action.UPDATED, target=self.model_text, id=id)
+                for id in models
+            ]
+        except IntegrityError as ie:
+            raise HTTPException(status.HTTP_406_NOT_ACCEPTABLE, str(ie))
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def delete_all(
+        self: Self, ids: List[str | int], session: Session
+    ) -> List[Result]:
+        """Delete the records with the given ids, read with one query."""
+        models_db = self._read_ids(ids, session)
+        for id in ids:
+            if id not in models_db:
+                raise NotFoundException(target=self.model_text, id=id)
+        try:
+            for model_db in models_db.values():
+                session.delete(model_db)
+            session.flush()
+            return [
+                Result(action=Action.DELETED, target=self.model_text, id=id)
+                for id in dict.fromkeys(ids)
+            ]
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def delete_where(
+        self: Self, where: Sequence, session: Session
+    ) -> List[Result]:
+        """Delete the records matching the conditions, if any, with a
+        single DELETE ... RETURNING statement."""
+        try:
+            ids = session.scalars(
+                delete(self.model_type)
+                .where(*where)
+                .returning(self.model_type.id)
+            ).all()
+            return [
+                Result(action=Action.DELETED, target=self.model_text, id=id)
+                for id in sorted(ids)
+            ]
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+
+    def _owned_by(self: Self, user: Principal, owners: Sequence[Owner]):
+        return or_(
+            *(getattr(self.model_type, owner) == user.id for owner in owners)
+        )
+
+    def read_personal(
+        self: Self,
+        id: str | int,
+        user: Principal,
+        session: Session,
+        owners: Sequence[Owner] = (Owner.CREATED,),
+        options: Sequence[LoaderOption] = (),
+    ) -> ModelType:
+        """Record with the id if the user is one of its owners.
+
+        Primary key lookup filtered by the owner columns: the history of the
+        user is not loaded.
+        """
+        try:
+            db = session.exec(
+                select(self.model_type)
+                .where(
+                    self.model_type.id == id, self._owned_by(user, owners)
                 )
+                .options(*options)
+            ).first()
+        except Exception as e:
+            raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
+        if not db:
+            raise NotFoundException(target=self.model_text, id=id)
+        return db
+
+    def _export(self: Self, filter: Filter | None):
+        return (
+            self._page(select(self.model_type), None, filter)
+            .options(raiseload("*"))
+            .order_by(self.model_type.id)
+            .execution_options(yield_per=export_yield_per)
+        )
+
+    def read_partitions(
+        self: Self, session: Session, filter: Filter | None = None
+    ) -> Iterator[List[ModelType]]:
+        """All the records, export_yield_per at a time (server-side cursor)."""
+        yield from session.exec(self._export(filter)).partitions()
 
-    def delete(self: Self, id: str | int) -> Result:
-        model = self.read(id)
+    def read_all_personal(
+        self: Self,
+        user: Principal,
+        session: Session,
+        owners: Sequence[Owner] = (Owner.CREATED,),
+        page: Page | None = None,
+        filter: Filter | None = None,
+        **filters,
+    ) -> List[ModelType]:
+        """Records of the user (served by the owner indexes)."""
         try:
-            with Session(engine) as session:
-                session.delete(model)
-                session.commit()
-                return Result(
-                    action=Action.DELETED, target=self.model_text, id=id
+            return session.exec(
+                self._page(
+                    select(self.model_type)
+                    .where(self._owned_by(user, owners))
+                    .filter_by(**filters),
+                    page,
+                    filter,
                 )
+            ).all()
         except Exception as e:
             raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, str(e))
 
-    def read_personal(self: Self, id: str | int, db) -> ModelType:
-        data = list(filter(lambda item: item.id == id, db))
-        if len(data) == 0:
-            raise NotFoundException(target=self.model_text, id=id)
-        return data[0]
+
+class AsyncDB[ModelType: SQLModel]:
+    """DB awaited by the endpoints, see run_in_session."""
+
+    def __init__(self: Self, model_type: Type[ModelType], model_text: str):
+        self.model_type = model_type
+        self.model_text = model_text
+        self.db = DB[ModelType](model_type, model_text)
+
+    async def create(
+        self: Self,
+        model: ModelType,
+        user: Principal,
+        session: AsyncSession | Session,
+    ) -> Result:
+        return await run_in_session(session, self.db.create, model, user)
+
+    async def read_all(
+        self: Self,
+        session: AsyncSession | Session,
+        options: Sequence[LoaderOption] = (),
+        page: Page | None = None,
+        filter: Filter | None = None,
+    ) -> List[ModelType]:
+        return await run_in_session(
+            session,
+            self.db.read_all,
+            options=options,
+            page=page,
+            filter=filter,
+        )
+
+    async def read(
+        self: Self,
+        id: str | int,
+        session: AsyncSession | Session,
+        options: Sequence[LoaderOption] = (),
+    ) -> ModelType:
+        return await run_in_session(session, self.db.read, id, options=options)
+
+    async def update(
+        self: Self,
+        id: str | int,
+        model: ModelType,
+        user: Principal,
+        session: AsyncSession | Session,
+    ) -> Result:
+        return await run_in_session(session, self.db.update, id, model, user)
+
+    async def delete(
+        self: Self, id: str | int, session: AsyncSession | Session
+    ) -> Result:
+        return await run_in_session(session, self.db.delete, id)
+
+    async def check(
+        self: Self,
+        ids: Sequence[str | int],
+        session: AsyncSession | Session,
+        user: Principal | None = None,
+        owners: Sequence[Owner] = (Owner.CREATED,),
+    ) -> None:
+        await run_in_session(
+            session, self.db.check, ids, user=user, owners=owners
+        )
+
+    async def create_all(
+        self: Self,
+        models: List[ModelType],
+        user: Principal,
+        session: AsyncSession | Session,
+    ) -> List[Result]:
+        return await run_in_session(session, self.db.create_all, models, user)
+
+    async def create_missing(
+        self: Self,
+        models: List[ModelType],
+        keys: Sequence[str],
+        user: Principal,
+        session: AsyncSession | Session,
+    ) -> List[Result]:
+        return await run_in_session(
+            session, self.db.create_missing, models, keys, user
+        )
+
+    async def update_all(
+        self: Self,
+        models: Dict[str | int, ModelType],
+        user: Principal,
+        session: AsyncSession | Session,
+    ) -> List[Result]:
+        return await run_in_session(session, self.db.update_all, models, user)
+
+    async def delete_all(
+        self: Self, ids: List[str | int], session: AsyncSession | Session
+    ) -> List[Result]:
+        return await run_in_session(session, self.db.delete_all, ids)
+
+    async def delete_where(
+        self: Self, where: Sequence, session: AsyncSession | Session
+    ) -> List[Result]:
+        return await run_in_session(session, self.db.delete_where, where)
+
+    async def read_personal(
+        self: Self,
+        id: str | int,
+        user: Principal,
+        session: AsyncSession | Session,
+        owners: Sequence[Owner] = (Owner.CREATED,),
+        options: Sequence[LoaderOption] = (),
+    ) -> ModelType:
+        return await run_in_session(
+            session,
+            self.db.read_personal,
+            id,
+            user,
+            owners=owners,
+            options=options,
+        )
+
+    async def read_partitions(
+        self: Self, filter: Filter | None = None
+    ) -> AsyncIterator[List[ModelType]]:
+        """Same as DB.read_partitions in a session of its own, on the read
+        replica if any.
+
+        It is consumed by a streaming response, after the session of the
+        request is closed.
+        """
+        if db_async:
+            async with async_read_unit_of_work() as session:
+                result = await session.stream_scalars(self.db._export(filter))
+                async for partition in result.partitions():
+                    yield partition
+        else:
+            with read_unit_of_work() as session:
+                async for partition in iterate_in_threadpool(
+                    self.db.read_partitions(session, filter)
+                ):
+                    yield partition
+
+    async def read_all_personal(
+        self: Self,
+        user: Principal,
+        session: AsyncSession | Session,
+        owners: Sequence[Owner] = (Owner.CREATED,),
+        page: Page | None = None,
+        filter: Filter | None = None,
+        **filters,
+    ) -> List[ModelType]:
+        return await run_in_session(
+            session,
+            self.db.read_all_personal,
+            user,
+            owners=owners,
+            page=page,
+            filter=filter,
+            **filters,
+        )
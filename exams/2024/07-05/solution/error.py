@@ -11,6 +11,7 @@ class Action(str, Enum):
     NOT_FOUND = "Not Found"
     CONFLICT = "Conflict"
     EMPTY = "Empty"
+    TOO_MANY_REQUESTS = "Too Many Requests"
 
 
 class BaseException(Exception):
@@ -53,3 +54,8 @@ class ConflictException(BaseException):
 class EmptyException(BaseException):
     action = Action.EMPTY
     status = status.HTTP_406_NOT_ACCEPTABLE
+
+
+class TooManyRequestsException(BaseException):
+    action = Action.TOO_MANY_REQUESTS
+    status = status.HTTP_429_TOO_MANY_REQUESTS
@@ -0,0 +1,113 @@
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from threading import Lock
+from typing import Dict, Iterator, Optional, Self, Set
+
+from config import events_queue_size, logger
+from pydantic import BaseModel
+
+
+class EventType(str, Enum):
+    STATUS = "status"
+    OUTPUT = "output"
+
+
+class Event(BaseModel):
+    type: EventType
+    command_id: int
+    status: Optional[str] = None
+    stream: Optional[str] = None
+    line: Optional[str] = None
+    timestamp: datetime
+
+
+class Subscription:
+    """Events of a topic queued for a client in its event loop.
+
+    When the client is too slow the oldest events are dropped.
+    """
+
+    def __init__(self: Self, topic: int, size: int) -> None:
+        self.topic = topic
+        self.dropped = 0
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=size)
+
+    def _put(self: Self, event: Event) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    def put(self: Self, event: Event) -> None:
+        """Thread safe."""
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    async def get(self: Self, timeout: float) -> Optional[Event]:
+        """Next event, None if nothing happened within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    """In-process publish/subscribe of the events of the workflows.
+
+    Publishers are the request handlers and the scheduler workers (any
+    thread), subscribers the streaming endpoints (the event loop).
+    """
+
+    def __init__(self: Self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._lock = Lock()
+        self._topics: Dict[int, Set[Subscription]] = {}
+
+    def active(self: Self, topic: Optional[int]) -> bool:
+        """To skip building the events nobody is waiting for."""
+        return topic in self._topics
+
+    def publish(self: Self, topic: Optional[int], event: Event) -> None:
+        with self._lock:
+            subscriptions = list(self._topics.get(topic, []))
+        for subscription in subscriptions:
+            try:
+                subscription.put(event)
+            except RuntimeError:
+                # Event loop of the subscriber closed.
+                self._unsubscribe(subscription)
+
+    def _subscribe(self: Self, topic: int) -> Subscription:
+        subscription = Subscription(topic, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self: Self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._topics.get(subscription.topic, set())
+            subscriptions.discard(subscription)
+            if len(subscriptions) == 0:
+                self._topics.pop(subscription.topic, None)
+        if subscription.dropped > 0:
+            logger.warning(
+                f"Topic {subscription.topic}: "
+                f"{subscription.dropped} events dropped"
+            )
+
+    @contextmanager
+    def subscribe(self: Self, topic: int) -> Iterator[Subscription]:
+        """Subscription to the topic until the end of the block.
+
+        It must be entered in the event loop of the subscriber.
+        """
+        subscription = self._subscribe(topic)
+        try:
+            yield subscription
+        finally:
+            self._unsubscribe(subscription)
+
+
+hub = Hub(queue_size=events_queue_size)
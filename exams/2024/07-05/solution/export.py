@@ -0,0 +1,103 @@
+import zlib
+from enum import Enum
+from typing import AsyncIterator, List, Type
+
+from fastapi.responses import StreamingResponse
+from sqlmodel import SQLModel
+
+
+class Format(str, Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+
+media_types = {
+    Format.NDJSON: "application/x-ndjson",
+    Format.JSON: "application/json",
+}
+
+
+async def _encode(
+    partitions: AsyncIterator[List[SQLModel]],
+    public_type: Type[SQLModel],
+    format: Format,
+) -> AsyncIterator[bytes]:
+    separator = "\n" if format == Format.NDJSON else ","
+    first = True
+    if format == Format.JSON:
+        yield b"["
+    async for partition in partitions:
+        chunk = separator.join(
+            public_type.model_validate(item).model_dump_json()
+            for item in partition
+        )
+        if format == Format.NDJSON:
+            yield (chunk + "\n").encode()
+        else:
+            yield (chunk if first else "," + chunk).encode()
+        first = False
+    if format == Format.JSON:
+        yield b"]"
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True if the Accept-Encoding header allows gzip (q > 0).
+
+    gzip (or x-gzip) listed explicitly wins over *; a q-value that is not a
+    number refuses the coding.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        # Each chunk is flushed: the client receives it without waiting for
+        # the compressor buffer to fill.
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def stream(
+    partitions: AsyncIterator[List[SQLModel]],
+    public_type: Type[SQLModel],
+    format: Format,
+    accept_encoding: str,
+) -> StreamingResponse:
+    """Stream the records as JSON Lines or as a JSON array.
+
+    One partition of records at a time is in memory; the body is gzipped if
+    the client accepts it.
+
+    Parameters:
+    partitions (AsyncIterator[List[SQLModel]]) -- records, see read_partitions
+    public_type (Type[SQLModel]) -- model used to serialize each record
+    format (Format) -- ndjson or json
+    accept_encoding (str) -- Accept-Encoding header of the request
+
+    Returns:
+    StreamingResponse: Chunked response, one chunk per partition
+    """
+    body = _encode(partitions, public_type, format)
+    # The encoding depends on the request: caches must key on it.
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(accept_encoding):
+        body, headers["Content-Encoding"] = _gzip(body), "gzip"
+    return StreamingResponse(
+        body, media_type=media_types[format], headers=headers
+    )
@@ -0,0 +1,311 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Self, Set, Tuple
+
+from config import job_attempts_max, job_lease, job_queue_size, logger
+from error import TooManyRequestsException
+from events import Event, EventType, hub
+from model import (Command, CommandDependency, CommandJob, CommandStatus,
+                   JobStatus, Principal)
+from sqlmodel import Session, delete, func, select, update
+
+
+class JobQueue:
+    """Jobs of the started commands, persisted in the commandjob table.
+
+    The workers (see worker.py) claim the queued jobs with a lease renewed
+    by their heartbeat: the jobs of a worker that died are claimed again
+    when the lease expires. Starting a command again replaces its job: the
+    run of the old one is stopped and its result discarded.
+
+    Completing a job queues the dependents whose dependencies are all
+    completed and stops the dependents of a failed or stopped command, in
+    the same transaction.
+
+    The conditional updates make the queue safe for many workers, in any
+    process, on the same database.
+    """
+
+    def __init__(
+        self: Self, lease: float, attempts_max: int, queue_size: int
+    ) -> None:
+        self.lease = lease
+        self.attempts_max = attempts_max
+        self.queue_size = queue_size
+
+    def check_capacity(
+        self: Self, workflow_id: int, n_jobs: int, session: Session
+    ) -> None:
+        """Raise unless n_jobs more fit in the queue (backpressure).
+
+        The pending jobs of all the workers count: the queued ones and the
+        ones waiting for their dependencies.
+        """
+        pending = session.exec(
+            select(func.count())
+            .select_from(CommandJob)
+            .where(CommandJob.status != JobStatus.RUNNING)
+        ).one()
+        if pending + n_jobs > self.queue_size:
+            raise TooManyRequestsException(target="Workflow", id=workflow_id)
+
+    def enqueue(
+        self: Self,
+        workflow_id: int,
+        dependencies: Dict[int, Set[int]],
+        user: Principal,
+        priority: int,
+        session: Session,
+    ) -> None:
+        """Jobs of the commands (keys) waiting for their dependencies.
+
+        The jobs left by a previous start of the commands (e.g. still running
+        after a stop) are replaced.
+        """
+        session.exec(
+            delete(CommandJob).where(
+                CommandJob.command_id.in_(list(dependencies))
+            )
+        )
+        session.add_all(
+            CommandJob(
+                command_id=id,
+                workflow_id=workflow_id,
+                user_id=user.id,
+                priority=priority,
+                waiting=len(deps),
+                status=(
+                    JobStatus.QUEUED if len(deps) == 0 else JobStatus.WAITING
+                ),
+            )
+            for id, deps in dependencies.items()
+        )
+
+    def cancel(self: Self, workflow_id: int, session: Session) -> None:
+        """Remove the jobs of the workflow not running yet."""
+        session.exec(
+            delete(CommandJob).where(
+                CommandJob.workflow_id == workflow_id,
+                CommandJob.status != JobStatus.RUNNING,
+            )
+        )
+
+    def claim(
+        self: Self, worker: str, n: int, session: Session
+    ) -> List[Tuple[CommandJob, Command]]:
+        """Up to n queued jobs (lower priority first) leased to the worker.
+
+        Jobs of commands stopped meanwhile are completed, not returned.
+        """
+        self.expire(session)
+        claimed = []
+        for id in session.exec(
+            select(CommandJob.id)
+            .where(CommandJob.status == JobStatus.QUEUED)
+            .order_by(CommandJob.priority, CommandJob.id)
+            .limit(n)
+        ).all():
+            if session.exec(
+                update(CommandJob)
+                .where(
+                    CommandJob.id == id,
+                    CommandJob.status == JobStatus.QUEUED,
+                )
+                .values(
+                    status=JobStatus.RUNNING,
+                    worker=worker,
+                    lease_expires_at=self._lease(),
+                    attempts=CommandJob.attempts + 1,
+                )
+            ).rowcount == 1:
+                claimed.append(id)
+        jobs = []
+        for job, command in session.exec(
+            select(CommandJob, Command)
+            .join(Command, Command.id == CommandJob.command_id)
+            .where(CommandJob.id.in_(claimed))
+            .order_by(CommandJob.priority, CommandJob.id)
+        ).all():
+            if command.status == CommandStatus.STARTED:
+                jobs.append((job, Command(**command.model_dump())))
+            else:
+                self._complete(job, command.status, session)
+        return jobs
+
+    def renew(self: Self, worker: str, ids: List[int],
+              session: Session) -> None:
+        """Extend the lease of the jobs of the worker (heartbeat)."""
+        session.exec(
+            update(CommandJob)
+            .where(CommandJob.id.in_(ids), CommandJob.worker == worker)
+            .values(lease_expires_at=self._lease())
+        )
+
+    def cancelled(self: Self, worker: str, ids: List[int],
+                  session: Session) -> List[int]:
+        """Ids of the jobs of the worker to stop.
+
+        Their command was stopped, or the job is not leased to the worker
+        anymore: replaced by a new start, or claimed again after its lease
+        expired.
+        """
+        running = session.exec(
+            select(CommandJob.id)
+            .join(Command, Command.id == CommandJob.command_id)
+            .where(
+                CommandJob.id.in_(ids),
+                CommandJob.worker == worker,
+                Command.status != CommandStatus.STOPPED,
+            )
+        ).all()
+        return sorted(set(ids) - set(running))
+
+    def release(self: Self, job: CommandJob, session: Session) -> None:
+        """Back to the queue, e.g. the worker could not run it."""
+        session.exec(
+            update(CommandJob)
+            .where(CommandJob.id == job.id, CommandJob.worker == job.worker)
+            .values(status=JobStatus.QUEUED, worker=None,
+                    lease_expires_at=None)
+        )
+
+    def complete(
+        self: Self, job: CommandJob, command: Command, session: Session
+    ) -> bool:
+        """Save the execution of the command of the job.
+
+        False if the job is not leased to its worker anymore: the result
+        is discarded.
+        """
+        found = session.exec(
+            select(CommandJob).where(
+                CommandJob.id == job.id, CommandJob.worker == job.worker
+            )
+        ).first()
+        if found is None:
+            return False
+        status = session.exec(
+            select(Command.status).where(Command.id == command.id)
+        ).one()
+        if status == CommandStatus.STOPPED:
+            command.status = CommandStatus.STOPPED
+        session.exec(
+            update(Command)
+            .where(Command.id == command.id)
+            .values(
+                status=command.status,
+                completed_at=command.completed_at,
+                stopped_at=command.stopped_at,
+                exit_code=command.exit_code,
+                duration=command.duration,
+                peak_rss=command.peak_rss,
+            )
+        )
+        self._complete(found, command.status, session)
+        return True
+
+    def expire(self: Self, session: Session) -> None:
+        """Queue again the running jobs with an expired lease.
+
+        After attempts_max leases the command is failed.
+        """
+        for job in session.exec(
+            select(CommandJob).where(
+                CommandJob.status == JobStatus.RUNNING,
+                CommandJob.lease_expires_at < datetime.now(),
+            )
+        ).all():
+            logger.warning(f"Job of command {job.command_id} expired")
+            if job.attempts < self.attempts_max:
+                self.release(job, session)
+                continue
+            session.exec(
+                update(Command)
+                .where(Command.id == job.command_id)
+                .values(
+                    status=CommandStatus.FAILED,
+                    completed_at=datetime.now(),
+                )
+            )
+            _publish(job, CommandStatus.FAILED)
+            self._complete(job, CommandStatus.FAILED, session)
+
+    def recover(self: Self, session: Session) -> int:
+        """Stop the started commands without a job, e.g. of a crash.
+
+        Returns the number of stopped commands.
+        """
+        now = datetime.now()
+        orphans = session.exec(
+            update(Command)
+            .where(
+                Command.status == CommandStatus.STARTED,
+                Command.id.not_in(select(CommandJob.command_id)),
+            )
+            .values(
+                status=CommandStatus.STOPPED,
+                stopped_at=now,
+                completed_at=now,
+            )
+        ).rowcount
+        self.expire(session)
+        if orphans > 0:
+            logger.warning(f"{orphans} orphan commands stopped")
+        return orphans
+
+    def _lease(self: Self) -> datetime:
+        return datetime.now() + timedelta(seconds=self.lease)
+
+    def _complete(
+        self: Self, job: CommandJob, status: CommandStatus, session: Session
+    ) -> None:
+        session.exec(delete(CommandJob).where(CommandJob.id == job.id))
+        dependents = session.exec(
+            select(CommandJob).where(
+                CommandJob.workflow_id == job.workflow_id,
+                CommandJob.status == JobStatus.WAITING,
+                CommandJob.command_id.in_(
+                    select(CommandDependency.command_id).where(
+                        CommandDependency.depends_on_id == job.command_id
+                    )
+                ),
+            )
+        ).all()
+        for dependent in dependents:
+            if status == CommandStatus.COMPLETED:
+                dependent.waiting -= 1
+                if dependent.waiting == 0:
+                    dependent.status = JobStatus.QUEUED
+                session.add(dependent)
+                continue
+            session.flush()
+            now = datetime.now()
+            session.exec(
+                update(Command)
+                .where(Command.id == dependent.command_id)
+                .values(
+                    status=CommandStatus.STOPPED,
+                    stopped_at=now,
+                    completed_at=now,
+                )
+            )
+            logger.info(f"Command {dependent.command_id} skipped")
+            _publish(dependent, CommandStatus.STOPPED)
+            self._complete(dependent, CommandStatus.STOPPED, session)
+        session.flush()
+
+
+def _publish(job: CommandJob, status: CommandStatus) -> None:
+    hub.publish(
+        job.workflow_id,
+        Event(
+            type=EventType.STATUS,
+            command_id=job.command_id,
+            status=status.value,
+            timestamp=datetime.now(),
+        ),
+    )
+
+
+jobs = JobQueue(
+    lease=job_lease, attempts_max=job_attempts_max, queue_size=job_queue_size
+)
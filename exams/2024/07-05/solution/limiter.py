@@ -0,0 +1,63 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Self, Tuple
+
+from pydantic import BaseModel
+
+
+class LimiterStats(BaseModel):
+    rate: float
+    burst: int
+    keys: int
+    allowed: int
+    rejected: int
+
+
+class RateLimiter:
+    """Token bucket of each key (e.g. client address or username).
+
+    A bucket holds up to burst tokens and gains rate tokens per second; each
+    request takes one. Only the size most recently used buckets are kept: a
+    forgotten bucket starts again full.
+    """
+
+    def __init__(self: Self, rate: float, burst: int, size: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        self._lock = Lock()
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+        self._allowed = 0
+        self._rejected = 0
+
+    def acquire(self: Self, key: str) -> bool:
+        now = monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.size:
+                self._buckets.popitem(last=False)
+            if allowed:
+                self._allowed += 1
+            else:
+                self._rejected += 1
+            return allowed
+
+    def reset(self: Self) -> None:
+        """All the buckets start again full."""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self: Self) -> LimiterStats:
+        with self._lock:
+            return LimiterStats(
+                rate=self.rate,
+                burst=self.burst,
+                keys=len(self._buckets),
+                allowed=self._allowed,
+                rejected=self._rejected,
+            )
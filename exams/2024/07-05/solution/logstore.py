@@ -0,0 +1,232 @@
+import mmap
+import os
+import shutil
+import struct
+from time import monotonic
+from typing import BinaryIO, List, Optional, Self, Tuple
+
+from config import (log_flush_interval, log_index_every, log_path,
+                    log_segment_size)
+from pydantic import BaseModel
+
+_OFFSET = struct.Struct("<Q")
+
+
+class CommandLog(BaseModel):
+    command_id: int
+    from_line: int
+    next_line: int
+    total_lines: int
+    lines: List[str]
+
+
+class LogWriter:
+    """Append the output lines of an execution to the segments of the log.
+
+    The segments are named by the number of their first line. Every
+    index_every lines the offset of the line in the segment is appended to
+    its index: a line is found reading at most index_every lines.
+    """
+
+    def __init__(self: Self, store: "LogStore", id: int) -> None:
+        self.store = store
+        self.dir = store.dir(id)
+        self.lines = 0
+        self._log: Optional[BinaryIO] = None
+        self._index: Optional[BinaryIO] = None
+        self._first = 0
+        self._size = 0
+        self._flushed = monotonic()
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir)
+
+    def _roll(self: Self) -> None:
+        self.close()
+        self._first, self._size = self.lines, 0
+        name = os.path.join(self.dir, f"{self._first:012d}")
+        self._log = open(f"{name}.log", "wb")
+        self._index = open(f"{name}.idx", "wb")
+
+    def write(self: Self, line: str) -> None:
+        if self._log is None or self._size >= self.store.segment_size:
+            self._roll()
+        if (self.lines - self._first) % self.store.index_every == 0:
+            self._index.write(_OFFSET.pack(self._size))
+        data = line.encode(errors="replace") + b"\n"
+        self._log.write(data)
+        self._size += len(data)
+        self.lines += 1
+        if monotonic() - self._flushed >= self.store.flush_interval:
+            self.flush()
+
+    def flush(self: Self) -> None:
+        """Make the lines visible to the readers."""
+        if self._log is not None:
+            # Index after the data: an indexed line is always complete.
+            self._log.flush()
+            self._index.flush()
+        self._flushed = monotonic()
+
+    def close(self: Self) -> None:
+        if self._log is not None:
+            self.flush()
+            self._log.close()
+            self._index.close()
+            self._log = self._index = None
+
+
+class _Segment:
+    """Segment of a log mapped in memory, as flushed when opened."""
+
+    def __init__(self: Self, dir: str, first: int, index_every: int) -> None:
+        self.first = first
+        self.index_every = index_every
+        name = os.path.join(dir, f"{first:012d}")
+        with open(f"{name}.idx", "rb") as index:
+            data = index.read()
+        self.offsets = [
+            offset for offset, in _OFFSET.iter_unpack(
+                data[: len(data) - len(data) % _OFFSET.size]
+            )
+        ]
+        with open(f"{name}.log", "rb") as log:
+            size = os.fstat(log.fileno()).st_size
+            self.map = (
+                mmap.mmap(log.fileno(), size, access=mmap.ACCESS_READ)
+                if size > 0
+                else b""
+            )
+        # A line is visible once ended by a newline.
+        self.size = self.map.rfind(b"\n") + 1
+
+    def close(self: Self) -> None:
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+    def _offset(self: Self, line: int) -> Tuple[int, int]:
+        """Indexed line before the line of the segment, and its offset."""
+        i = min((line - self.first) // self.index_every,
+                len(self.offsets) - 1)
+        while i >= 0 and self.offsets[i] >= self.size:
+            i -= 1
+        if i < 0:
+            return self.first, 0
+        return self.first + i * self.index_every, self.offsets[i]
+
+    def count(self: Self) -> int:
+        """Number of visible lines."""
+        line, offset = self._offset(
+            self.first + len(self.offsets) * self.index_every
+        )
+        return line - self.first + self.map[offset:self.size].count(b"\n")
+
+    def read(self: Self, line: int, limit: int) -> List[str]:
+        current, offset = self._offset(line)
+        lines = []
+        while offset < self.size and len(lines) < limit:
+            end = self.map.find(b"\n", offset, self.size)
+            if current >= line:
+                lines.append(
+                    self.map[offset:end].decode(errors="replace")
+                )
+            current, offset = current + 1, end + 1
+        return lines
+
+
+class LogStore:
+    """Append-only logs of the commands, one directory each.
+
+    The logs are read with memory-mapped segments: only the pages with the
+    requested lines are loaded, whatever the size of the log.
+    """
+
+    def __init__(
+        self: Self,
+        path: str,
+        segment_size: int,
+        index_every: int,
+        flush_interval: float,
+    ) -> None:
+        self.path = path
+        self.segment_size = segment_size
+        self.index_every = index_every
+        self.flush_interval = flush_interval
+
+    def dir(self: Self, id: int) -> str:
+        return os.path.join(self.path, str(id))
+
+    def open(self: Self, id: int) -> LogWriter:
+        """Writer of a new log of the command, replacing the previous one."""
+        return LogWriter(self, id)
+
+    def remove(self: Self, id: int) -> None:
+        shutil.rmtree(self.dir(id), ignore_errors=True)
+
+    def _firsts(self: Self, id: int) -> List[int]:
+        try:
+            names = os.listdir(self.dir(id))
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(name[: -len(".log")]) for name in names
+            if name.endswith(".log")
+        )
+
+    def read(
+        self: Self,
+        id: int,
+        from_line: int = 0,
+        limit: int = 100,
+        tail: Optional[int] = None,
+    ) -> CommandLog:
+        """Up to limit lines from from_line, or the last tail lines.
+
+        Lines are numbered from 0. A log replaced meanwhile is read empty.
+        """
+        total, lines = 0, []
+        try:
+            firsts = self._firsts(id)
+            if len(firsts) > 0:
+                last = _Segment(self.dir(id), firsts[-1], self.index_every)
+                try:
+                    total = firsts[-1] + last.count()
+                    if tail is not None:
+                        from_line, limit = max(total - tail, 0), tail
+                    for i, first in enumerate(firsts):
+                        line = from_line + len(lines)
+                        if len(lines) >= limit or line >= total:
+                            break
+                        if i + 1 < len(firsts) and firsts[i + 1] <= line:
+                            continue
+                        if i + 1 == len(firsts):
+                            segment = last
+                        else:
+                            segment = _Segment(
+                                self.dir(id), first, self.index_every
+                            )
+                        try:
+                            lines.extend(
+                                segment.read(line, limit - len(lines))
+                            )
+                        finally:
+                            if segment is not last:
+                                segment.close()
+                finally:
+                    last.close()
+        except FileNotFoundError:
+            total, lines = 0, []
+        return CommandLog(
+            command_id=id,
+            from_line=from_line,
+            next_line=from_line + len(lines),
+            total_lines=total,
+            lines=lines,
+        )
+
+
+logs = LogStore(
+    path=log_path,
+    segment_size=log_segment_size,
+    index_every=log_index_every,
+    flush_interval=log_flush_interval,
+)
@@ -1,37 +1,48 @@
 from enum import Enum
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
+from config import bulk_limit_max
+from db import AsyncDB, Owner, Page, Paginate, get_session
+from fastapi import Body, Depends
 from model import (
     Category,
     CategoryCreate,
     CategoryPublic,
     CategoryUpdate,
+    Filter,
+    Principal,
     Result,
-    User,
 )
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - Category"]
-    category = DB[Category](Category, "Category")
+    category = AsyncDB[Category](Category, "Category")
     allowed_roles_ids = ["admin", "user"]
 
-    def prefix(id: bool = False, created: bool = False, updated: bool = False):
+    def prefix(
+        id: bool = False,
+        created: bool = False,
+        updated: bool = False,
+        bulk: bool = False,
+    ):
         return (
             "/category"
             + ("/{id}" if id else "")
             + ("/created" if created else "")
             + ("/updated" if updated else "")
+            + ("/bulk" if bulk else "")
         )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new category"
+    CREATE_BULK = "Insert new categories"
+    UPDATE_BULK = "Update categories"
     READ_ALL_CREATED = "Get all the created categories"
     READ_ALL_UPDATED = "Get all the updated categories"
     READ = "Get the details of a category"
@@ -41,11 +52,46 @@ class __summary(str, Enum):
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     category: CategoryCreate,
 ) -> Result:
-    return __db.category.create(category, current_user)
+    return await __db.category.create(category, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    categories: Annotated[
+        List[CategoryCreate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.category.create_all(categories, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    categories: Annotated[
+        Dict[int, CategoryUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    await __db.category.check(list(categories), session, current_user)
+    return await __db.category.update_all(categories, current_user, session)
 
 
 @router.get(
@@ -55,10 +101,18 @@ async def create(
 )
 async def read_all_created(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CategoryPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CategoryPublic]:
-    return current_user.categories_created
+    return page.response(
+        await __db.category.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -68,10 +122,22 @@ async def read_all_created(
 )
 async def read_all_updated(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CategoryPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[CategoryPublic]:
-    return current_user.categories_updated
+    return page.response(
+        await __db.category.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -81,11 +147,13 @@ async def read_all_updated(
 )
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> CategoryPublic:
-    return __db.category.read_personal(id, current_user.categories_created)
+    return await __db.category.read_personal(id, current_user, session)
 
 
 @router.put(
@@ -95,10 +163,12 @@ async def read(
 )
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     category: CategoryUpdate,
 ) -> Result:
-    __db.category.read_personal(id, current_user.categories_created)
-    return __db.category.update(id, category, current_user)
+    await __db.category.read_personal(id, current_user, session)
+    return await __db.category.update(id, category, current_user, session)
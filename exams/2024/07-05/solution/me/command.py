@@ -1,23 +1,31 @@
 from enum import Enum
-from typing import Annotated, List
+from typing import Annotated, Dict, List, Optional
 
 from auth import RoleChecker
-from db import DB
+from config import bulk_limit_max, page_limit, page_limit_max
+from dag import add_dependency, rm_dependency
+from db import (AsyncDB, Owner, Page, Paginate, get_session,
+                run_in_session)
 from error import ConflictException, NotFoundException
-from fastapi import Depends
-from model import (Category, Command, CommandCreate, CommandPublic, CommandTag,
-                   CommandUpdate, Result, Tag, User, Workflow)
+from fastapi import Body, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from logstore import CommandLog, logs
+from model import (Category, Command, CommandCreate, CommandFilter,
+                   CommandPublic, CommandTag, CommandUpdate, Principal, Result,
+                   Tag, Workflow, command_filter)
+from runner import OutputLine, output
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - Command"]
-    command = DB[Command](Command, "Command")
-    workflow = DB[Workflow](Workflow, "Workflow")
-    category = DB[Category](Category, "Category")
-    tag = DB[Tag](Tag, "Tag")
-    command_tag = DB[CommandTag](CommandTag, "CommandTag")
+    command = AsyncDB[Command](Command, "Command")
+    workflow = AsyncDB[Workflow](Workflow, "Workflow")
+    category = AsyncDB[Category](Category, "Category")
+    tag = AsyncDB[Tag](Tag, "Tag")
+    command_tag = AsyncDB[CommandTag](CommandTag, "CommandTag")
     allowed_roles_ids = ["admin", "user"]
 
     def prefix(
@@ -26,6 +34,13 @@ class __db:
         updated: bool = False,
         add_tag: bool = False,
         rm_tag: bool = False,
+        add_tags: bool = False,
+        rm_tags: bool = False,
+        output: bool = False,
+        log: bool = False,
+        add_dependency: bool = False,
+        rm_dependency: bool = False,
+        bulk: bool = False,
     ):
         return (
             "/command"
@@ -34,35 +49,135 @@ class __db:
             + ("/updated" if updated else "")
             + ("/add/{tag_id}" if add_tag else "")
             + ("/rm/{tag_id}" if rm_tag else "")
+            + ("/tags/add" if add_tags else "")
+            + ("/tags/rm" if rm_tags else "")
+            + ("/output" if output else "")
+            + ("/log" if log else "")
+            + ("/dependency/add/{depends_on_id}" if add_dependency else "")
+            + ("/dependency/rm/{depends_on_id}" if rm_dependency else "")
+            + ("/bulk" if bulk else "")
         )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new command"
+    CREATE_BULK = "Insert new commands"
+    UPDATE_BULK = "Update commands"
+    READ_ALL = "Get all the command"
     READ_ALL_CREATED = "Get all the created command"
     READ_ALL_UPDATED = "Get all the updated command"
     READ = "Get the details of a command"
     UPDATE = "Update a command"
     ADD_TAG = "Add a tag to the command"
     RM_TAG = "Remove a tag from the command"
+    ADD_TAGS = "Add tags to the command"
+    RM_TAGS = "Remove tags from the command"
+    OUTPUT = "Get the last output lines of the command"
+    LOG = "Get a range of lines of the log of the command"
+    ADD_DEPENDENCY = "Make the command depend on another one"
+    RM_DEPENDENCY = "Remove a dependency of the command"
 
 
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     command: CommandCreate,
 ) -> Result:
-    __db.workflow.read_personal(
+    await __db.workflow.read_personal(
         command.workflow_id,
-        current_user.workflows_created + current_user.workflows_updated,
+        current_user,
+        session,
+        owners=[Owner.CREATED, Owner.UPDATED],
     )
-    __db.category.read_personal(
+    await __db.category.read_personal(
         command.category_id,
-        current_user.categories_created + current_user.categories_updated,
+        current_user,
+        session,
+        owners=[Owner.CREATED, Owner.UPDATED],
+    )
+    return await __db.command.create(command, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    commands: Annotated[List[CommandCreate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    await __db.workflow.check(
+        [command.workflow_id for command in commands],
+        session,
+        current_user,
+        owners=[Owner.CREATED, Owner.UPDATED],
+    )
+    await __db.category.check(
+        [command.category_id for command in commands],
+        session,
+        current_user,
+        owners=[Owner.CREATED, Owner.UPDATED],
+    )
+    return await __db.command.create_all(commands, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    commands: Annotated[
+        Dict[int, CommandUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    await __db.command.check(list(commands), session, current_user)
+    await __db.workflow.check(
+        [command.workflow_id for command in commands.values()],
+        session,
+        current_user,
+        owners=[Owner.CREATED, Owner.UPDATED],
+    )
+    await __db.category.check(
+        [command.category_id for command in commands.values()],
+        session,
+        current_user,
+        owners=[Owner.CREATED, Owner.UPDATED],
+    )
+    return await __db.command.update_all(commands, current_user, session)
+
+
+@router.get(__db.prefix(), tags=__db.tags, summary=__summary.READ_ALL)
+async def read_all(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CommandPublic))],
+    filter: Annotated[CommandFilter, Depends(command_filter)],
+) -> List[CommandPublic]:
+    """Commands created or updated by the user, e.g. with all the tags
+    ?tag=1&tag=2 or any of them with &tag_match=any."""
+    return page.response(
+        await __db.command.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.CREATED, Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
     )
-    return __db.command.create(command, current_user)
 
 
 @router.get(
@@ -72,10 +187,18 @@ async def create(
 )
 async def read_all_created(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CommandPublic))],
+    filter: Annotated[CommandFilter, Depends(command_filter)],
 ) -> List[CommandPublic]:
-    return current_user.commands_created
+    return page.response(
+        await __db.command.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -85,10 +208,22 @@ async def read_all_created(
 )
 async def read_all_updated(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(CommandPublic))],
+    filter: Annotated[CommandFilter, Depends(command_filter)],
 ) -> List[CommandPublic]:
-    return current_user.commands_updated
+    return page.response(
+        await __db.command.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -98,33 +233,41 @@ async def read_all_updated(
 )
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> CommandPublic:
-    return __db.command.read_personal(id, current_user.commands_created)
+    return await __db.command.read_personal(id, current_user, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     command: CommandUpdate,
 ) -> Result:
-    __db.command.read_personal(id, current_user.commands_created)
+    await __db.command.read_personal(id, current_user, session)
     if command.workflow_id is not None:
-        __db.workflow.read_personal(
+        await __db.workflow.read_personal(
             command.workflow_id,
-            current_user.workflows_created + current_user.workflows_updated,
+            current_user,
+            session,
+            owners=[Owner.CREATED, Owner.UPDATED],
         )
     if command.category_id is not None:
-        __db.category.read_personal(
+        await __db.category.read_personal(
             command.category_id,
-            current_user.categories_created + current_user.categories_updated,
+            current_user,
+            session,
+            owners=[Owner.CREATED, Owner.UPDATED],
         )
-    return __db.command.update(id, command, current_user)
+    return await __db.command.update(id, command, current_user, session)
 
 
 @router.put(
@@ -134,21 +277,25 @@ async def update(
 )
 async def add_tag(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     tag_id: int,
-):
-    for command_tag in current_user.command_tags_created:
-        if command_tag.command_id == id and command_tag.tag_id == tag_id:
-            raise ConflictException(
-                target="CommandTag",
-                id=dict(command_id=id, tag_id=tag_id),
-            )
-    __db.command.read_personal(id, current_user.commands_created)
-    __db.tag.read_personal(tag_id, current_user.tags_created)
-    command_tag = CommandTag(command_id=id, tag=tag_id)
-    return __db.command_tag.create(command_tag, current_user)
+) -> Result:
+    await __db.command.read_personal(id, current_user, session)
+    await __db.tag.read_personal(tag_id, current_user, session)
+    for result in await __db.command_tag.create_missing(
+        [CommandTag(command_id=id, tag_id=tag_id)],
+        ["command_id", "tag_id"],
+        current_user,
+        session,
+    ):
+        return result
+    raise ConflictException(
+        target="CommandTag", id=dict(command_id=id, tag_id=tag_id)
+    )
 
 
 @router.delete(
@@ -156,14 +303,163 @@ async def add_tag(
 )
 async def rm_tag(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     tag_id: int,
-):
-    for command_tag in current_user.command_tags_created:
-        if command_tag.command_id == id and command_tag.tag_id == tag_id:
-            return __db.command_tag.delete(command_tag.id)
+) -> Result:
+    for result in await __db.command_tag.delete_where(
+        [
+            CommandTag.command_id == id,
+            CommandTag.tag_id == tag_id,
+            CommandTag.created_by_id == current_user.id,
+        ],
+        session,
+    ):
+        return result
     raise NotFoundException(
         target="CommandTag", id=dict(command_id=id, tag_id=tag_id)
     )
+
+
+@router.put(
+    __db.prefix(id=True, add_tags=True),
+    tags=__db.tags,
+    summary=__summary.ADD_TAGS,
+)
+async def add_tags(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+    tag_ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    """Results of the tags added, the ones of the command are skipped."""
+    await __db.command.read_personal(id, current_user, session)
+    await __db.tag.check(tag_ids, session, current_user)
+    return await __db.command_tag.create_missing(
+        [
+            CommandTag(command_id=id, tag_id=tag_id)
+            for tag_id in dict.fromkeys(tag_ids)
+        ],
+        ["command_id", "tag_id"],
+        current_user,
+        session,
+    )
+
+
+@router.delete(
+    __db.prefix(id=True, rm_tags=True),
+    tags=__db.tags,
+    summary=__summary.RM_TAGS,
+)
+async def rm_tags(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+    tag_ids: Annotated[List[int], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    """Results of the tags removed, the ones not of the command are
+    skipped."""
+    return await __db.command_tag.delete_where(
+        [
+            CommandTag.command_id == id,
+            CommandTag.tag_id.in_(tag_ids),
+            CommandTag.created_by_id == current_user.id,
+        ],
+        session,
+    )
+
+
+@router.get(
+    __db.prefix(id=True, output=True),
+    tags=__db.tags,
+    summary=__summary.OUTPUT,
+)
+async def read_output(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> List[OutputLine]:
+    command = await __db.command.read_personal(id, current_user, session)
+    return output.read(command.id)
+
+
+@router.get(
+    __db.prefix(id=True, log=True),
+    tags=__db.tags,
+    summary=__summary.LOG,
+)
+async def read_log(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+    from_line: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=page_limit_max)] = page_limit,
+    tail: Annotated[Optional[int], Query(ge=1, le=page_limit_max)] = None,
+) -> CommandLog:
+    """Lines from from_line, or the last tail lines if given."""
+    command = await __db.command.read_personal(id, current_user, session)
+    return await run_in_threadpool(
+        logs.read, command.id, from_line, limit, tail
+    )
+
+
+@router.put(
+    __db.prefix(id=True, add_dependency=True),
+    tags=__db.tags,
+    summary=__summary.ADD_DEPENDENCY,
+)
+async def add_command_dependency(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+    depends_on_id: int,
+) -> Result:
+    return await run_in_session(
+        session,
+        add_dependency,
+        await __db.command.read_personal(id, current_user, session),
+        await __db.command.read_personal(
+            depends_on_id, current_user, session
+        ),
+        current_user,
+    )
+
+
+@router.delete(
+    __db.prefix(id=True, rm_dependency=True),
+    tags=__db.tags,
+    summary=__summary.RM_DEPENDENCY,
+)
+async def rm_command_dependency(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+    depends_on_id: int,
+) -> Result:
+    return await run_in_session(
+        session,
+        rm_dependency,
+        await __db.command.read_personal(id, current_user, session),
+        depends_on_id,
+    )
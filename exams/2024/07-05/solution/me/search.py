@@ -0,0 +1,55 @@
+from enum import Enum
+from typing import Annotated, List
+
+from auth import RoleChecker
+from config import page_limit, page_limit_max
+from db import get_session, run_in_session
+from fastapi import Depends, Query
+from model import Command, Principal, command_search
+from search import SearchHit
+from sqlalchemy import or_
+from sqlmodel import Session
+
+from . import router
+
+
+class __db:
+    tags = ["Me - Search"]
+    allowed_roles_ids = ["admin", "user"]
+
+    def prefix(command: bool = False):
+        return "/search" + ("/command" if command else "")
+
+
+class __summary(str, Enum):
+    SEARCH_COMMAND = "Search the commands by path"
+
+
+@router.get(
+    __db.prefix(command=True),
+    tags=__db.tags,
+    summary=__summary.SEARCH_COMMAND,
+)
+async def search_command(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=page_limit_max)] = page_limit,
+) -> List[SearchHit]:
+    """Commands created or updated by the user with all the words of q
+    (as prefixes), the best matches first."""
+    return await run_in_session(
+        session,
+        command_search.search,
+        q,
+        limit=limit,
+        where=[
+            or_(
+                Command.created_by_id == current_user.id,
+                Command.updated_by_id == current_user.id,
+            )
+        ],
+    )
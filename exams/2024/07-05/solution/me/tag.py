@@ -1,30 +1,41 @@
 from enum import Enum
-from typing import Annotated, List
+from typing import Annotated, Dict, List
 
 from auth import RoleChecker
-from db import DB
-from fastapi import Depends
-from model import Result, Tag, TagCreate, TagPublic, TagUpdate, User
+from config import bulk_limit_max
+from db import AsyncDB, Owner, Page, Paginate, get_session
+from fastapi import Body, Depends
+from model import (Filter, Principal, Result, Tag, TagCreate, TagPublic,
+                   TagUpdate)
+from sqlmodel import Session
 
 from . import router
 
 
 class __db:
     tags = ["Me - Tag"]
-    tag = DB[Tag](Tag, "Tag")
+    tag = AsyncDB[Tag](Tag, "Tag")
     allowed_roles_ids = ["admin", "user"]
 
-    def prefix(id: bool = False, created: bool = False, updated: bool = False):
+    def prefix(
+        id: bool = False,
+        created: bool = False,
+        updated: bool = False,
+        bulk: bool = False,
+    ):
         return (
             "/tag"
             + ("/{id}" if id else "")
             + ("/created" if created else "")
             + ("/updated" if updated else "")
+            + ("/bulk" if bulk else "")
         )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new tag"
+    CREATE_BULK = "Insert new tags"
+    UPDATE_BULK = "Update tags"
     READ_ALL_CREATED = "Get all the created tags"
     READ_ALL_UPDATED = "Get all the updated tags"
     READ = "Get the details of a tag"
@@ -34,11 +45,44 @@ class __summary(str, Enum):
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     tag: TagCreate,
 ) -> Result:
-    return __db.tag.create(tag, current_user)
+    return await __db.tag.create(tag, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    tags: Annotated[List[TagCreate], Body(max_length=bulk_limit_max)],
+) -> List[Result]:
+    return await __db.tag.create_all(tags, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    tags: Annotated[
+        Dict[int, TagUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    await __db.tag.check(list(tags), session, current_user)
+    return await __db.tag.update_all(tags, current_user, session)
 
 
 @router.get(
@@ -48,10 +92,18 @@ async def create(
 )
 async def read_all_created(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TagPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TagPublic]:
-    return current_user.tags_created
+    return page.response(
+        await __db.tag.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -61,10 +113,22 @@ async def read_all_created(
 )
 async def read_all_updated(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(TagPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[TagPublic]:
-    return current_user.tags_updated
+    return page.response(
+        await __db.tag.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -74,20 +138,24 @@ async def read_all_updated(
 )
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> TagPublic:
-    return __db.tag.read_personal(id, current_user.tags_created)
+    return await __db.tag.read_personal(id, current_user, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
 async def me_update_tag(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     tag: TagUpdate,
 ) -> Result:
-    __db.tag.read_personal(id, current_user.tags_created)
-    return __db.tag.update(id, tag, current_user)
+    await __db.tag.read_personal(id, current_user, session)
+    return await __db.tag.update(id, tag, current_user, session)
@@ -1,21 +1,30 @@
+import asyncio
+from datetime import datetime
 from enum import Enum
-from threading import Thread
-from typing import Annotated, List
+from typing import Annotated, AsyncIterator, Dict, List, Optional
 
-from auth import RoleChecker
-from db import DB, Action
-from fastapi import Depends
-from model import (Command, Result, User, Workflow, WorkflowCreate,
-                   WorkflowPublic, WorkflowUpdate)
-from utils import threaded
+from auth import RoleChecker, WebSocketRoleChecker
+from config import bulk_limit_max, events_keepalive
+from dag import Dag, WorkflowExecution, stop_workflow
+from db import (AsyncDB, Action, Owner, Page, Paginate, get_session, profile,
+                run_in_session, unit_of_work)
+from error import NotFoundException
+from events import Event, EventType, hub
+from fastapi import (Body, Depends, WebSocket, WebSocketDisconnect,
+                     WebSocketException, status)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from model import (Command, CriticalPath, Filter, Principal, Result,
+                   Workflow, WorkflowCreate, WorkflowPublic, WorkflowUpdate)
+from sqlmodel import Session, select
 
 from . import router
 
 
 class __db:
     tags = ["Me - Workflow"]
-    workflow = DB[Workflow](Workflow, "Workflow")
-    command = DB[Command](Command, "Command")
+    workflow = AsyncDB[Workflow](Workflow, "Workflow")
+    command = AsyncDB[Command](Command, "Command")
     allowed_roles_ids = ["admin", "user"]
 
     def prefix(
@@ -24,6 +33,9 @@ class __db:
         updated: bool = False,
         start: bool = False,
         stop: bool = False,
+        critical_path: bool = False,
+        events: bool = False,
+        bulk: bool = False,
     ):
         return (
             "/workflow"
@@ -32,27 +44,69 @@ class __db:
             + ("/updated" if updated else "")
             + ("/start" if start else "")
             + ("/stop" if stop else "")
+            + ("/critical-path" if critical_path else "")
+            + ("/events" if events else "")
+            + ("/bulk" if bulk else "")
         )
 
 
 class __summary(str, Enum):
     CREATE = "Insert a new workflow"
+    CREATE_BULK = "Insert new workflows"
+    UPDATE_BULK = "Update workflows"
     READ_ALL_CREATED = "Get all the created workflow"
     READ_ALL_UPDATED = "Get all the updated workflow"
     READ = "Get the details of a workflow"
     UPDATE = "Update a workflow"
     START = "Start a workflow"
     STOP = "Stop a workflow"
+    CRITICAL_PATH = "Get the critical path of a workflow"
+    EVENTS = "Stream the status and output of the commands of a workflow"
 
 
 @router.post(__db.prefix(), tags=__db.tags, summary=__summary.CREATE)
 async def create(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     workflow: WorkflowCreate,
 ) -> Result:
-    return __db.workflow.create(workflow, current_user)
+    return await __db.workflow.create(workflow, current_user, session)
+
+
+@router.post(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.CREATE_BULK
+)
+async def create_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    workflows: Annotated[
+        List[WorkflowCreate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    return await __db.workflow.create_all(workflows, current_user, session)
+
+
+@router.put(
+    __db.prefix(bulk=True), tags=__db.tags, summary=__summary.UPDATE_BULK
+)
+async def update_bulk(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    workflows: Annotated[
+        Dict[int, WorkflowUpdate], Body(max_length=bulk_limit_max)
+    ],
+) -> List[Result]:
+    await __db.workflow.check(list(workflows), session, current_user)
+    return await __db.workflow.update_all(workflows, current_user, session)
 
 
 @router.get(
@@ -62,10 +116,18 @@ async def create(
 )
 async def read_all_created(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(WorkflowPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[WorkflowPublic]:
-    return current_user.workflows_created
+    return page.response(
+        await __db.workflow.read_all_personal(
+            current_user, session, page=page, filter=filter
+        )
+    )
 
 
 @router.get(
@@ -75,10 +137,22 @@ async def read_all_created(
 )
 async def read_all_updated(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
+    page: Annotated[Page, Depends(Paginate(WorkflowPublic))],
+    filter: Annotated[Filter, Depends()],
 ) -> List[WorkflowPublic]:
-    return current_user.workflows_updated
+    return page.response(
+        await __db.workflow.read_all_personal(
+            current_user,
+            session,
+            owners=[Owner.UPDATED],
+            page=page,
+            filter=filter,
+        )
+    )
 
 
 @router.get(
@@ -88,23 +162,27 @@ async def read_all_updated(
 )
 async def read(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> WorkflowPublic:
-    return __db.workflow.read_personal(id, current_user.workflows_created)
+    return await __db.workflow.read_personal(id, current_user, session)
 
 
 @router.put(__db.prefix(id=True), tags=__db.tags, summary=__summary.UPDATE)
 async def update(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
     workflow: WorkflowUpdate,
 ) -> Result:
-    __db.workflow.read_personal(id, current_user.workflows_created)
-    return __db.workflow.update(id, workflow, current_user)
+    await __db.workflow.read_personal(id, current_user, session)
+    return await __db.workflow.update(id, workflow, current_user, session)
 
 
 @router.put(
@@ -112,11 +190,14 @@ async def update(
 )
 async def start(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
+    priority: int = 0,
 ) -> Result:
-    return _execute(id, Action.STARTED, current_user)
+    return await _execute(id, Action.STARTED, current_user, session, priority)
 
 
 @router.put(
@@ -124,36 +205,164 @@ async def start(
 )
 async def stop(
     current_user: Annotated[
-        User, Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids))
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
     ],
+    session: Annotated[Session, Depends(get_session)],
     id: int,
 ) -> Result:
-    return _execute(id, Action.STOPPED, current_user)
-
-
-def _execute(id: str, action: Action, current_user: User):
-    workflow = __db.workflow.read_personal(
-        id, current_user.workflows_created).check_not_empty()
-    for command in workflow.commands:
-        match action:
-            case Action.STARTED:
-                _t = command.start()
-                command.started_by_id = current_user
-                _waiting_execution(_t, command, current_user)
-            case Action.STOPPED:
-                command.stop()
-                command.stopped_by_id = current_user
-        __db.command.update(command.id, command, current_user)
+    return await _execute(id, Action.STOPPED, current_user, session)
+
+
+@router.get(
+    __db.prefix(id=True, critical_path=True),
+    tags=__db.tags,
+    summary=__summary.CRITICAL_PATH,
+)
+async def read_critical_path(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> CriticalPath:
+    workflow = await __db.workflow.read_personal(
+        id, current_user, session, options=profile(Workflow.commands)
+    )
+    dag = await run_in_session(session, Dag.of, workflow)
+    return dag.critical_path()
+
+
+@router.get(
+    __db.prefix(id=True, events=True),
+    tags=__db.tags,
+    summary=__summary.EVENTS,
+)
+async def read_events(
+    current_user: Annotated[
+        Principal,
+        Depends(RoleChecker(allowed_role_ids=__db.allowed_roles_ids)),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> StreamingResponse:
+    """Server-Sent Events: one event per status change or output line."""
+    await __db.workflow.read_personal(id, current_user, session)
+    return StreamingResponse(
+        _sse(_events(id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.websocket(__db.prefix(id=True, events=True))
+async def websocket_events(
+    websocket: WebSocket,
+    current_user: Annotated[
+        Principal,
+        Depends(
+            WebSocketRoleChecker(allowed_role_ids=__db.allowed_roles_ids)
+        ),
+    ],
+    session: Annotated[Session, Depends(get_session)],
+    id: int,
+) -> None:
+    """Same events of read_events, one JSON message each."""
+    try:
+        await __db.workflow.read_personal(id, current_user, session)
+    except NotFoundException as e:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason=f"{e.action.value} {e.target} {e.id}",
+        )
+    # The connection of the session is not kept for the whole stream.
+    await run_in_session(session, Session.commit)
+    await websocket.accept()
+    closed = asyncio.create_task(_closed(websocket))
+    try:
+        async for event in _events(id):
+            if closed.done():
+                return
+            if event is not None:
+                await websocket.send_text(
+                    event.model_dump_json(exclude_none=True)
+                )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+
+
+async def _closed(websocket: WebSocket) -> None:
+    """Wait the client to close the connection, ignoring its messages."""
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+def _statuses(id: int) -> List[Event]:
+    with unit_of_work() as session:
+        return [
+            Event(
+                type=EventType.STATUS,
+                command_id=command_id,
+                status=command_status.value,
+                timestamp=datetime.now(),
+            )
+            for command_id, command_status in session.exec(
+                select(Command.id, Command.status).where(
+                    Command.workflow_id == id
+                )
+            )
+        ]
+
+
+async def _events(id: int) -> AsyncIterator[Optional[Event]]:
+    """Current status of the commands, then their events.
+
+    None every events_keepalive seconds without events. The subscription
+    starts before reading the statuses: no change is lost in between.
+    """
+    with hub.subscribe(id) as subscription:
+        for event in await run_in_threadpool(_statuses, id):
+            yield event
+        while True:
+            yield await subscription.get(events_keepalive)
+
+
+async def _sse(events: AsyncIterator[Optional[Event]]) -> AsyncIterator[str]:
+    async for event in events:
+        if event is None:
+            yield ": keepalive\n\n"
+        else:
+            yield (
+                f"event: {event.type.value}\n"
+                f"data: {event.model_dump_json(exclude_none=True)}\n\n"
+            )
+
+
+async def _execute(
+    id: int,
+    action: Action,
+    current_user: Principal,
+    session: Session,
+    priority: int = 0,
+) -> Result:
+    workflow = await __db.workflow.read_personal(
+        id, current_user, session, options=profile(Workflow.commands)
+    )
+    workflow.check_not_empty()
+    match action:
+        case Action.STARTED:
+            dag = await run_in_session(session, Dag.of, workflow)
+            execution = WorkflowExecution(dag, current_user, priority)
+            await run_in_session(session, execution.start)
+        case Action.STOPPED:
+            await run_in_session(
+                session, stop_workflow, workflow, current_user
+            )
     return Result(
         action=action,
-        target=workflow.model_text,
+        target=__db.workflow.model_text,
         id=workflow.id,
     )
-
-
-@threaded
-def _waiting_execution(thread: Thread, command: Command,
-                       current_user: User) -> None:
-    if thread.is_alive():
-        thread.join()
-        __db.command.update(command.id, command, current_user)
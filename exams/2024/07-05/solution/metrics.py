@@ -0,0 +1,290 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Optional, Self, Sequence, Tuple
+
+from config import app_name, metrics_buckets, metrics_statement_buckets
+from fastapi import APIRouter, Response
+from sqlalchemy import Engine, event
+
+router = APIRouter()
+
+
+class Histogram:
+    """Observations counted in buckets by upper bound, with their sum."""
+
+    def __init__(self: Self, buckets: Sequence[float]) -> None:
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self: Self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self: Self) -> List[Tuple[str, int]]:
+        """Count of each bucket with the lower ones (le), as Prometheus."""
+        bounds = [*(_number(bound) for bound in self.buckets), "+Inf"]
+        total, counts = 0, []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+
+class RequestMetrics:
+    """Cost of the request being served, see MetricsMiddleware."""
+
+    def __init__(self: Self) -> None:
+        self.start = perf_counter()
+        self.statements = 0
+        self.sql_time = 0.0
+        self.password_time = 0.0
+        self.response_bytes = 0
+
+    def timing(self: Self) -> str:
+        """Value of the X-Debug-Timing header, as Server-Timing."""
+        return (
+            f"app;dur={(perf_counter() - self.start) * 1000:.2f}, "
+            f"sql;dur={self.sql_time * 1000:.2f};"
+            f'desc="{self.statements} statements", '
+            f"password;dur={self.password_time * 1000:.2f}"
+        )
+
+
+class _RouteMetrics:
+    def __init__(self: Self) -> None:
+        self.duration = Histogram(metrics_buckets)
+        self.statements = Histogram(metrics_statement_buckets)
+        self.sql_time = 0.0
+        self.password_time = 0.0
+        self.response_bytes = 0
+        self.responses: Dict[int, int] = {}
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+class Metrics:
+    """Metrics of the requests by method and route (path template).
+
+    The SQL statements are counted by the engine events (see instrument) and
+    the password verifications by the password pool: both are added to the
+    request in the context, the threads of the thread pool included.
+    """
+
+    def __init__(self: Self) -> None:
+        self._lock = Lock()
+        self._routes: Dict[Tuple[str, str], _RouteMetrics] = {}
+
+    def record(
+        self: Self,
+        method: str,
+        route: str,
+        status: int,
+        request: RequestMetrics,
+    ) -> None:
+        with self._lock:
+            _route = self._routes.setdefault((method, route), _RouteMetrics())
+            _route.duration.observe(perf_counter() - request.start)
+            _route.statements.observe(request.statements)
+            _route.sql_time += request.sql_time
+            _route.password_time += request.password_time
+            _route.response_bytes += request.response_bytes
+            _route.responses[status] = _route.responses.get(status, 0) + 1
+
+    def render(self: Self) -> str:
+        """Prometheus text format."""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            name = f"{app_name}_http"
+            lines = []
+
+            def _family(
+                metric: str, type: str, help: str, values
+            ) -> None:
+                lines.append(f"# HELP {name}_{metric} {help}")
+                lines.append(f"# TYPE {name}_{metric} {type}")
+                for suffix, labels, value in values:
+                    lines.append(
+                        f"{name}_{metric}{suffix}{_labels(labels)} "
+                        f"{_number(value)}"
+                    )
+
+            def _histogram(metric: str, help: str, attr: str) -> None:
+                _family(
+                    metric,
+                    "histogram",
+                    help,
+                    (
+                        value
+                        for (method, route), _route in routes
+                        for value in _series(
+                            dict(method=method, route=route),
+                            getattr(_route, attr),
+                        )
+                    ),
+                )
+
+            def _counter(metric: str, help: str, attr: str) -> None:
+                _family(
+                    metric,
+                    "counter",
+                    help,
+                    (
+                        ("", dict(method=method, route=route),
+                         getattr(_route, attr))
+                        for (method, route), _route in routes
+                    ),
+                )
+
+            _family(
+                "requests_total",
+                "counter",
+                "Requests served.",
+                (
+                    ("", dict(method=method, route=route, status=status),
+                     count)
+                    for (method, route), _route in routes
+                    for status, count in sorted(_route.responses.items())
+                ),
+            )
+            _histogram("request_duration_seconds", "Latency of the requests.",
+                       "duration")
+            _histogram("request_sql_statements",
+                       "SQL statements executed by a request.", "statements")
+            _counter("request_sql_duration_seconds_total",
+                     "Time spent executing SQL statements.", "sql_time")
+            _counter("request_password_duration_seconds_total",
+                     "Time spent verifying passwords.", "password_time")
+            _counter("response_bytes_total", "Bytes of the response bodies.",
+                     "response_bytes")
+            return "\n".join(lines) + "\n"
+
+    def reset(self: Self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+def _series(labels: dict, histogram: Histogram):
+    for bound, count in histogram.cumulative():
+        yield "_bucket", dict(labels, le=bound), count
+    yield "_sum", labels, histogram.sum
+    yield "_count", labels, histogram.count
+
+
+def _labels(labels: dict) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(
+        f'{key}="{_escape(str(value))}"' for key, value in labels.items()
+    ) + "}"
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def _number(value: float | str) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany) -> None:
+    if context is not None:
+        context._metrics_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany) -> None:
+    request = _current.get()
+    if request is None or context is None:
+        return
+    request.statements += 1
+    request.sql_time += perf_counter() - context._metrics_start
+
+
+def instrument(engine: Engine) -> None:
+    """Count the statements executed by the engine in the requests."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def observe_password(seconds: float) -> None:
+    """Add a password verification to the current request, if any."""
+    request = _current.get()
+    if request is not None:
+        request.password_time += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the HTTP requests in the metrics.
+
+    A request with the X-Debug-Timing header (any value) gets its own
+    timings back in the X-Debug-Timing header of the response, unless
+    debug_timing is False.
+    """
+
+    def __init__(
+        self: Self, app, metrics: Metrics, debug_timing: bool
+    ) -> None:
+        self.app = app
+        self.metrics = metrics
+        self.debug_timing = debug_timing
+
+    async def __call__(self: Self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = RequestMetrics()
+        debug = self.debug_timing and any(
+            name == b"x-debug-timing" for name, _ in scope["headers"]
+        )
+        status = 500
+
+        async def _send(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if debug:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-debug-timing", request.timing().encode()),
+                    ]
+            elif message["type"] == "http.response.body":
+                request.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        token = _current.set(request)
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+            # Set by the router: the path template keeps the labels few.
+            route = scope.get("route")
+            self.metrics.record(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                request,
+            )
+
+
+metrics = Metrics()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics() -> Response:
+    return Response(
+        content=metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,19 +1,33 @@
 from datetime import datetime
 from enum import Enum
-from random import randrange, seed
-from time import sleep
-from typing import List, Optional, Self
-
-from config import db_path, echo_engine, logger
+from typing import Annotated, List, Optional, Self
+
+from config import (bulk_limit_max, db_async, db_max_overflow,
+                    db_pool_recycle, db_pool_size, db_pool_timeout,
+                    db_pragmas, db_prepare_threshold, db_read_pool_size,
+                    db_read_url, db_statement_cache_size, db_url,
+                    echo_engine, logger)
+from engine import create_db_async_engine, create_db_engine
 from error import ConflictException, EmptyException
+from events import Event, EventType, hub
+from fastapi import Depends, Query
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String
-from sqlmodel import Field, Relationship, SQLModel, create_engine
-from utils import threaded
+from runner import run, tokens
+from scheduler import Job, scheduler
+from search import SearchIndex
+from sqlalchemy import (Column, Index, Integer, String, UniqueConstraint,
+                        func)
+from sqlalchemy.orm import declared_attr
+from sqlmodel import Field, Relationship, SQLModel, select
 
 # Base
 
-seed()
+
+def owner_indexes(table: str, *owners: str) -> tuple:
+    """Indexes of the records of a user, sorted by id."""
+    return tuple(
+        Index(f"ix_{table}_{owner}_id", owner, "id") for owner in owners
+    )
 
 
 class BasePublic(SQLModel):
@@ -25,11 +39,43 @@ class BasePublic(SQLModel):
     created_by_id: Optional[str] = Field(foreign_key="user.id")
     updated_by_id: Optional[str] = Field(foreign_key="user.id")
 
+    @declared_attr
+    def __table_args__(cls) -> tuple:
+        return owner_indexes(
+            cls.__tablename__, "created_by_id", "updated_by_id"
+        )
+
+
+class Filter(BaseModel):
+    """Query parameters filtering the list endpoints."""
+
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    def where(self: Self, model_type: type[SQLModel]) -> list:
+        conditions = []
+        if self.created_after is not None:
+            conditions.append(model_type.created_at >= self.created_after)
+        if self.created_before is not None:
+            conditions.append(model_type.created_at < self.created_before)
+        return conditions
+
 
 # CommandTag
 
 
 class CommandTag(SQLModel, table=True):
+    # A link once (the conflict target of DB.create_missing) and the
+    # commands of a tag, read from the index only.
+    __table_args__ = (
+        Index(
+            "ix_commandtag_command_id_tag_id", "command_id", "tag_id",
+            unique=True,
+        ),
+        Index("ix_commandtag_tag_id_command_id", "tag_id", "command_id"),
+        *owner_indexes("commandtag", "created_by_id"),
+    )
+
     id: int = Field(
         sa_column=Column("id", Integer, primary_key=True, autoincrement=True)
     )
@@ -41,11 +87,26 @@ class CommandTag(SQLModel, table=True):
         back_populates="command_tags_created",
         sa_relationship_kwargs={
             "primaryjoin": "CommandTag.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
 
 
+# CommandDependency
+
+
+class CommandDependency(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("command_id", "depends_on_id"),)
+
+    id: int = Field(
+        sa_column=Column("id", Integer, primary_key=True, autoincrement=True)
+    )
+    command_id: int = Field(foreign_key="command.id")
+    depends_on_id: int = Field(foreign_key="command.id")
+    created_at: Optional[datetime] = Field(default_factory=datetime.now)
+    created_by_id: Optional[str] = Field(foreign_key="user.id")
+
+
 # Workflow
 
 
@@ -68,21 +129,21 @@ class Workflow(WorkflowPublic, table=True):
         back_populates="workflow",
         sa_relationship_kwargs={
             "primaryjoin": "Command.workflow_id==Workflow.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     created_by: "User" = Relationship(
         back_populates="workflows_created",
         sa_relationship_kwargs={
             "primaryjoin": "Workflow.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     updated_by: "User" = Relationship(
         back_populates="workflows_updated",
         sa_relationship_kwargs={
             "primaryjoin": "Workflow.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
 
@@ -99,6 +160,7 @@ class CommandStatus(Enum):
     COMPLETED = "completed"
     STARTED = "started"
     STOPPED = "stopped"
+    FAILED = "failed"
     NOT_EXECUTED = "not-executed"
 
 
@@ -124,6 +186,57 @@ class CommandPublic(CommandCreate, BasePublic):
     stopped_at: Optional[datetime] = Field(default=None)
     stopped_by_id: Optional[str] = Field(foreign_key="user.id")
     status: CommandStatus = Field(default=CommandStatus.NOT_EXECUTED)
+    exit_code: Optional[int] = Field(default=None)
+    duration: Optional[float] = Field(default=None)
+    peak_rss: Optional[int] = Field(default=None)
+
+
+class TagMatch(str, Enum):
+    ALL = "all"
+    ANY = "any"
+
+
+class CommandQuery(Filter):
+    status: Optional[CommandStatus] = None
+    workflow_id: Optional[int] = None
+    category_id: Optional[int] = None
+    tag_id: Optional[int] = None
+    tag_match: TagMatch = TagMatch.ALL
+
+
+class CommandFilter(CommandQuery):
+    """Commands with all (or any, see tag_match) of the tags."""
+
+    tag: List[int] = []
+
+    def where(self: Self, model_type: type[SQLModel]) -> list:
+        conditions = super().where(model_type)
+        for column in ["status", "workflow_id", "category_id"]:
+            if getattr(self, column) is not None:
+                conditions.append(
+                    getattr(model_type, column) == getattr(self, column)
+                )
+        tags = set(self.tag) | ({self.tag_id} - {None})
+        if len(tags) > 0:
+            # Served by ix_commandtag_tag_id_command_id: with the unique
+            # links a command has all the tags if it has len(tags) of them.
+            commands = select(CommandTag.command_id).where(
+                CommandTag.tag_id.in_(tags)
+            )
+            if self.tag_match == TagMatch.ALL and len(tags) > 1:
+                commands = commands.group_by(CommandTag.command_id).having(
+                    func.count() == len(tags)
+                )
+            conditions.append(model_type.id.in_(commands))
+        return conditions
+
+
+def command_filter(
+    query: Annotated[CommandQuery, Depends()],
+    tag: Annotated[List[int], Query(max_length=bulk_limit_max)] = [],
+) -> CommandFilter:
+    """CommandFilter of the query parameters, tag can be repeated."""
+    return CommandFilter(**query.model_dump(), tag=tag)
 
 
 class Command(CommandPublic, table=True):
@@ -134,40 +247,66 @@ class Command(CommandPublic, table=True):
         back_populates="commands",
         sa_relationship_kwargs={
             "primaryjoin": "Command.category_id==Category.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     workflow: "Workflow" = Relationship(
         back_populates="commands",
         sa_relationship_kwargs={
             "primaryjoin": "Command.workflow_id==Workflow.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     created_by: "User" = Relationship(
         back_populates="commands_created",
         sa_relationship_kwargs={
             "primaryjoin": "Command.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     updated_by: "User" = Relationship(
         back_populates="commands_updated",
         sa_relationship_kwargs={
             "primaryjoin": "Command.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
 
-    def start(self: Self) -> None:
+    def start(self: Self) -> Self:
         if self.status == CommandStatus.STARTED:
             raise ConflictException(target="Command", id=self.id)
         self.started_at = datetime.now()
         self.completed_at = None
         self.stopped_at = None
+        self.exit_code = None
+        self.duration = None
+        self.peak_rss = None
         self.status = CommandStatus.STARTED
         logger.info(f"Command {self.path} started")
-        return self._execute()
+        self.publish()
+        return self
+
+    def publish(self: Self) -> None:
+        """Status of the command to the subscribers of its workflow."""
+        hub.publish(
+            self.workflow_id,
+            Event(
+                type=EventType.STATUS,
+                command_id=self.id,
+                status=self.status.value,
+                timestamp=datetime.now(),
+            ),
+        )
+
+    def submit(
+        self: Self, priority: int = 0, done: Optional[callable] = None
+    ) -> Job:
+        return scheduler.submit(
+            self._execute,
+            name=f"Command {self.id}",
+            priority=priority,
+            done=done,
+        )
 
     def stop(self: Self) -> None:
         self.completed_at = datetime.now()
@@ -175,18 +314,34 @@ class Command(CommandPublic, table=True):
             raise ConflictException(target="Command", id=self.id)
         self.stopped_at = datetime.now()
         self.status = CommandStatus.STOPPED
+        tokens.cancel(self.id)
         logger.info(f"Command {self.path} stopped")
-
-    @threaded
-    def _execute(self: Self) -> None:
-        _t = randrange(10) * 1000
-        for i in range(_t, 0, -1):
-            if self.stopped_at is not None:
-                return None
-            logger.info(f"Command {self.path} in execution... (-{i}) seconds")
-            sleep(i * 1000)
+        self.publish()
+
+    async def _execute(self: Self) -> None:
+        token = tokens.get(self.id)
+        execution = await run(self.id, self.path, token, self.workflow_id)
+        self.exit_code = execution.exit_code
+        self.duration = execution.duration
+        self.peak_rss = execution.peak_rss
+        if token.cancelled():
+            self.completed_at = datetime.now()
+            self.stopped_at = datetime.now()
+            self.status = CommandStatus.STOPPED
+            logger.info(f"Command {self.path} stopped")
+            self.publish()
+            return None
         self.completed_at = datetime.now()
-        self.status = CommandStatus.COMPLETED
+        if execution.exit_code == 0:
+            self.status = CommandStatus.COMPLETED
+        else:
+            self.status = CommandStatus.FAILED
+        logger.info(f"Command {self.path} {self.status.value}")
+        self.publish()
+
+
+command_search = SearchIndex(Command, "Command", ["path"])
+
 
 # Role
 
@@ -238,68 +393,76 @@ class UserPublic(BasePublic):
     age: int | None = None
 
 
+class Principal(BaseModel):
+    """Authenticated user: the columns needed by the authorization only."""
+
+    id: str
+    role_id: str
+    disabled: bool
+
+
 class User(UserCreate, BasePublic, table=True):
     tags_created: list["Tag"] = Relationship(
         back_populates="created_by",
         sa_relationship_kwargs={
             "primaryjoin": "Tag.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     tags_updated: list["Tag"] = Relationship(
         back_populates="updated_by",
         sa_relationship_kwargs={
             "primaryjoin": "Tag.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     command_tags_created: list["CommandTag"] = Relationship(
         back_populates="created_by",
         sa_relationship_kwargs={
             "primaryjoin": "CommandTag.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     categories_created: list["Category"] = Relationship(
         back_populates="created_by",
         sa_relationship_kwargs={
             "primaryjoin": "Category.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     categories_updated: list["Category"] = Relationship(
         back_populates="updated_by",
         sa_relationship_kwargs={
             "primaryjoin": "Category.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     workflows_created: list["Workflow"] = Relationship(
         back_populates="created_by",
         sa_relationship_kwargs={
             "primaryjoin": "Workflow.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     workflows_updated: list["Workflow"] = Relationship(
         back_populates="updated_by",
         sa_relationship_kwargs={
             "primaryjoin": "Workflow.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     commands_created: list["Command"] = Relationship(
         back_populates="created_by",
         sa_relationship_kwargs={
             "primaryjoin": "Command.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     commands_updated: list["Command"] = Relationship(
         back_populates="updated_by",
         sa_relationship_kwargs={
             "primaryjoin": "Command.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
 
@@ -326,21 +489,21 @@ class Category(CategoryPublic, table=True):
         back_populates="category",
         sa_relationship_kwargs={
             "primaryjoin": "Command.category_id==Category.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     created_by: User = Relationship(
         back_populates="categories_created",
         sa_relationship_kwargs={
             "primaryjoin": "Category.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     updated_by: User = Relationship(
         back_populates="categories_updated",
         sa_relationship_kwargs={
             "primaryjoin": "Category.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
 
@@ -370,14 +533,14 @@ class Tag(TagPublic, table=True):
         back_populates="tags_created",
         sa_relationship_kwargs={
             "primaryjoin": "Tag.created_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
     updated_by: User = Relationship(
         back_populates="tags_updated",
         sa_relationship_kwargs={
             "primaryjoin": "Tag.updated_by_id==User.id",
-            "lazy": "joined",
+            "lazy": "raise",
         },
     )
 
@@ -410,6 +573,45 @@ class Result(BaseModel):
         )
 
 
+# CriticalPath
+
+
+class CriticalPath(BaseModel):
+    workflow_id: int
+    command_ids: List[int]
+    duration: float
+
+
+# Job
+
+
+class JobStatus(Enum):
+    WAITING = "waiting"
+    QUEUED = "queued"
+    RUNNING = "running"
+
+
+class CommandJob(SQLModel, table=True):
+    """Execution of a started command, until it is completed.
+
+    A waiting job has dependencies not completed yet, a queued one can be
+    claimed by a worker, a running one is leased to a worker until
+    lease_expires_at.
+    """
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    command_id: int = Field(foreign_key="command.id", unique=True)
+    workflow_id: int = Field(index=True)
+    user_id: str
+    priority: int = 0
+    waiting: int = 0
+    status: JobStatus = Field(default=JobStatus.QUEUED, index=True)
+    worker: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
 # Token
 
 
@@ -418,5 +620,44 @@ class Token[Type: SQLModel](BaseModel):
     refresh_token: str | None = None
 
 
-engine = create_engine(f"sqlite:///{db_path}", echo=echo_engine)
+class RefreshToken(SQLModel, table=True):
+    """Refresh token issued and not expired yet, by SHA-256 hash."""
+
+    hash: str = Field(primary_key=True)
+    family: str = Field(index=True)
+    user_id: str = Field(index=True)
+    expires_at: datetime = Field(index=True)
+    used: bool = False
+
+
+_pool = dict(
+    pragmas=db_pragmas,
+    prepare_threshold=db_prepare_threshold,
+    echo=echo_engine,
+    pool_size=db_pool_size,
+    max_overflow=db_max_overflow,
+    pool_timeout=db_pool_timeout,
+    pool_recycle=db_pool_recycle,
+    query_cache_size=db_statement_cache_size,
+)
+_read_pool = dict(_pool, read_only=True, pool_size=db_read_pool_size)
+
+engine = create_db_engine(db_url, **_pool)
+
+# Used by the endpoints when db_async is set, see db.get_session.
+async_engine = create_db_async_engine(db_url, **_pool) if db_async else None
+
+# Read replica: read-only connections of their own, see
+# db.read_unit_of_work. Without it the reads use the engines above.
+read_engine = (
+    create_db_engine(db_read_url, **_read_pool)
+    if db_read_pool_size > 0
+    else engine
+)
+async_read_engine = (
+    create_db_async_engine(db_read_url, **_read_pool)
+    if db_async and db_read_pool_size > 0
+    else async_engine
+)
 SQLModel.metadata.create_all(engine)
+command_search.create(engine)
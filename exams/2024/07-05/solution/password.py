@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from time import monotonic
+from typing import List, Optional, Self
+
+from config import (password_history, password_queue_size, password_rounds,
+                    password_workers)
+from error import TooManyRequestsException
+from metrics import observe_password
+from passlib.context import CryptContext
+from pydantic import BaseModel
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], bcrypt__rounds=password_rounds, deprecated="auto"
+)
+
+
+class PasswordStats(BaseModel):
+    workers: int
+    queue_size: int
+    pending: int
+    verified: int
+    hashed: int
+    rejected: int
+    latency_avg: Optional[float] = None
+    latency_max: Optional[float] = None
+
+
+def _verify(password: str, hash: str) -> bool:
+    return pwd_context.verify(password, hash)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+class PasswordPool:
+    """Verify and hash the passwords in a pool of processes.
+
+    bcrypt is CPU bound: in the pool it neither blocks the event loop nor
+    holds the GIL of the API. At most queue_size verifications wait for a
+    worker, the other ones are rejected.
+    """
+
+    def __init__(self: Self, workers: int, queue_size: int,
+                 history: int) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._lock = Lock()
+        self._pending = 0
+        self._verified = 0
+        self._hashed = 0
+        self._rejected = 0
+        self._latencies = deque(maxlen=history)
+
+    def _start(self: Self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # The API runs threads (scheduler, thread pool): no fork.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def verify(self: Self, password: str, hash: str) -> bool:
+        executor = self._start()
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._rejected += 1
+                raise TooManyRequestsException(target="Password", id="verify")
+            self._pending += 1
+        start = monotonic()
+        try:
+            return await asyncio.wrap_future(
+                executor.submit(_verify, password, hash)
+            )
+        finally:
+            latency = monotonic() - start
+            observe_password(latency)
+            with self._lock:
+                self._pending -= 1
+                self._verified += 1
+                self._latencies.append(latency)
+
+    def hash_all(self: Self, passwords: List[str]) -> List[str]:
+        """Hashes of the passwords, in their order, e.g. of the users of a
+        script: it waits for all of them."""
+        hashes = list(self._start().map(_hash, passwords))
+        with self._lock:
+            self._hashed += len(hashes)
+        return hashes
+
+    def shutdown(self: Self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def stats(self: Self) -> PasswordStats:
+        with self._lock:
+            latencies = list(self._latencies)
+            return PasswordStats(
+                workers=self.workers,
+                queue_size=self.queue_size,
+                pending=self._pending,
+                verified=self._verified,
+                hashed=self._hashed,
+                rejected=self._rejected,
+                latency_avg=(
+                    sum(latencies) / len(latencies)
+                    if len(latencies) > 0
+                    else None
+                ),
+                latency_max=max(latencies, default=None),
+            )
+
+
+passwords = PasswordPool(
+    workers=password_workers,
+    queue_size=password_queue_size,
+    history=password_history,
+)
@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from hashlib import sha256
+from threading import Lock
+from typing import Dict, Optional, Self, Set
+
+from config import refresh_token_store
+from db import unit_of_work
+from model import RefreshToken
+from sqlmodel import delete, select, update
+
+
+def token_hash(token: str) -> str:
+    return sha256(token.encode()).hexdigest()
+
+
+class RefreshTokenStore(ABC):
+    """Refresh tokens issued and not expired yet, by hash.
+
+    A refresh token is used once: the refresh rotates it with a new token of
+    the same family. Using a token again (e.g. a stolen copy) revokes all
+    its family.
+    """
+
+    @abstractmethod
+    def add(
+        self: Self,
+        token: str,
+        user_id: str,
+        family: str,
+        expires_at: datetime,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def use(self: Self, token: str) -> Optional[RefreshToken]:
+        """The token, marked as used, or None if not valid."""
+
+    @abstractmethod
+    def revoke_user(self: Self, user_id: str) -> None:
+        pass
+
+
+class MemoryRefreshTokenStore(RefreshTokenStore):
+    """Store of a single process."""
+
+    def __init__(self: Self) -> None:
+        self._lock = Lock()
+        self._tokens: Dict[str, RefreshToken] = {}
+        self._families: Dict[str, Set[str]] = {}
+
+    def _evict(self: Self, now: datetime) -> None:
+        for hash in [
+            hash
+            for hash, token in self._tokens.items()
+            if token.expires_at <= now
+        ]:
+            self._remove(hash)
+
+    def _remove(self: Self, hash: str) -> None:
+        token = self._tokens.pop(hash)
+        family = self._families[token.family]
+        family.discard(hash)
+        if len(family) == 0:
+            del self._families[token.family]
+
+    def _revoke(self: Self, family: str) -> None:
+        for hash in list(self._families.get(family, [])):
+            self._remove(hash)
+
+    def add(
+        self: Self,
+        token: str,
+        user_id: str,
+        family: str,
+        expires_at: datetime,
+    ) -> None:
+        hash = token_hash(token)
+        with self._lock:
+            self._evict(datetime.now())
+            self._tokens[hash] = RefreshToken(
+                hash=hash,
+                family=family,
+                user_id=user_id,
+                expires_at=expires_at,
+            )
+            self._families.setdefault(family, set()).add(hash)
+
+    def use(self: Self, token: str) -> Optional[RefreshToken]:
+        with self._lock:
+            found = self._tokens.get(token_hash(token))
+            if found is None or found.expires_at <= datetime.now():
+                return None
+            if found.used:
+                self._revoke(found.family)
+                return None
+            found.used = True
+            return found
+
+    def revoke_user(self: Self, user_id: str) -> None:
+        with self._lock:
+            for family in {
+                token.family
+                for token in self._tokens.values()
+                if token.user_id == user_id
+            }:
+                self._revoke(family)
+
+
+class DBRefreshTokenStore(RefreshTokenStore):
+    """Store in the refreshtoken table, shared by the worker processes.
+
+    Each operation commits in a unit of work of its own: a revocation is not
+    rolled back by the failure of the request.
+    """
+
+    def add(
+        self: Self,
+        token: str,
+        user_id: str,
+        family: str,
+        expires_at: datetime,
+    ) -> None:
+        with unit_of_work() as session:
+            session.exec(
+                delete(RefreshToken).where(
+                    RefreshToken.expires_at <= datetime.now()
+                )
+            )
+            session.add(
+                RefreshToken(
+                    hash=token_hash(token),
+                    family=family,
+                    user_id=user_id,
+                    expires_at=expires_at,
+                )
+            )
+
+    def use(self: Self, token: str) -> Optional[RefreshToken]:
+        hash = token_hash(token)
+        with unit_of_work() as session:
+            # Atomic test-and-set: of concurrent uses only one succeeds.
+            if session.exec(
+                update(RefreshToken)
+                .where(
+                    RefreshToken.hash == hash,
+                    RefreshToken.used == False,  # noqa: E712
+                    RefreshToken.expires_at > datetime.now(),
+                )
+                .values(used=True)
+            ).rowcount == 1:
+                return session.get(RefreshToken, hash)
+            found = session.get(RefreshToken, hash)
+            if found is not None and found.used:
+                session.exec(
+                    delete(RefreshToken).where(
+                        RefreshToken.family == found.family
+                    )
+                )
+            return None
+
+    def revoke_user(self: Self, user_id: str) -> None:
+        with unit_of_work() as session:
+            session.exec(
+                delete(RefreshToken).where(
+                    RefreshToken.family.in_(
+                        select(RefreshToken.family).where(
+                            RefreshToken.user_id == user_id
+                        )
+                    )
+                )
+            )
+
+
+refresh_tokens = (
+    DBRefreshTokenStore()
+    if refresh_token_store == "db"
+    else MemoryRefreshTokenStore()
+)
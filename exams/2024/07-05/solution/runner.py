@@ -0,0 +1,265 @@
+import asyncio
+import os
+import shlex
+import signal
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from threading import Lock
+from time import monotonic
+from typing import Deque, Dict, List, Optional, Self
+
+from config import (logger, runner_line_max, runner_output_lines,
+                    runner_rss_interval, runner_stop_grace)
+from events import Event, EventType, hub
+from logstore import LogWriter, logs
+from pydantic import BaseModel
+
+
+class Stream(str, Enum):
+    STDOUT = "stdout"
+    STDERR = "stderr"
+
+
+class OutputLine(BaseModel):
+    stream: Stream
+    line: str
+    timestamp: datetime
+
+
+class Execution(BaseModel):
+    exit_code: Optional[int] = None
+    duration: float
+    peak_rss: Optional[int] = None
+    error: Optional[str] = None
+
+
+class Output:
+    """Last lines printed by each command, bounded in memory."""
+
+    def __init__(self: Self, size: int) -> None:
+        self.size = size
+        self._lock = Lock()
+        self._buffers: Dict[int, Deque[OutputLine]] = {}
+
+    def reset(self: Self, id: int) -> None:
+        with self._lock:
+            self._buffers[id] = deque(maxlen=self.size)
+
+    def append(self: Self, id: int, stream: Stream, line: str) -> None:
+        with self._lock:
+            self._buffers.setdefault(id, deque(maxlen=self.size)).append(
+                OutputLine(stream=stream, line=line, timestamp=datetime.now())
+            )
+
+    def read(self: Self, id: int) -> List[OutputLine]:
+        with self._lock:
+            return list(self._buffers.get(id, []))
+
+
+output = Output(size=runner_output_lines)
+
+
+class CancelToken:
+    """Stop request shared between the API handlers and the executor."""
+
+    def __init__(self: Self) -> None:
+        self._lock = Lock()
+        self._cancelled = False
+        self._callbacks = []
+
+    def cancel(self: Self) -> None:
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def cancelled(self: Self) -> bool:
+        return self._cancelled
+
+    def on_cancel(self: Self, callback: callable) -> None:
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class CancelTokens:
+    """Cancel token of each started command."""
+
+    def __init__(self: Self) -> None:
+        self._lock = Lock()
+        self._tokens: Dict[int, CancelToken] = {}
+
+    def create(self: Self, id: int) -> CancelToken:
+        with self._lock:
+            self._tokens[id] = CancelToken()
+            return self._tokens[id]
+
+    def get(self: Self, id: int) -> CancelToken:
+        with self._lock:
+            return self._tokens.setdefault(id, CancelToken())
+
+    def cancel(self: Self, id: int) -> None:
+        with self._lock:
+            token = self._tokens.get(id)
+        if token is not None:
+            token.cancel()
+
+    def remove(self: Self, id: int, token: CancelToken) -> None:
+        with self._lock:
+            if self._tokens.get(id) is token:
+                del self._tokens[id]
+
+
+tokens = CancelTokens()
+
+
+def _peak_rss(pid: int) -> Optional[int]:
+    """Peak resident set size (kB) of a running process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _append(id: int, topic: Optional[int], log: LogWriter, stream: Stream,
+            line: str) -> None:
+    output.append(id, stream, line)
+    log.write(line)
+    if hub.active(topic):
+        hub.publish(
+            topic,
+            Event(
+                type=EventType.OUTPUT,
+                command_id=id,
+                stream=stream.value,
+                line=line,
+                timestamp=datetime.now(),
+            ),
+        )
+
+
+async def _read(
+    id: int,
+    topic: Optional[int],
+    log: LogWriter,
+    stream: Stream,
+    reader: asyncio.StreamReader,
+) -> None:
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            # Line longer than the reader limit: already discarded.
+            _append(id, topic, log, stream, "[line too long]")
+            continue
+        if not line:
+            return
+        _append(
+            id,
+            topic,
+            log,
+            stream,
+            line[:runner_line_max].decode(errors="replace").rstrip("\r\n"),
+        )
+
+
+async def _sample_rss(process: asyncio.subprocess.Process,
+                      execution: Execution) -> None:
+    while process.returncode is None:
+        rss = _peak_rss(process.pid)
+        if rss is not None:
+            execution.peak_rss = max(rss, execution.peak_rss or 0)
+        await asyncio.sleep(runner_rss_interval)
+
+
+def _signal(process: asyncio.subprocess.Process, sig: int) -> None:
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def _terminate(process: asyncio.subprocess.Process,
+                     cancelled: asyncio.Event) -> None:
+    await cancelled.wait()
+    _signal(process, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), runner_stop_grace)
+    except asyncio.TimeoutError:
+        _signal(process, signal.SIGKILL)
+
+
+async def run(
+    id: int, path: str, token: CancelToken, topic: Optional[int] = None
+) -> Execution:
+    """Run the command path streaming its output in the ring buffer.
+
+    The output is also appended to the log of the command (see logstore).
+
+    When the token is cancelled the process group of the command receives
+    SIGTERM and, after runner_stop_grace seconds, SIGKILL.
+
+    Parameters:
+    id (int) -- identifier of the command owning the output
+    path (str) -- program and arguments to execute (no shell)
+    token (CancelToken) -- to stop the execution
+    topic (int) -- hub topic receiving the output lines (e.g. the workflow)
+
+    Returns:
+    Execution:Exit code, duration (seconds) and peak RSS (kB)
+    """
+    output.reset(id)
+    if token.cancelled():
+        return Execution(duration=0)
+    log = logs.open(id)
+    try:
+        return await _execute(id, path, token, topic, log)
+    finally:
+        log.close()
+
+
+async def _execute(
+    id: int,
+    path: str,
+    token: CancelToken,
+    topic: Optional[int],
+    log: LogWriter,
+) -> Execution:
+    start = monotonic()
+    execution = Execution(duration=0)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *shlex.split(path),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+    except (OSError, ValueError) as e:
+        execution.duration = monotonic() - start
+        execution.error = str(e)
+        _append(id, topic, log, Stream.STDERR, str(e))
+        logger.error(f"Command {id} not executed: {e}")
+        return execution
+    loop, cancelled = asyncio.get_running_loop(), asyncio.Event()
+    token.on_cancel(lambda: loop.call_soon_threadsafe(cancelled.set))
+    terminator = asyncio.create_task(_terminate(process, cancelled))
+    sampler = asyncio.create_task(_sample_rss(process, execution))
+    await asyncio.gather(
+        _read(id, topic, log, Stream.STDOUT, process.stdout),
+        _read(id, topic, log, Stream.STDERR, process.stderr),
+    )
+    execution.exit_code = await process.wait()
+    execution.duration = monotonic() - start
+    sampler.cancel()
+    terminator.cancel()
+    return execution
@@ -0,0 +1,210 @@
+import asyncio
+import inspect
+from collections import deque
+from datetime import datetime
+from itertools import count
+from threading import Lock, Thread
+from typing import List, Optional, Self
+
+from config import (logger, scheduler_history, scheduler_queue_size,
+                    scheduler_workers)
+from error import TooManyRequestsException
+from pydantic import BaseModel
+
+
+class JobPublic(BaseModel):
+    name: str
+    priority: int
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    wait_time: Optional[float] = None
+    run_time: Optional[float] = None
+    error: Optional[str] = None
+
+
+class SchedulerStats(BaseModel):
+    workers: int
+    queue_size: int
+    queue_depth: int
+    running: int
+    submitted: int
+    completed: int
+    rejected: int
+    wait_time_avg: Optional[float] = None
+    wait_time_max: Optional[float] = None
+    run_time_avg: Optional[float] = None
+    run_time_max: Optional[float] = None
+    jobs: List[JobPublic]
+
+
+class Job:
+    """Unit of work queued in the scheduler."""
+
+    def __init__(
+        self: Self,
+        target: callable,
+        name: str,
+        priority: int = 0,
+        done: Optional[callable] = None,
+    ) -> None:
+        self.target = target
+        self.name = name
+        self.priority = priority
+        self.done = done
+        self.submitted_at = datetime.now()
+        self.started_at = None
+        self.completed_at = None
+        self.error = None
+
+    def wait_time(self: Self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.submitted_at).total_seconds()
+
+    def run_time(self: Self) -> Optional[float]:
+        if self.started_at is None or self.completed_at is None:
+            return None
+        return (self.completed_at - self.started_at).total_seconds()
+
+    def public(self: Self) -> JobPublic:
+        return JobPublic(
+            name=self.name,
+            priority=self.priority,
+            submitted_at=self.submitted_at,
+            started_at=self.started_at,
+            completed_at=self.completed_at,
+            wait_time=self.wait_time(),
+            run_time=self.run_time(),
+            error=self.error,
+        )
+
+
+class Scheduler:
+    """Run jobs with a bounded pool of workers.
+
+    The workers are coroutines of an event loop running in a dedicated
+    thread: coroutine jobs (e.g. subprocesses) share this single thread, the
+    blocking ones are moved to the default executor of the loop.
+    Pending jobs wait in a bounded priority queue (lower value first, FIFO
+    for the same priority): when the queue is full new jobs are rejected.
+    """
+
+    def __init__(self: Self, workers: int, queue_size: int,
+                 history: int) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self._loop = None
+        self._queue = None
+        self._seq = count()
+        self._lock = Lock()
+        self._pending = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._history = deque(maxlen=history)
+
+    def _start(self: Self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._queue = asyncio.PriorityQueue()
+            for i in range(self.workers):
+                self._loop.create_task(self._work(), name=f"scheduler-{i}")
+            Thread(
+                target=self._loop.run_forever, name="scheduler", daemon=True
+            ).start()
+
+    async def _work(self: Self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            job.started_at = datetime.now()
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+            try:
+                if inspect.iscoroutinefunction(job.target):
+                    await job.target()
+                else:
+                    await self._loop.run_in_executor(None, job.target)
+            except Exception as e:
+                job.error = str(e)
+                logger.error(f"{job.name} failed: {e}")
+            job.completed_at = datetime.now()
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._history.append(job)
+            if job.done is not None:
+                try:
+                    await self._loop.run_in_executor(None, job.done)
+                except Exception as e:
+                    logger.error(f"{job.name} completion failed: {e}")
+            self._queue.task_done()
+
+    def free_slots(self: Self) -> int:
+        return self.queue_size - self._pending
+
+    def submit(
+        self: Self,
+        target: callable,
+        name: str,
+        priority: int = 0,
+        done: Optional[callable] = None,
+    ) -> Job:
+        self._start()
+        job = Job(target=target, name=name, priority=priority, done=done)
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self._rejected += 1
+                raise TooManyRequestsException(target="Scheduler", id=name)
+            self._pending += 1
+            self._submitted += 1
+        self._loop.call_soon_threadsafe(
+            self._queue.put_nowait, (priority, next(self._seq), job)
+        )
+        return job
+
+    def join(self: Self, timeout: Optional[float] = None) -> None:
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(
+                self._queue.join(), self._loop
+            ).result(timeout)
+
+    def stats(self: Self) -> SchedulerStats:
+        with self._lock:
+            jobs = list(self._history)
+            pending = self._pending
+            running = self._running
+            submitted = self._submitted
+            completed = self._completed
+            rejected = self._rejected
+        wait_times = [job.wait_time() for job in jobs]
+        run_times = [job.run_time() for job in jobs]
+        return SchedulerStats(
+            workers=self.workers,
+            queue_size=self.queue_size,
+            queue_depth=pending,
+            running=running,
+            submitted=submitted,
+            completed=completed,
+            rejected=rejected,
+            wait_time_avg=_avg(wait_times),
+            wait_time_max=max(wait_times, default=None),
+            run_time_avg=_avg(run_times),
+            run_time_max=max(run_times, default=None),
+            jobs=[job.public() for job in jobs],
+        )
+
+
+def _avg(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if len(values) > 0 else None
+
+
+scheduler = Scheduler(
+    workers=scheduler_workers,
+    queue_size=scheduler_queue_size,
+    history=scheduler_history,
+)
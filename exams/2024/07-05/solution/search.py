@@ -0,0 +1,169 @@
+import re
+from typing import List, Self, Sequence, Type
+
+from pydantic import BaseModel
+from sqlalchemy import (Engine, column, desc, func, inspect, literal_column,
+                        table)
+from sqlmodel import Session, SQLModel, select
+
+# Tokens around the matches in a snippet.
+SNIPPET_TOKENS = 16
+
+
+class SearchHit(BaseModel):
+    target: str
+    id: int
+    snippet: str
+    rank: float
+
+
+def _terms(q: str) -> List[str]:
+    """Words (letters and digits) of the query: punctuation is not query
+    syntax."""
+    return re.findall(r"[^\W_]+", q)
+
+
+class SearchIndex:
+    """Full-text index of the text columns of a table.
+
+    On SQLite it is an FTS5 table with external content: the text is read
+    from the table, the index is kept in sync by triggers. On PostgreSQL it
+    is a GIN index of the tsvector of the columns. The rows stored before
+    the index are indexed when it is created.
+
+    A query matches the records with all its words, as prefixes, ranked by
+    bm25 (ts_rank on PostgreSQL): the matches are in [] in the snippets,
+    without punctuation on PostgreSQL.
+    """
+
+    def __init__(
+        self: Self,
+        model_type: Type[SQLModel],
+        model_text: str,
+        columns: Sequence[str],
+    ) -> None:
+        self.model_type = model_type
+        self.model_text = model_text
+        self.columns = list(columns)
+        self.table = model_type.__tablename__
+        self.name = f"{self.table}_fts"
+        self.fts = table(
+            self.name, column("rowid"), *(column(c) for c in self.columns)
+        )
+
+    def _sqlite_ddl(self: Self) -> List[str]:
+        columns = ", ".join(self.columns)
+        new = ", ".join(f"new.{c}" for c in self.columns)
+        old = ", ".join(f"old.{c}" for c in self.columns)
+        insert = (
+            f"INSERT INTO {self.name}(rowid, {columns}) "
+            f"VALUES (new.id, {new});"
+        )
+        delete = (
+            f"INSERT INTO {self.name}({self.name}, rowid, {columns}) "
+            f"VALUES ('delete', old.id, {old});"
+        )
+        return [
+            f"CREATE VIRTUAL TABLE {self.name} USING fts5({columns}, "
+            f"content='{self.table}', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            f"CREATE TRIGGER {self.name}_insert AFTER INSERT ON {self.table} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER {self.name}_delete AFTER DELETE ON {self.table} "
+            f"BEGIN {delete} END",
+            f"CREATE TRIGGER {self.name}_update AFTER UPDATE OF {columns} "
+            f"ON {self.table} BEGIN {delete} {insert} END",
+            f"INSERT INTO {self.name}({self.name}) VALUES ('rebuild')",
+        ]
+
+    def _text(self: Self) -> str:
+        # Words as the tokenizer of FTS5: e.g. a path is not a single one.
+        text = " || ' ' || ".join(f"coalesce({c}, '')" for c in self.columns)
+        return f"regexp_replace({text}, '[^[:alnum:]]+', ' ', 'g')"
+
+    def _document(self: Self) -> str:
+        # The same expression in the index and in the queries.
+        return f"to_tsvector('simple', {self._text()})"
+
+    def create(self: Self, engine: Engine) -> None:
+        """Create the index, if missing."""
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                if not inspect(conn).has_table(self.name):
+                    for statement in self._sqlite_ddl():
+                        conn.exec_driver_sql(statement)
+            elif engine.dialect.name == "postgresql":
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS ix_{self.name} "
+                    f"ON {self.table} USING GIN ({self._document()})"
+                )
+
+    def search(
+        self: Self,
+        q: str,
+        session: Session,
+        limit: int,
+        where: Sequence = (),
+    ) -> List[SearchHit]:
+        """Best limit records matching q and the conditions."""
+        terms = _terms(q)
+        if len(terms) == 0:
+            return []
+        if session.get_bind().dialect.name == "sqlite":
+            query = self._sqlite_query(terms)
+        else:
+            query = self._postgresql_query(terms)
+        return [
+            SearchHit(
+                target=self.model_text, id=id, snippet=snippet, rank=rank
+            )
+            for id, snippet, rank in session.exec(
+                query.where(*where).limit(limit)
+            )
+        ]
+
+    def _sqlite_query(self: Self, terms: List[str]):
+        fts = literal_column(self.name)
+        # bm25 is lower for the better matches.
+        rank = (-func.bm25(fts)).label("rank")
+        return (
+            select(
+                self.model_type.id,
+                func.snippet(
+                    fts, -1, "[", "]", "…", SNIPPET_TOKENS
+                ).label("snippet"),
+                rank,
+            )
+            .select_from(
+                self.fts.join(
+                    self.model_type, self.model_type.id == self.fts.c.rowid
+                )
+            )
+            .where(
+                fts.op("MATCH")(" ".join(f'"{term}"*' for term in terms))
+            )
+            .order_by(desc(rank), self.model_type.id)
+        )
+
+    def _postgresql_query(self: Self, terms: List[str]):
+        config = literal_column("'simple'")
+        document = literal_column(self._document())
+        query = func.to_tsquery(
+            config, " & ".join(f"{term}:*" for term in terms)
+        )
+        rank = func.ts_rank(document, query).label("rank")
+        return (
+            select(
+                self.model_type.id,
+                func.ts_headline(
+                    config,
+                    literal_column(self._text()),
+                    query,
+                    "StartSel=[, StopSel=], "
+                    f"MaxWords={SNIPPET_TOKENS}, MinWords=1",
+                ).label("snippet"),
+                rank,
+            )
+            .where(document.op("@@")(query))
+            .order_by(desc(rank), self.model_type.id)
+        )
@@ -0,0 +1,17 @@
+from yawms_bench import compare, summary
+
+
+def test_summary() -> None:
+    _summary = summary([i / 1000 for i in range(1, 101)], 0, 2.0)
+    assert _summary["rps"] == 50
+    assert round(_summary["p50"]) == 50
+    assert round(_summary["p99"]) == 99
+
+
+def test_compare() -> None:
+    _base = dict(p95=10.0, rps=100.0, errors=0)
+    _baseline = dict(results=dict(inprocess=dict(login=_base)))
+    _results = dict(results=dict(inprocess=dict(login=dict(_base, p95=11.0))))
+    assert compare(_results, _baseline, tolerance=0.2) == []
+    _results["results"]["inprocess"]["login"].update(rps=70.0, errors=1)
+    assert len(compare(_results, _baseline, tolerance=0.2)) == 2
@@ -0,0 +1,93 @@
+import pytest
+from conftest import client
+from test_statements import statements
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_admin_bulk(auth_header: dict) -> None:
+    with statements() as _statements:
+        response = client.post(
+            "/admin/tag/bulk",
+            json=[dict(name=f"bulk {i}") for i in range(50)],
+            headers=auth_header,
+        )
+    assert response.status_code == 200, response.text
+    _ids = [result["id"] for result in response.json()]
+    assert len(set(_ids)) == 50
+    # Authentication, one INSERT for the whole batch.
+    assert len(_statements) <= 3, _statements
+    response = client.put(
+        "/admin/tag/bulk",
+        json={id: dict(name=f"bulk {id}") for id in _ids[:10]},
+        headers=auth_header,
+    )
+    assert response.status_code == 200, response.text
+    assert [result["id"] for result in response.json()] == _ids[:10]
+    response = client.get(f"/admin/tag/{_ids[0]}", headers=auth_header)
+    assert response.json()["name"] == f"bulk {_ids[0]}"
+    response = client.request(
+        "DELETE", "/admin/tag/bulk", json=_ids, headers=auth_header
+    )
+    assert response.status_code == 200, response.text
+    assert [result["action"] for result in response.json()] == [
+        "Deleted"
+    ] * 50
+    response = client.request(
+        "DELETE", "/admin/tag/bulk", json=_ids[:1], headers=auth_header
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_me_bulk(auth_header: dict) -> None:
+    _ids = dict(
+        workflow=client.post(
+            "/me/workflow", json=dict(name="bulk"), headers=auth_header
+        ).json()["id"],
+        category=client.post(
+            "/me/category", json=dict(name="bulk"), headers=auth_header
+        ).json()["id"],
+    )
+    _commands = [
+        dict(
+            path=f"echo {i}",
+            workflow_id=_ids["workflow"],
+            category_id=_ids["category"],
+        )
+        for i in range(5)
+    ]
+    response = client.post(
+        "/me/command/bulk",
+        json=_commands + [_commands[0] | dict(workflow_id=-1)],
+        headers=auth_header,
+    )
+    assert response.status_code == 404
+    assert response.json()["id"] == -1
+    response = client.post(
+        "/me/command/bulk", json=_commands, headers=auth_header
+    )
+    assert response.status_code == 200, response.text
+    _command_ids = [result["id"] for result in response.json()]
+    response = client.get(
+        "/me/command/created",
+        params=dict(workflow_id=_ids["workflow"]),
+        headers=auth_header,
+    )
+    assert [command["id"] for command in response.json()] == _command_ids
+
+    other = client.post(
+        "/auth/token", data=dict(username="alexcarrega", password="test-me")
+    ).json()["access_token"]
+    response = client.put(
+        "/me/command/bulk",
+        json={_command_ids[0]: dict(path="true")},
+        headers={"Authorization": f"Bearer {other}"},
+    )
+    assert response.status_code == 404
+
+    response = client.request(
+        "DELETE", "/admin/command/bulk", json=_command_ids, headers=auth_header
+    )
+    assert response.status_code == 200, response.text
+    for target, id in _ids.items():
+        client.delete(f"/admin/{target}/{id}", headers=auth_header)
@@ -0,0 +1,32 @@
+import pytest
+from dag import Dag
+from error import ConflictException
+from utils import Struct
+
+
+def _dag(durations: dict, edges: list) -> Dag:
+    _commands = [Struct(id=id, duration=d) for id, d in durations.items()]
+    return Dag(
+        Struct(id=1, commands=_commands),
+        [Struct(command_id=c, depends_on_id=d) for c, d in edges],
+    )
+
+
+def test_order_and_critical_path() -> None:
+    # 1 -> 2 -> 4, 1 -> 3 -> 4 with the branch through 3 slower
+    _edges = [(2, 1), (3, 1), (4, 2), (4, 3)]
+    _d = _dag({1: 1.0, 2: 1.0, 3: 5.0, 4: 1.0}, _edges)
+    assert _d.roots() == [1]
+    _order = _d.order()
+    assert _order.index(1) < _order.index(2) < _order.index(4)
+    assert _order.index(3) < _order.index(4)
+    _path = _d.critical_path()
+    assert _path.command_ids == [1, 3, 4]
+    assert _path.duration == 7.0
+
+
+def test_cycle() -> None:
+    _d = _dag({1: None, 2: None}, [(1, 2), (2, 1)])
+    assert _d.reaches(1, 2)
+    with pytest.raises(ConflictException):
+        _d.order()
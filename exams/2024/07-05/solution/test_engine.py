@@ -0,0 +1,21 @@
+import pytest
+from engine import PRAGMAS, create_db_engine
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+def test_pragmas_and_read_only(tmp_path) -> None:
+    _url = f"sqlite:///{tmp_path / 'test.db'}"
+    _engine = create_db_engine(_url, PRAGMAS)
+    _read_engine = create_db_engine(_url, PRAGMAS, read_only=True)
+    with _engine.begin() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    with _read_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+    _read_engine.dispose()
+    _engine.dispose()
@@ -0,0 +1,72 @@
+import asyncio
+from threading import Thread
+
+import pytest
+from conftest import client
+from events import Event, EventType, Hub
+from fastapi import WebSocketDisconnect
+
+
+def test_hub() -> None:
+    _hub = Hub(queue_size=2)
+
+    async def _listen() -> list:
+        with _hub.subscribe(1) as _subscription:
+            assert _hub.active(1) and not _hub.active(2)
+            _thread = Thread(
+                target=lambda: [
+                    _hub.publish(
+                        1,
+                        Event(
+                            type=EventType.OUTPUT,
+                            command_id=1,
+                            line=str(i),
+                            timestamp="2024-07-05T00:00:00",
+                        ),
+                    )
+                    for i in range(3)
+                ]
+            )
+            _thread.start()
+            _thread.join()
+            await asyncio.sleep(0.1)
+            _events = [await _subscription.get(0.1) for _ in range(3)]
+            assert _subscription.dropped == 1
+        assert not _hub.active(1)
+        return _events
+
+    _events = asyncio.run(_listen())
+    # The oldest event is dropped.
+    assert [e.line for e in _events[:2]] == ["1", "2"]
+    assert _events[2] is None
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_websocket_events(auth_header: dict, commands) -> None:
+    _id = commands.ids["workflow"]
+    with client.websocket_connect(
+        f"/me/workflow/{_id}/events", headers=auth_header
+    ) as _websocket:
+        _statuses = {}
+        for _ in commands.commands:
+            _event = _websocket.receive_json()
+            assert _event["type"] == "status"
+            _statuses[_event["command_id"]] = _event["status"]
+        assert set(_statuses) == set(commands.commands)
+        assert client.put(
+            f"/me/workflow/{_id}/start", headers=auth_header
+        ).status_code == 200
+        _lines = {}
+        while any(s != "completed" for s in _statuses.values()):
+            _event = _websocket.receive_json()
+            if _event["type"] == "status":
+                _statuses[_event["command_id"]] = _event["status"]
+            else:
+                _lines[_event["command_id"]] = _event["line"]
+    assert _lines == {id: str(i) for i, id in enumerate(commands.commands)}
+
+
+def test_websocket_events_unauthorized() -> None:
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/me/workflow/1/events?token=x") as ws:
+            ws.receive_json()
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from conftest import client
+from export import accepts_gzip
+from utils import Struct
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_ndjson(auth_header: dict, commands: Struct) -> None:
+    response = client.get(
+        "/admin/command/export",
+        headers=auth_header | {"Accept-Encoding": "identity"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in response.headers
+    _ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert _ids == sorted(_ids)
+    assert set(commands.commands) <= set(_ids)
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_json(auth_header: dict, commands: Struct) -> None:
+    response = client.get(
+        "/admin/command/export",
+        params=dict(format="json", workflow_id=commands.ids["workflow"]),
+        headers=auth_header | {"Accept-Encoding": "identity"},
+    )
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == commands.commands
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_gzip(auth_header: dict, commands: Struct) -> None:
+    response = client.get(
+        "/admin/command/export",
+        params=dict(tag_id=commands.ids["tag"]),
+        headers=auth_header | {"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] \
+        == [commands.commands[1]]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,gzip",
+    [
+        ("gzip", True),
+        ("br;q=1.0, GZIP;q=0.5", True),
+        ("*", True),
+        ("", False),
+        ("identity", False),
+        ("gzip;q=0", False),
+        ("gzip;q=0, *", False),
+        ("*;q=0", False),
+        ("gzip;q=x", False),
+    ],
+)
+def test_accepts_gzip(accept_encoding: str, gzip: bool) -> None:
+    assert accepts_gzip(accept_encoding) == gzip
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_empty(auth_header: dict) -> None:
+    response = client.get(
+        "/admin/tag/export",
+        params=dict(format="json", created_after="2999-01-01T00:00:00"),
+        headers=auth_header,
+    )
+    assert response.status_code == 200
+    assert response.json() == []
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from time import monotonic, sleep
+
+import pytest
+from conftest import client
+from db import unit_of_work
+from jobs import jobs
+from model import Command, CommandJob, CommandStatus, JobStatus
+from sqlmodel import select, update
+
+
+def _statuses(ids: list, auth_header: dict) -> list:
+    return [
+        client.get(f"/me/command/{id}", headers=auth_header).json()["status"]
+        for id in ids
+    ]
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_workflow_jobs(auth_header: dict, commands) -> None:
+    _ids = commands.commands
+    client.put(f"/me/command/{_ids[0]}", json=dict(path="false"),
+               headers=auth_header)
+    # 0 <- 1 <- 2, 3 <- 4
+    for _command, _depends_on in [(1, 0), (2, 1), (4, 3)]:
+        assert client.put(
+            f"/me/command/{_ids[_command]}/dependency/add/"
+            f"{_ids[_depends_on]}",
+            headers=auth_header,
+        ).status_code == 200
+    assert client.put(
+        f"/me/workflow/{commands.ids['workflow']}/start", headers=auth_header
+    ).status_code == 200
+    _end = monotonic() + 10
+    while "started" in _statuses(_ids, auth_header) and monotonic() < _end:
+        sleep(0.1)
+    assert _statuses(_ids, auth_header) == [
+        "failed", "stopped", "stopped", "completed", "completed"
+    ]
+    # The skipped ones too.
+    for _id in _ids:
+        assert client.get(
+            f"/me/command/{_id}", headers=auth_header
+        ).json()["completed_at"] is not None
+    with unit_of_work() as session:
+        assert session.exec(
+            select(CommandJob).where(CommandJob.command_id.in_(_ids))
+        ).all() == []
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_backpressure(auth_header: dict, commands, monkeypatch) -> None:
+    _ids = commands.commands
+    monkeypatch.setattr(jobs, "queue_size", len(_ids) - 1)
+    assert client.put(
+        f"/me/workflow/{commands.ids['workflow']}/start", headers=auth_header
+    ).status_code == 429
+    assert "started" not in _statuses(_ids, auth_header)
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_restart(auth_header: dict, commands) -> None:
+    _ids = commands.commands
+    with unit_of_work() as session:
+        session.exec(
+            update(Command)
+            .where(Command.id == _ids[0])
+            .values(status=CommandStatus.STOPPED)
+        )
+        # Still running on a worker that did not see the stop yet.
+        _job = CommandJob(
+            command_id=_ids[0],
+            workflow_id=commands.ids["workflow"],
+            user_id="admin",
+            status=JobStatus.RUNNING,
+            worker="slow",
+            lease_expires_at=datetime.now() + timedelta(seconds=60),
+        )
+        session.add(_job)
+    with unit_of_work() as session:
+        assert jobs.cancelled("slow", [_job.id], session) == [_job.id]
+    assert client.put(
+        f"/me/workflow/{commands.ids['workflow']}/start", headers=auth_header
+    ).status_code == 200
+    with unit_of_work() as session:
+        assert jobs.cancelled("slow", [_job.id], session) == [_job.id]
+    _end = monotonic() + 10
+    while "started" in _statuses(_ids, auth_header) and monotonic() < _end:
+        sleep(0.1)
+    assert _statuses(_ids, auth_header) == ["completed"] * len(_ids)
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_recover(auth_header: dict, commands) -> None:
+    _ids = commands.commands
+    with unit_of_work() as session:
+        session.exec(
+            update(Command)
+            .where(Command.id.in_(_ids[:2]))
+            .values(status=CommandStatus.STARTED)
+        )
+        # Leased to a dead worker for the last time.
+        session.add(
+            CommandJob(
+                command_id=_ids[1],
+                workflow_id=commands.ids["workflow"],
+                user_id="admin",
+                status=JobStatus.RUNNING,
+                worker="dead",
+                lease_expires_at=datetime.now() - timedelta(seconds=1),
+                attempts=jobs.attempts_max,
+            )
+        )
+    with unit_of_work() as session:
+        jobs.recover(session)
+    assert _statuses(_ids[:2], auth_header) == ["stopped", "failed"]
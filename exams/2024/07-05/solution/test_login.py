@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from time import sleep
+
+import pytest
+from auth import login_limiter
+from conftest import client
+from limiter import RateLimiter
+from refresh import MemoryRefreshTokenStore
+
+
+def test_rate_limiter() -> None:
+    _limiter = RateLimiter(rate=0.001, burst=2, size=2)
+    assert [_limiter.acquire("a") for _ in range(3)] == [True, True, False]
+    assert _limiter.acquire("b")
+    # Only the 2 most recently used buckets are kept: "a" starts again full.
+    assert _limiter.acquire("c")
+    assert _limiter.acquire("a")
+    assert _limiter.stats().rejected == 1
+
+
+def test_login_limited() -> None:
+    _codes = []
+    try:
+        # The bucket refills meanwhile: more than burst attempts are allowed.
+        while len(_codes) < 10 * login_limiter.burst:
+            _codes.append(
+                client.post(
+                    "/auth/token", data=dict(username="nobody", password="x")
+                ).status_code
+            )
+            if _codes[-1] == 429:
+                break
+            # Half a token back each attempt, whatever the hash cost.
+            sleep(0.5 / login_limiter.rate)
+        assert _codes[-1] == 429
+        assert set(_codes[:-1]) == {401}
+        assert len(_codes) > login_limiter.burst
+    finally:
+        login_limiter._buckets.clear()
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_login_stats(auth_header: dict) -> None:
+    response = client.get("/admin/login", headers=auth_header)
+    assert response.status_code == 200
+    _stats = response.json()
+    assert _stats["passwords"]["verified"] > 0
+    assert _stats["passwords"]["latency_max"] > 0
+    assert _stats["limiter"]["allowed"] > 0
+
+
+def test_memory_refresh_token_store() -> None:
+    _store = MemoryRefreshTokenStore()
+    _expires_at = datetime.now() + timedelta(minutes=1)
+    _store.add("a", "user", "f", _expires_at)
+    _store.add("b", "user", "f", _expires_at)
+    _store.add("c", "other", "g", _expires_at)
+    _store.add("d", "other", "h", datetime.now())
+    assert _store.use("a").family == "f"
+    # Reused: the whole family is revoked.
+    assert _store.use("a") is None
+    assert _store.use("b") is None
+    assert _store.use("d") is None
+    _store.revoke_user("other")
+    assert _store.use("c") is None
+
+
+def _refresh(token: str):
+    return client.post(
+        "/auth/refresh", headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+def test_refresh_rotation() -> None:
+    _response = client.post(
+        "/auth/token", data=dict(username="admin", password="admin")
+    )
+    assert _response.status_code == 200
+    _first = _response.json()["refresh_token"]
+    _response = _refresh(_first)
+    assert _response.status_code == 200
+    _second = _response.json()["refresh_token"]
+    assert _second != _first
+    _response = client.get(
+        "/admin/login",
+        headers={
+            "Authorization": f"Bearer {_response.json()['access_token']}"
+        },
+    )
+    assert _response.status_code == 200
+    # Reuse of a rotated token: the token of the same family is revoked.
+    assert _refresh(_first).status_code == 401
+    assert _refresh(_second).status_code == 401
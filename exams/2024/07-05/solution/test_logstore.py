@@ -0,0 +1,63 @@
+import asyncio
+from time import monotonic, sleep
+
+import pytest
+from admin.command import delete
+from conftest import client
+from db import unit_of_work
+from logstore import LogStore, logs
+
+
+def test_log_store(tmp_path) -> None:
+    _store = LogStore(
+        path=str(tmp_path), segment_size=64, index_every=4, flush_interval=60
+    )
+    assert _store.read(1).total_lines == 0
+    _writer = _store.open(1)
+    for i in range(100):
+        _writer.write(f"line {i}")
+    # Not flushed yet.
+    assert _store.read(1).total_lines < 100
+    _writer.close()
+    assert len(list((tmp_path / "1").glob("*.log"))) > 1
+    _log = _store.read(1, from_line=5, limit=30)
+    assert _log.lines == [f"line {i}" for i in range(5, 35)]
+    assert (_log.next_line, _log.total_lines) == (35, 100)
+    _log = _store.read(1, tail=3)
+    assert _log.lines == ["line 97", "line 98", "line 99"]
+    assert _log.from_line == 97
+    assert _store.read(1, from_line=100).lines == []
+    # A new execution replaces the log.
+    _store.open(1).close()
+    assert _store.read(1).total_lines == 0
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_command_log(auth_header: dict, commands) -> None:
+    assert client.put(
+        f"/me/workflow/{commands.ids['workflow']}/start", headers=auth_header
+    ).status_code == 200
+    _id = commands.commands[2]
+    _end = monotonic() + 10
+    while client.get(
+        f"/me/command/{_id}", headers=auth_header
+    ).json()["status"] == "started" and monotonic() < _end:
+        sleep(0.1)
+    _log = client.get(
+        f"/me/command/{_id}/log?tail=10", headers=auth_header
+    ).json()
+    assert _log["lines"] == ["2"]
+    assert client.get(
+        f"/me/command/{_id}/log?from_line=-1", headers=auth_header
+    ).status_code == 422
+    # The delete rolled back keeps the log.
+    with pytest.raises(ValueError):
+        with unit_of_work() as session:
+            asyncio.run(delete(None, session, _id))
+            raise ValueError()
+    assert logs.read(_id).total_lines == 1
+    client.delete(f"/admin/command/{_id}", headers=auth_header)
+    assert client.get(
+        f"/admin/command/{_id}/log", headers=auth_header
+    ).status_code == 404
+    assert logs.read(_id).total_lines == 0
@@ -0,0 +1,43 @@
+import pytest
+from conftest import client
+from metrics import Histogram
+
+
+def test_histogram() -> None:
+    _histogram = Histogram([1, 5])
+    for value in (0.5, 1, 3, 10):
+        _histogram.observe(value)
+    assert _histogram.cumulative() == [("1", 2), ("5", 3), ("+Inf", 4)]
+    assert _histogram.sum == 14.5 and _histogram.count == 4
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_metrics(auth_header: dict) -> None:
+    response = client.get(
+        "/me/workflow/created", headers={**auth_header, "X-Debug-Timing": "1"}
+    )
+    assert response.status_code == 200, response.text
+    assert "statements" in response.headers["X-Debug-Timing"]
+    response = client.get("/me/workflow/created", headers=auth_header)
+    assert "X-Debug-Timing" not in response.headers
+    response = client.get("/metrics")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain")
+    _lines = response.text.splitlines()
+    _labels = '{method="GET",route="/me/workflow/created"'
+    for metric in (
+        "requests_total",
+        "request_duration_seconds_bucket",
+        "request_sql_statements_count",
+        "request_sql_duration_seconds_total",
+        "response_bytes_total",
+    ):
+        assert any(
+            line.startswith(f"yawms_http_{metric}{_labels}")
+            for line in _lines
+        ), metric
+    assert any(
+        line.startswith('yawms_http_request_password_duration_seconds_total'
+                        '{method="POST",route="/auth/token"}')
+        for line in _lines
+    )
@@ -0,0 +1,58 @@
+import pytest
+from conftest import client
+from utils import Struct
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_pages(auth_header: dict, commands: Struct) -> None:
+    _ids, _after = [], None
+    while True:
+        response = client.get(
+            "/me/command/created",
+            params=dict(limit=2, fields="id,path")
+            | (dict(after=_after) if _after else {}),
+            headers=auth_header,
+        )
+        assert response.status_code == 200
+        for item in response.json():
+            assert set(item) == {"id", "path"}
+            _ids.append(item["id"])
+        _after = response.headers.get("X-Next-After")
+        if _after is None:
+            break
+    assert _ids == sorted(_ids)
+    assert set(commands.commands) <= set(_ids)
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_filters(auth_header: dict, commands: Struct) -> None:
+    response = client.get(
+        "/admin/command",
+        params=dict(tag_id=commands.ids["tag"], fields="id"),
+        headers=auth_header,
+    )
+    assert response.json() == [dict(id=commands.commands[1])]
+    response = client.get(
+        "/admin/command",
+        params=dict(
+            workflow_id=commands.ids["workflow"],
+            status="not-executed",
+            created_before="2000-01-01T00:00:00",
+        ),
+        headers=auth_header,
+    )
+    assert response.json() == []
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+@pytest.mark.parametrize(
+    "path,params",
+    [
+        ("/admin/user", dict(fields="id,password")),
+        ("/admin/command", dict(after="x")),
+        ("/admin/command", dict(limit=0)),
+    ],
+)
+def test_invalid(auth_header: dict, path: str, params: dict) -> None:
+    response = client.get(path, params=params, headers=auth_header)
+    assert response.status_code == 422
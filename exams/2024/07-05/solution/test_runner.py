@@ -0,0 +1,38 @@
+import asyncio
+import signal
+
+from runner import CancelToken, Stream, output, run
+
+
+def test_run_streams_output() -> None:
+    _execution = asyncio.run(
+        run(-1, "sh -c 'echo out; echo err >&2; exit 3'", CancelToken())
+    )
+    assert _execution.exit_code == 3
+    assert _execution.duration > 0
+    _lines = {(line.stream, line.line) for line in output.read(-1)}
+    assert _lines == {(Stream.STDOUT, "out"), (Stream.STDERR, "err")}
+
+
+def test_run_not_found() -> None:
+    _execution = asyncio.run(
+        run(-2, "not-existing-command", CancelToken())
+    )
+    assert _execution.exit_code is None
+    assert _execution.error is not None
+
+
+def test_run_cancel() -> None:
+    async def _cancel_later(path: str):
+        _token = CancelToken()
+        asyncio.get_running_loop().call_later(0.2, _token.cancel)
+        return await run(-3, path, _token)
+
+    _execution = asyncio.run(_cancel_later("sleep 30"))
+    assert _execution.exit_code == -signal.SIGTERM
+    assert _execution.duration < 1
+    _execution = asyncio.run(
+        _cancel_later("sh -c 'trap \"\" TERM; sleep 30'")
+    )
+    assert _execution.exit_code == -signal.SIGKILL
+    assert _execution.duration < 2
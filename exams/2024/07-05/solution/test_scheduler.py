@@ -0,0 +1,29 @@
+from threading import Event
+
+import pytest
+from error import TooManyRequestsException
+from scheduler import Scheduler
+
+
+def test_priority_and_backpressure() -> None:
+    _scheduler = Scheduler(workers=1, queue_size=2, history=10)
+    _started, _blocker, _order = Event(), Event(), []
+
+    def _block() -> None:
+        _started.set()
+        _blocker.wait()
+
+    _scheduler.submit(_block, name="blocker")
+    assert _started.wait(timeout=5)
+    _scheduler.submit(lambda: _order.append("low"), name="low", priority=1)
+    _scheduler.submit(lambda: _order.append("high"), name="high", priority=0)
+    with pytest.raises(TooManyRequestsException):
+        _scheduler.submit(lambda: None, name="rejected")
+    _blocker.set()
+    _scheduler.join(timeout=5)
+    assert _order == ["high", "low"]
+    _stats = _scheduler.stats()
+    assert _stats.queue_depth == 0
+    assert _stats.completed == 3
+    assert _stats.rejected == 1
+    assert _stats.wait_time_max is not None
@@ -0,0 +1,71 @@
+import pytest
+from conftest import client
+
+
+@pytest.mark.parametrize("username,password", [("alexcarrega", "test-me")])
+def test_search(auth_header: dict) -> None:
+    _ids = dict(
+        workflow=client.post(
+            "/me/workflow", json=dict(name="search"), headers=auth_header
+        ).json()["id"],
+        category=client.post(
+            "/me/category", json=dict(name="search"), headers=auth_header
+        ).json()["id"],
+    )
+    _commands = [
+        result["id"]
+        for result in client.post(
+            "/me/command/bulk",
+            json=[
+                dict(
+                    path=path,
+                    workflow_id=_ids["workflow"],
+                    category_id=_ids["category"],
+                )
+                for path in [
+                    "rsync --archive /srv/backup-nightly",
+                    "pg_dump backup-weekly",
+                ]
+            ],
+            headers=auth_header,
+        ).json()
+    ]
+
+    def _search(q: str) -> list:
+        response = client.get(
+            "/me/search/command", params=dict(q=q), headers=auth_header
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    hits = _search("nightl")
+    assert [hit["id"] for hit in hits] == _commands[:1]
+    assert "[nightly]" in hits[0]["snippet"]
+    assert {hit["id"] for hit in _search("backup")} == set(_commands)
+    assert _search("backup weekly") == _search("weekly backup")
+    assert _search('"rsync" (*') == _search("rsync")
+    assert _search("!!") == []
+    response = client.put(
+        f"/me/command/{_commands[0]}",
+        json=dict(path="tar --create /srv/archive"),
+        headers=auth_header,
+    )
+    assert response.status_code == 200, response.text
+    assert _search("nightly") == []
+    assert [hit["id"] for hit in _search("archive")] == _commands[:1]
+
+    other = client.post(
+        "/auth/token", data=dict(username="admin", password="admin")
+    ).json()["access_token"]
+    response = client.get(
+        "/me/search/command",
+        params=dict(q="archive"),
+        headers={"Authorization": f"Bearer {other}"},
+    )
+    assert response.json() == []
+    response = client.get(
+        "/admin/search/command",
+        params=dict(q="archive"),
+        headers={"Authorization": f"Bearer {other}"},
+    )
+    assert [hit["id"] for hit in response.json()] == _commands[:1]
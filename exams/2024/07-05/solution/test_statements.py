@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+import pytest
+from conftest import client
+from db import Owner, after_commit, unit_of_work
+from model import Command, Principal, async_engine, engine
+from password import pwd_context
+from sqlalchemy import event, text
+from sqlmodel import Session, select
+
+# Maximum number of SQL statements executed by each endpoint, once the
+# principal of the token is cached.
+budget = {
+    "/admin/user/admin": 1,
+    "/me/command/created": 1,
+    "/me/workflow/created": 1,
+    "/me/tag/created": 1,
+    "/admin/command": 1,
+}
+
+
+@contextmanager
+def statements() -> Iterator[List[str]]:
+    _engine = async_engine.sync_engine if async_engine else engine
+    _statements = []
+
+    def _count(conn, cursor, statement, *args) -> None:
+        _statements.append(statement)
+
+    event.listen(_engine, "before_cursor_execute", _count)
+    try:
+        yield _statements
+    finally:
+        event.remove(_engine, "before_cursor_execute", _count)
+
+
+def count(path: str, auth_header: dict) -> int:
+    with statements() as _statements:
+        response = client.get(path, headers=auth_header)
+    assert response.status_code == 200, response.text
+    return len(_statements)
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_statements(auth_header: dict) -> None:
+    client.get("/me/tag/created", headers=auth_header)
+    _counts = {path: count(path, auth_header) for path in budget}
+    for path, n in _counts.items():
+        assert n <= budget[path], (path, n)
+    _ids = dict(
+        workflow=client.post(
+            "/me/workflow", json=dict(name="history"), headers=auth_header
+        ).json()["id"],
+        category=client.post(
+            "/me/category", json=dict(name="history"), headers=auth_header
+        ).json()["id"],
+    )
+    _commands = [
+        client.post(
+            "/me/command",
+            json=dict(
+                path=f"echo {i}",
+                workflow_id=_ids["workflow"],
+                category_id=_ids["category"],
+            ),
+            headers=auth_header,
+        ).json()["id"]
+        for i in range(20)
+    ]
+    try:
+        for path, n in _counts.items():
+            assert count(path, auth_header) == n, path
+    finally:
+        for id in _commands:
+            client.delete(f"/admin/command/{id}", headers=auth_header)
+        for target, id in _ids.items():
+            client.delete(f"/admin/{target}/{id}", headers=auth_header)
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite",
+                    reason="SQLite query plan")
+@pytest.mark.parametrize("owner", list(Owner))
+def test_owner_index(owner: Owner) -> None:
+    _user = Principal(id="admin", role_id="admin", disabled=False)
+    _query = (
+        select(Command)
+        .where(getattr(Command, owner) == _user.id)
+        .order_by(Command.id)
+    )
+    _sql = _query.compile(engine, compile_kwargs={"literal_binds": True})
+    with Session(engine) as session:
+        _plan = session.exec(text(f"EXPLAIN QUERY PLAN {_sql}")).all()
+    assert f"ix_command_{owner.value}_id" in str(_plan)
+    assert "TEMP B-TREE" not in str(_plan)
+
+
+@pytest.mark.parametrize("username,password", [("admin", "admin")])
+def test_principal_cache(auth_header: dict) -> None:
+    _user = dict(
+        id="cache",
+        first_name="Cache",
+        last_name="Test",
+        email="cache@yawms.com",
+        password=pwd_context.hash("cache"),
+        role_id="user",
+    )
+    assert client.post(
+        "/admin/user", json=_user, headers=auth_header
+    ).status_code == 200
+    try:
+        _token = client.post(
+            "/auth/token", data=dict(username="cache", password="cache")
+        ).json()["access_token"]
+        _header = {"Authorization": f"Bearer {_token}"}
+        with statements() as _statements:
+            count("/me/tag/created", _header)
+            count("/me/tag/created", _header)
+        # The table name is quoted on PostgreSQL.
+        assert len(
+            [s for s in _statements if "FROM user" in s.replace('"', "")]
+        ) == 1
+        client.put(
+            "/admin/user/cache",
+            json=_user | dict(disabled=True),
+            headers=auth_header,
+        )
+        response = client.get("/me/tag/created", headers=_header)
+        assert response.status_code == 400
+    finally:
+        client.delete("/admin/user/cache", headers=auth_header)
+    response = client.get("/me/tag/created", headers=_header)
+    assert response.status_code == 401
+
+
+def test_after_commit() -> None:
+    _called = []
+    with unit_of_work() as session:
+        after_commit(session, lambda: _called.append("commit"))
+        assert _called == []
+    assert _called == ["commit"]
+    with pytest.raises(ValueError):
+        with unit_of_work() as session:
+            after_commit(session, lambda: _called.append("rollback"))
+            raise ValueError()
+    assert _called == ["commit"]
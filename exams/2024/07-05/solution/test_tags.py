@@ -0,0 +1,95 @@
+import pytest
+from conftest import client
+from test_statements import statements
+
+
+@pytest.mark.parametrize("username,password", [("alexcarrega", "test-me")])
+def test_me_tags(auth_header: dict) -> None:
+    _ids = dict(
+        workflow=client.post(
+            "/me/workflow", json=dict(name="tags"), headers=auth_header
+        ).json()["id"],
+        category=client.post(
+            "/me/category", json=dict(name="tags"), headers=auth_header
+        ).json()["id"],
+    )
+    _tags = [
+        result["id"]
+        for result in client.post(
+            "/me/tag/bulk",
+            json=[dict(name=f"tags {i}") for i in range(3)],
+            headers=auth_header,
+        ).json()
+    ]
+    _commands = [
+        result["id"]
+        for result in client.post(
+            "/me/command/bulk",
+            json=[
+                dict(
+                    path=f"echo {i}",
+                    workflow_id=_ids["workflow"],
+                    category_id=_ids["category"],
+                )
+                for i in range(3)
+            ],
+            headers=auth_header,
+        ).json()
+    ]
+    for _command, _command_tags in zip(_commands, [_tags[:2], _tags[1:], []]):
+        with statements() as _statements:
+            response = client.put(
+                f"/me/command/{_command}/tags/add",
+                json=_command_tags,
+                headers=auth_header,
+            )
+        assert response.status_code == 200, response.text
+        assert len(response.json()) == len(_command_tags)
+        # Authentication, command, tags and one INSERT for the whole set.
+        assert len(_statements) <= 5, _statements
+    response = client.put(
+        f"/me/command/{_commands[0]}/tags/add",
+        json=_tags,
+        headers=auth_header,
+    )
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 1
+    response = client.put(
+        f"/me/command/{_commands[0]}/add/{_tags[0]}", headers=auth_header
+    )
+    assert response.status_code == 409
+    response = client.put(
+        f"/me/command/{_commands[0]}/tags/add",
+        json=[_tags[0], 0],
+        headers=auth_header,
+    )
+    assert response.status_code == 404
+
+    def _tagged(**params) -> list:
+        response = client.get(
+            "/me/command",
+            params=dict(workflow_id=_ids["workflow"], **params),
+            headers=auth_header,
+        )
+        assert response.status_code == 200, response.text
+        return [command["id"] for command in response.json()]
+
+    assert _tagged(tag=_tags[1:]) == _commands[:2]
+    assert _tagged(tag=_tags[:2]) == _commands[:1]
+    assert _tagged(tag=[_tags[0], _tags[2]], tag_match="any") == _commands[:2]
+    assert _tagged(tag_id=_tags[2]) == _commands[:2]
+    assert _tagged() == _commands
+
+    response = client.request(
+        "DELETE",
+        f"/me/command/{_commands[0]}/tags/rm",
+        json=_tags,
+        headers=auth_header,
+    )
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 3
+    assert _tagged(tag=_tags[1:]) == _commands[1:2]
+    response = client.delete(
+        f"/me/command/{_commands[0]}/rm/{_tags[0]}", headers=auth_header
+    )
+    assert response.status_code == 404
@@ -0,0 +1,194 @@
+import os
+import signal
+from socket import gethostname
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Dict, Self, Tuple
+
+from config import (job_cancel_poll, job_heartbeat, job_poll,
+                    job_stop_grace, job_worker_embedded, logger)
+from db import unit_of_work
+from jobs import jobs
+from model import Command, CommandJob
+from runner import CancelToken, tokens
+from scheduler import scheduler
+
+
+class Worker:
+    """Run the jobs of the queue (see jobs.py) with the scheduler.
+
+    It claims the queued jobs while the scheduler has free workers, renews
+    their leases every heartbeat seconds and, every cancel_poll seconds,
+    stops the commands stopped through the API meanwhile (the cancel tokens
+    are local to a process).
+
+    The worker embedded in the API process starts with the first workflow;
+    the yawms_worker.py processes run it in the main thread. Their events
+    are published in their own process only (see events.py), and they
+    write the logs of the commands in config.log_path.
+    """
+
+    def __init__(
+        self: Self,
+        name: str,
+        slots: int,
+        poll: float,
+        heartbeat: float,
+        cancel_poll: float,
+        embedded: bool,
+    ) -> None:
+        self.name = name
+        self.slots = slots
+        self.poll = poll
+        self.heartbeat = heartbeat
+        self.cancel_poll = cancel_poll
+        self.embedded = embedded
+        self._lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+        self._thread = None
+        self._running: Dict[int, Tuple[CommandJob, CancelToken]] = {}
+
+    def wake(self: Self) -> None:
+        """Claim the jobs now, e.g. a workflow was started."""
+        if not self.embedded:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self.run, name="worker", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
+
+    def run(self: Self) -> None:
+        logger.info(f"Worker {self.name} started")
+        beat, claimed = monotonic(), float("-inf")
+        while not self._stop.is_set():
+            woken = self._wake.is_set()
+            self._wake.clear()
+            try:
+                if woken or monotonic() - claimed >= self.poll:
+                    claimed = monotonic()
+                    self._claim()
+                self._cancel()
+                if monotonic() - beat >= self.heartbeat:
+                    beat = monotonic()
+                    self._renew()
+            except Exception as e:
+                logger.error(f"Worker {self.name}: {e}")
+            self._wake.wait(self.cancel_poll)
+        logger.info(f"Worker {self.name} stopped")
+
+    def stop(self: Self) -> None:
+        """Stop claiming jobs, see run."""
+        self._stop.set()
+        self._wake.set()
+
+    def shutdown(self: Self, grace: float) -> None:
+        """Stop and wait the running jobs up to grace seconds.
+
+        The jobs still running afterwards are stopped and queued again.
+        """
+        self.stop()
+        if self._thread is not None:
+            self._thread.join()
+        end = monotonic() + grace
+        while len(self._running) > 0 and monotonic() < end:
+            self._wake.clear()
+            self._wake.wait(min(self.poll, max(end - monotonic(), 0)))
+        with self._lock:
+            running = list(self._running.values())
+        if len(running) == 0:
+            return
+        with unit_of_work() as session:
+            for job, _ in running:
+                jobs.release(job, session)
+        for _, token in running:
+            token.cancel()
+        logger.warning(f"Worker {self.name}: {len(running)} jobs released")
+
+    def _claim(self: Self) -> None:
+        # No more than the scheduler accepts: a claimed job is not rejected.
+        with self._lock:
+            free = min(
+                self.slots - len(self._running), scheduler.free_slots()
+            )
+        if free <= 0:
+            return
+        with unit_of_work() as session:
+            claimed = jobs.claim(self.name, free, session)
+        for job, command in claimed:
+            token = tokens.create(command.id)
+            with self._lock:
+                self._running[job.id] = (job, token)
+            try:
+                command.submit(
+                    priority=job.priority, done=self._done(job, command)
+                )
+            except Exception as e:
+                logger.error(f"Command {command.path} not submitted: {e}")
+                self._forget(job, command)
+                with unit_of_work() as session:
+                    jobs.release(job, session)
+
+    def _renew(self: Self) -> None:
+        with self._lock:
+            ids = list(self._running)
+        if len(ids) == 0:
+            return
+        with unit_of_work() as session:
+            jobs.renew(self.name, ids, session)
+
+    def _cancel(self: Self) -> None:
+        with self._lock:
+            running = dict(self._running)
+        if len(running) == 0:
+            return
+        with unit_of_work() as session:
+            cancelled = jobs.cancelled(self.name, list(running), session)
+        for id in cancelled:
+            _, token = running[id]
+            token.cancel()
+
+    def _done(self: Self, job: CommandJob, command: Command) -> callable:
+        def _done() -> None:
+            try:
+                with unit_of_work() as session:
+                    if not jobs.complete(job, command, session):
+                        logger.warning(
+                            f"Command {command.path}: lease lost, "
+                            "result discarded"
+                        )
+            finally:
+                self._forget(job, command)
+                self._wake.set()
+
+        return _done
+
+    def _forget(self: Self, job: CommandJob, command: Command) -> None:
+        with self._lock:
+            _, token = self._running.pop(job.id, (None, None))
+        if token is not None:
+            tokens.remove(command.id, token)
+
+
+worker = Worker(
+    name=f"{gethostname()}-{os.getpid()}",
+    slots=scheduler.workers,
+    poll=job_poll,
+    heartbeat=job_heartbeat,
+    cancel_poll=job_cancel_poll,
+    embedded=job_worker_embedded,
+)
+
+
+def main() -> None:
+    """Entry point of yawms_worker.py: run the jobs until SIGINT or
+    SIGTERM."""
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    with unit_of_work() as session:
+        jobs.recover(session)
+    worker.run()
+    worker.shutdown(job_stop_grace)
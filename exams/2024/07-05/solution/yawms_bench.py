@@ -0,0 +1,329 @@
+#!/usr/bin/env -S poetry -C /axc-mgmt/github/teaching/104779-internet_programming/exams/2024/07-05/solution run python
+
+# Benchmark of the API: seed bench users, workflows and commands, drive the
+# app in-process (ASGI) and over uvicorn with concurrent clients, store the
+# latencies (p50/p95/p99) and requests/s of each scenario as JSON.
+# With --baseline the run fails if a scenario regressed beyond --tolerance.
+#
+#   ./yawms_bench.py --output bench.json
+#   ./yawms_bench.py --baseline bench.json
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from itertools import cycle
+from time import monotonic, perf_counter, sleep
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import uvicorn
+from app import app
+from auth import login_limiter
+from db import unit_of_work
+from logstore import logs
+from model import (Category, Command, CommandJob, CommandStatus, User,
+                   Workflow)
+from password import passwords
+from refresh import refresh_tokens
+from sqlmodel import delete, select
+
+PREFIX = "bench-"
+PASSWORD = "bench"
+MODES = ["inprocess", "uvicorn"]
+SCENARIOS = ["login", "read_all_created", "read_personal", "workflow_start"]
+
+type Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+def seed(users: int, workflows: int, commands: int) -> Dict[str, List[int]]:
+    """Workflows of each bench user, with their commands."""
+    password = passwords.hash_all([PASSWORD])[0]
+    data = {}
+    with unit_of_work() as session:
+        for i in range(users):
+            user_id = f"{PREFIX}{i}"
+            session.add(
+                User(
+                    id=user_id,
+                    first_name="Bench",
+                    last_name=str(i),
+                    email=f"{user_id}@yawms.com",
+                    password=password,
+                    role_id="user",
+                    created_by_id="admin",
+                )
+            )
+            category = Category(name=user_id, created_by_id=user_id)
+            _workflows = [
+                Workflow(name=f"{user_id}-{j}", created_by_id=user_id)
+                for j in range(workflows)
+            ]
+            session.add_all([category, *_workflows])
+            session.flush()
+            session.add_all(
+                Command(
+                    path="true",
+                    category_id=category.id,
+                    workflow_id=workflow.id,
+                    created_by_id=user_id,
+                )
+                for workflow in _workflows
+                for _ in range(commands)
+            )
+            data[user_id] = [workflow.id for workflow in _workflows]
+    return data
+
+
+def cleanup(timeout: float = 60) -> None:
+    """Remove the bench data, once its commands are not running."""
+    bench = Command.created_by_id.startswith(PREFIX)
+    end = monotonic() + timeout
+    while monotonic() < end:
+        with unit_of_work() as session:
+            if session.exec(
+                select(Command.id).where(
+                    bench, Command.status == CommandStatus.STARTED
+                )
+            ).first() is None:
+                break
+        sleep(0.5)
+    with unit_of_work() as session:
+        ids = session.exec(select(Command.id).where(bench)).all()
+        session.exec(delete(CommandJob).where(CommandJob.command_id.in_(ids)))
+        session.exec(delete(Command).where(bench))
+        for model in (Workflow, Category):
+            session.exec(
+                delete(model).where(model.created_by_id.startswith(PREFIX))
+            )
+        user_ids = session.exec(
+            select(User.id).where(User.id.startswith(PREFIX))
+        ).all()
+        session.exec(delete(User).where(User.id.startswith(PREFIX)))
+    for id in ids:
+        logs.remove(id)
+    for user_id in user_ids:
+        refresh_tokens.revoke_user(user_id)
+
+
+def unlimited() -> None:
+    """No login rate limit: the bench logs in from a single address."""
+    login_limiter.rate = login_limiter.burst = 1e9
+    login_limiter._buckets.clear()
+
+
+def summary(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Latencies in milliseconds."""
+    quantiles = (
+        statistics.quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) > 1
+        else latencies * 99
+    )
+    return dict(
+        requests=len(latencies),
+        errors=errors,
+        rps=len(latencies) / elapsed if elapsed > 0 else 0.0,
+        p50=quantiles[49] * 1000,
+        p95=quantiles[94] * 1000,
+        p99=quantiles[98] * 1000,
+    )
+
+
+async def measure(
+    client: httpx.AsyncClient, requests: List[Request], concurrency: int
+) -> dict:
+    """Send the requests with concurrency clients sharing the list."""
+    latencies, errors, pending = [], 0, iter(requests)
+
+    async def work() -> None:
+        nonlocal errors
+        for request in pending:
+            start = perf_counter()
+            response = await request(client)
+            latencies.append(perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = perf_counter()
+    await asyncio.gather(*(work() for _ in range(concurrency)))
+    return summary(latencies, errors, perf_counter() - start)
+
+
+async def bench(
+    client: httpx.AsyncClient,
+    data: Dict[str, List[int]],
+    n: int,
+    concurrency: int,
+) -> dict:
+    def login(user_id: str) -> Request:
+        return lambda c: c.post(
+            "/auth/token", data=dict(username=user_id, password=PASSWORD)
+        )
+
+    def get(url: str, user_id: str) -> Request:
+        return lambda c: c.get(url, headers=headers[user_id])
+
+    def put(url: str, user_id: str) -> Request:
+        return lambda c: c.put(url, headers=headers[user_id])
+
+    headers = {}
+    for user_id in data:
+        token = (await login(user_id)(client)).json()["access_token"]
+        headers[user_id] = {"Authorization": f"Bearer {token}"}
+    users = cycle(data)
+    workflows = cycle(
+        (user_id, id) for user_id, ids in data.items() for id in ids
+    )
+    requests = dict(
+        login=[login(next(users)) for _ in range(n)],
+        read_all_created=[
+            get("/me/workflow/created", next(users)) for _ in range(n)
+        ],
+        read_personal=[
+            get(f"/me/workflow/{id}", user_id)
+            for user_id, id in (next(workflows) for _ in range(n))
+        ],
+        # Each workflow once: a started workflow can not be started again.
+        workflow_start=[
+            put(f"/me/workflow/{id}/start", user_id)
+            for user_id, ids in data.items()
+            for id in ids
+        ],
+    )
+    return {
+        name: await measure(client, requests[name], concurrency)
+        for name in SCENARIOS
+    }
+
+
+def serve(port: int) -> None:
+    unlimited()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def wait_ready(url: str, timeout: float = 30) -> None:
+    end = monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                await client.get(f"{url}/docs")
+                return
+            except httpx.TransportError:
+                if monotonic() > end:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def run(mode: str, args: argparse.Namespace) -> dict:
+    data = seed(args.users, args.workflows, args.commands)
+    try:
+        if mode == "inprocess":
+            unlimited()
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench"
+            ) as client:
+                return await bench(client, data, args.requests,
+                                   args.concurrency)
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, __file__, "--serve", "--port", str(args.port)]
+        )
+        try:
+            await wait_ready(url)
+            async with httpx.AsyncClient(
+                base_url=url,
+                timeout=60,
+                limits=httpx.Limits(max_connections=args.concurrency),
+            ) as client:
+                return await bench(client, data, args.requests,
+                                   args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+    finally:
+        cleanup()
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Scenarios slower (p95, requests/s) or with more errors."""
+    regressions = []
+    for mode, scenarios in baseline["results"].items():
+        for name, base in scenarios.items():
+            current = results["results"].get(mode, {}).get(name)
+            if current is None:
+                continue
+            if current["p95"] > base["p95"] * (1 + tolerance):
+                regressions.append(
+                    f"{mode} {name}: p95 {current['p95']:.1f} ms, "
+                    f"baseline {base['p95']:.1f} ms"
+                )
+            if current["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{mode} {name}: {current['rps']:.1f} requests/s, "
+                    f"baseline {base['rps']:.1f} requests/s"
+                )
+            if current["errors"] > base["errors"]:
+                regressions.append(
+                    f"{mode} {name}: {current['errors']} errors, "
+                    f"baseline {base['errors']}"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="YAWMS API benchmark")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--workflows", type=int, default=10,
+                        help="per user")
+    parser.add_argument("--commands", type=int, default=5,
+                        help="per workflow")
+    parser.add_argument("--requests", type=int, default=500,
+                        help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mode", choices=[*MODES, "all"], default="all")
+    parser.add_argument("--port", type=int, default=9997)
+    parser.add_argument("--output", default="yawms-bench.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--serve", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port)
+        return 0
+    results = dict(
+        created_at=datetime.now().isoformat(),
+        python=platform.python_version(),
+        parameters={
+            key: value for key, value in vars(args).items()
+            if key not in ("baseline", "output", "serve")
+        },
+        results={
+            mode: asyncio.run(run(mode, args))
+            for mode in (MODES if args.mode == "all" else [args.mode])
+        },
+    )
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    for mode, scenarios in results["results"].items():
+        for name, result in scenarios.items():
+            print(
+                f"{mode:10} {name:17} {result['rps']:8.1f} requests/s "
+                f"p50 {result['p50']:7.1f} p95 {result['p95']:7.1f} "
+                f"p99 {result['p99']:7.1f} ms, {result['errors']} errors"
+            )
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as baseline:
+        regressions = compare(results, json.load(baseline), args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env -S poetry -C /axc-mgmt/github/teaching/104779-internet_programming/exams/2024/07-05/solution run python
+
+# Write throughput of SQLite with the default connections and with the
+# pragmas of config.db_pragmas (see engine.py): concurrent writer threads
+# commit small transactions, as the command completions do, while reader
+# threads query the table.
+#
+#   ./yawms_bench_sqlite.py --writers 8 --transactions 200 --readers 2
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+from threading import Event, Thread
+from time import perf_counter
+from typing import Dict, List
+
+from config import db_pragmas
+from engine import Pragmas, create_db_engine
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+PROFILES: Dict[str, Pragmas] = dict(default={}, tuned=db_pragmas)
+
+
+def bench(
+    pragmas: Pragmas, writers: int, transactions: int, readers: int
+) -> dict:
+    with tempfile.TemporaryDirectory() as dir:
+        engine = create_db_engine(
+            f"sqlite:///{os.path.join(dir, 'bench.db')}",
+            pragmas,
+            pool_size=writers + readers,
+        )
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "CREATE TABLE bench (id INTEGER PRIMARY KEY, "
+                    "status TEXT, duration REAL)"
+                )
+            )
+        latencies: List[float] = []
+        errors, reads, done = 0, 0, Event()
+
+        def write() -> None:
+            nonlocal errors
+            for i in range(transactions):
+                start = perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(
+                            text(
+                                "INSERT INTO bench (status, duration) "
+                                "VALUES ('Completed', :duration)"
+                            ),
+                            dict(duration=i),
+                        )
+                    latencies.append(perf_counter() - start)
+                except OperationalError:
+                    errors += 1
+
+        def read() -> None:
+            nonlocal reads
+            while not done.is_set():
+                with engine.connect() as conn:
+                    conn.execute(
+                        text("SELECT status, count(*) FROM bench "
+                             "GROUP BY status")
+                    ).all()
+                reads += 1
+
+        _readers = [Thread(target=read) for _ in range(readers)]
+        _writers = [Thread(target=write) for _ in range(writers)]
+        start = perf_counter()
+        for thread in _readers + _writers:
+            thread.start()
+        for thread in _writers:
+            thread.join()
+        elapsed = perf_counter() - start
+        done.set()
+        for thread in _readers:
+            thread.join()
+        engine.dispose()
+    quantiles = (
+        statistics.quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) > 1
+        else latencies * 99
+    )
+    return dict(
+        commits=len(latencies),
+        errors=errors,
+        commits_per_second=len(latencies) / elapsed,
+        reads_per_second=reads / elapsed,
+        p95=quantiles[94] * 1000 if len(quantiles) > 0 else None,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SQLite write benchmark")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--transactions", type=int, default=200,
+                        help="per writer")
+    parser.add_argument("--readers", type=int, default=2)
+    args = parser.parse_args()
+    results = {
+        name: bench(pragmas, args.writers, args.transactions, args.readers)
+        for name, pragmas in PROFILES.items()
+    }
+    for name, result in results.items():
+        print(
+            f"{name:8} {result['commits_per_second']:8.1f} commits/s "
+            f"{result['reads_per_second']:8.1f} reads/s "
+            f"p95 {result['p95'] or 0:7.1f} ms, {result['errors']} errors"
+        )
+    default = results["default"]["commits_per_second"]
+    tuned = results["tuned"]["commits_per_second"]
+    if default > 0:
+        print(f"Write throughput: {tuned / default:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,14 @@ from datetime import datetime  # noqa: E402
 
 from config import db_path
 
-if os.path.exists(db_path):
+if __name__ == "__main__" and os.path.exists(db_path):
     os.remove(db_path)
 
 from model import Role, User, engine  # noqa: E402
-from passlib.context import CryptContext  # noqa: E402
+from password import passwords  # noqa: E402
 from sqlalchemy.exc import IntegrityError  # noqa: E402
 from sqlmodel import Session  # noqa: E402
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 data_roles = dict(
     admin={"id": "admin", "password": "admin"},
     user={"id": "user", "password": "test-me"},
@@ -26,7 +24,6 @@ data_users = dict(
         "first_name": "Super",
         "last_name": "Admin",
         "email": "admin@yacr.com",
-        "password": pwd_context.hash(data_roles["admin"]["password"]),
         "disabled": False,
         "created_at": datetime.now(),
         "created_by_id": "admin",
@@ -39,7 +36,6 @@ data_users = dict(
         "first_name": "Alex",
         "last_name": "Carrega",
         "email": "contact@alexcarrega.com",
-        "password": pwd_context.hash(data_roles["user"]["password"]),
         "disabled": False,
         "created_at": datetime.now(),
         "created_by_id": "admin",
@@ -65,9 +61,9 @@ def insert_role(key):
         print(f"Error: {e}")
 
 
-def insert_user(key):
+def insert_user(key, password):
     try:
-        user = User(**data_users[key])
+        user = User(**data_users[key], password=password)
         print(user)
         with Session(engine) as session:
             try:
@@ -81,7 +77,19 @@ def insert_user(key):
         print(f"Error: {e}")
 
 
-insert_role("admin")
-insert_role("user")
-insert_user("admin")
-insert_user("alexcarrega")
+def init_data():
+    insert_role("admin")
+    insert_role("user")
+    # The password of a user is the one of its role, hashed in the pool.
+    hashes = passwords.hash_all(
+        [
+            data_roles[user["role_id"]]["password"]
+            for user in data_users.values()
+        ]
+    )
+    for key, hash in zip(data_users, hashes):
+        insert_user(key, hash)
+
+
+if __name__ == "__main__":
+    init_data()
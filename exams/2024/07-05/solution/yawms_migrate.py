@@ -0,0 +1,44 @@
+#!/usr/bin/env -S poetry -C /axc-mgmt/github/teaching/104779-internet_programming/exams/2024/07-05/solution run python
+
+# Create the columns and the indexes added to the model after the database.
+# create_all (in model.py) creates only the missing tables. Each step is
+# skipped when already done: the script can run again.
+
+from db import unit_of_work
+from model import CommandTag, engine
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, delete, func, select
+
+# The columns added to the tables (e.g. the execution of the commands):
+# nullable, the rows stored before have none.
+for table in SQLModel.metadata.tables.values():
+    columns = {
+        column["name"] for column in inspect(engine).get_columns(table.name)
+    }
+    for column in table.columns:
+        if column.name in columns:
+            continue
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                f"{column.type.compile(engine.dialect)}"
+            )
+        print(f"Column {column.name} of {table.name}: added")
+
+# The unique index of the tags of a command: the links added twice before
+# are removed, the first one is kept.
+with unit_of_work() as session:
+    session.exec(
+        delete(CommandTag).where(
+            CommandTag.id.not_in(
+                select(func.min(CommandTag.id)).group_by(
+                    CommandTag.command_id, CommandTag.tag_id
+                )
+            )
+        )
+    )
+
+for table in SQLModel.metadata.tables.values():
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+        print(f"Index {index.name} on {table.name}: ok")
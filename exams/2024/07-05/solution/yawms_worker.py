@@ -0,0 +1,14 @@
+#!/usr/bin/env -S poetry -C /axc-mgmt/github/teaching/104779-internet_programming/exams/2024/07-05/solution run python
+
+# Standalone worker: run the jobs of the started workflows (see worker.py)
+# until SIGINT or SIGTERM, on the database of config.db_url. Any number of
+# them can run with the API, on this host or on other ones, sharing the
+# directory of the command logs (config.log_path). Their events are not
+# relayed to the event streams of the API.
+#
+#   YAWMS_LOG_PATH=/shared/yawms-logs python yawms_worker.py
+
+from worker import main
+
+if __name__ == "__main__":
+    main()
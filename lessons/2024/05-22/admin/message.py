@@ -1,8 +1,9 @@
 from typing import Annotated, List
 
 from auth import RoleChecker
-from fastapi import Depends, HTTPException, status
-from model import Message, Result, User, engine
+from fastapi import Depends, HTTPException, Query, status
+from model import Message, Result, User, engine, message_search
+from search import SearchHit
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
@@ -52,6 +53,25 @@ async def admin_read_messages__admin(
         )
 
 
+@router.get(
+    "/message/search", tags=["Message"], summary="Search all the messages"
+)
+async def admin_search_messages(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin"]))
+    ],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+) -> List[SearchHit]:
+    try:
+        with Session(engine) as session:
+            return message_search.search(q, session, limit)
+    except Exception as e:
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
 @router.delete("/message/{id}", tags=["Message"], summary="Read a message")
 async def admin_delete_message(
     current_user: Annotated[
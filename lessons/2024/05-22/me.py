@@ -2,8 +2,10 @@ from datetime import datetime
 from typing import Annotated, List
 
 from auth import RoleChecker
-from fastapi import APIRouter, Depends, HTTPException, status
-from model import Message, Result, Room, User, UserRoom, engine
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from model import (Message, Result, Room, User, UserRoom, engine,
+                   message_search)
+from search import SearchHit
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
@@ -52,6 +54,38 @@ async def me_messages(
     return current_user.messages
 
 
+@router.get(
+    "/message/search",
+    tags=["Message"],
+    summary="Search the messages of the chat rooms where you are joined",
+)
+async def me_search_messages(
+    current_user: Annotated[
+        User, Depends(RoleChecker(allowed_role_ids=["admin", "user"]))
+    ],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+) -> List[SearchHit]:
+    try:
+        with Session(engine) as session:
+            return message_search.search(
+                q,
+                session,
+                limit,
+                where=[
+                    Message.room_id.in_(
+                        select(UserRoom.room_id).where(
+                            UserRoom.user_id == current_user.id
+                        )
+                    )
+                ],
+            )
+    except Exception as e:
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
 @router.get(
     "/room",
     tags=["Room"],
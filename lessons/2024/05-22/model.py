@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import List
 
 from pydantic import BaseModel
+from search import SearchIndex
 from sqlalchemy import Column, Integer, String
 from sqlmodel import Field, Relationship, SQLModel, create_engine
 
@@ -62,6 +63,9 @@ class Message(SQLModel, table=True):
     room: Room = Relationship(back_populates="messages")
 
 
+message_search = SearchIndex(Message, "Message", ["content"])
+
+
 class Result[Type: SQLModel](BaseModel):
     success: bool
     detail: str
@@ -90,3 +94,4 @@ sqlite_url = f"sqlite:///{sqlite_file_name}"
 engine = create_engine(sqlite_url, echo=True)
 
 SQLModel.metadata.create_all(engine)
+message_search.create(engine)